@@ -0,0 +1,96 @@
+# alignment.py
+import numpy as np
+import pandas as pd
+
+# Penyelarasan "as-of" deret eksogen (frekuensi lebih rendah atau tidak
+# teratur, mis. Fear & Greed harian) ke indeks bar: setiap bar mendapat
+# observasi terakhir dengan timestamp <= timestamp bar, seperti
+# pd.merge_asof(direction='backward'). Observasi yang lebih tua dari
+# `max_staleness` dianggap tidak ada dan diisi `fill_value`. Tidak ada nilai
+# masa depan yang bisa masuk ke bar sebelumnya.
+
+
+class ExogenousSeries:
+    """Satu input eksogen: deret berindeks waktu plus aturan penyelarasannya."""
+
+    def __init__(self, values, max_staleness=None, fill_value=np.nan):
+        values = pd.Series(values, dtype=np.float64).dropna()
+        if not isinstance(values.index, pd.DatetimeIndex):
+            values.index = pd.to_datetime(values.index)
+        if not values.index.is_monotonic_increasing:
+            values = values.sort_index()
+        # Observasi ganda pada timestamp sama: yang terakhir dipakai.
+        values = values[~values.index.duplicated(keep='last')]
+        self.times = values.index.to_numpy()
+        self.values = values.to_numpy()
+        self.max_staleness = pd.Timedelta(max_staleness).to_timedelta64() if max_staleness is not None else None
+        self.fill_value = fill_value
+
+    def align(self, timestamps):
+        """Nilai as-of untuk array datetime64 yang terurut naik."""
+        out = np.full(len(timestamps), self.fill_value, dtype=np.float64)
+        if not len(self.times):
+            return out
+        # Samakan unit deret (kecil) dengan unit indeks bar, bukan sebaliknya.
+        times = self.times.astype(timestamps.dtype, copy=False)
+        pos = np.searchsorted(times, timestamps, side='right') - 1
+        valid = pos >= 0
+        if self.max_staleness is not None:
+            valid &= (timestamps - times[np.maximum(pos, 0)]) <= self.max_staleness
+        out[valid] = self.values[pos[valid]]
+        return out
+
+
+def align_inputs(index, inputs):
+    """
+    DataFrame berindeks `index` dengan satu kolom per input di dict {nama:
+    ExogenousSeries}. Satu searchsorted per input sudah O(n log m) sehingga
+    hasilnya tidak di-cache antar siklus.
+    """
+    index = pd.DatetimeIndex(index)
+    out = pd.DataFrame(index=index)
+    timestamps = index.to_numpy()
+    order = None
+    if not index.is_monotonic_increasing:
+        order = np.argsort(timestamps, kind='stable')
+        timestamps = timestamps[order]
+
+    for name, series in inputs.items():
+        values = series.align(timestamps)
+        if order is not None:
+            unsorted = np.empty_like(values)
+            unsorted[order] = values
+            values = unsorted
+        out[name] = values
+    return out
+
+
+def align_asof(index, values, max_staleness=None, fill_value=np.nan):
+    """Bentuk singkat untuk satu deret: `values` diselaraskan ke `index`, hasil berupa array."""
+    return ExogenousSeries(values, max_staleness, fill_value).align(pd.DatetimeIndex(index).to_numpy())
+
+
+if __name__ == "__main__":
+    import time
+
+    # Paritas dengan pd.merge_asof(tolerance=...) pada 200 ribu bar per jam.
+    rng = np.random.default_rng(0)
+    bars = pd.date_range("2003-01-01", periods=200_000, freq="h")
+    days = pd.date_range("2003-01-01", periods=8_400, freq="D")
+    daily = pd.Series(rng.integers(0, 100, len(days)).astype(float), index=days).drop(days[1000:1010])
+    staleness = pd.Timedelta(hours=48)
+
+    start = time.perf_counter()
+    ours = align_asof(bars, daily, staleness, fill_value=50.0)
+    ours_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    reference = pd.merge_asof(pd.DataFrame(index=bars), daily.rename('value').to_frame(),
+                              left_index=True, right_index=True, tolerance=staleness)['value'].fillna(50.0)
+    reference_time = time.perf_counter() - start
+    print(f"Cocok dengan merge_asof: {np.array_equal(ours, reference.to_numpy())} "
+          f"({ours_time * 1000:.1f} ms vs {reference_time * 1000:.1f} ms untuk {len(bars)} bar)")
+
+    shuffled = bars[rng.permutation(len(bars))]
+    aligned = align_inputs(shuffled, {'sentiment_value': ExogenousSeries(daily, staleness, 50.0)})
+    print(f"Indeks tidak terurut: {np.array_equal(aligned['sentiment_value'].to_numpy(), ours[bars.get_indexer(shuffled)])}")
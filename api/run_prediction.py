@@ -11,6 +11,7 @@ import logging
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import main
+import model_registry
 from config import LOGS_DIR
 
 # Konfigurasi logging dasar untuk file ini
@@ -23,6 +24,10 @@ logging.basicConfig(
     ]
 )
 
+# Muat model dan scaler sekali saat container dibuat; pemanggilan berikutnya pada
+# container yang sama (warm invocation) akan memakai cache dari model registry.
+model_registry.preload()
+
 def handler(request, response):
     """
     Fungsi handler yang dipanggil oleh Vercel.
@@ -0,0 +1,363 @@
+# backfill.py
+import os
+import re
+import json
+import time
+import argparse
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from config import (SYMBOLS, BACKFILL_DIR, BACKFILL_START, TWELVE_DATA_MAX_OUTPUTSIZE, TWELVE_DATA_BATCH_SIZE,
+                    FETCH_MAX_WORKERS)
+from data_collector import fetch_time_series_batch, cap_batch_size
+from bar_store import BAR_DTYPE, interval_to_timedelta, in_weekend_closure, frame_to_records, records_to_frame
+
+# Backfill data historis panjang untuk training. Rentang tanggal dipecah menjadi
+# potongan start_date/end_date yang masing-masing muat dalam satu request
+# (TWELVE_DATA_MAX_OUTPUTSIZE bar), diunduh paralel lewat rate limiter kredit
+# bersama, lalu disambung menjadi satu arsip terkompresi per simbol:
+#
+#   BACKFILL_DIR/EURUSD_1h.npz            arsip hasil sambungan (dibaca training)
+#   BACKFILL_DIR/EURUSD_1h/manifest.json  status setiap potongan
+#   BACKFILL_DIR/EURUSD_1h/<awal>.npz     bar mentah per potongan
+#
+# Batas potongan mengikuti grid tetap sejak epoch, sehingga run berikutnya
+# (dilanjutkan setelah terputus, atau diperpanjang ke tanggal lebih baru) hanya
+# mengunduh potongan yang belum lengkap.
+
+_EPOCH = pd.Timestamp("1970-01-01")
+_manifest_locks = {}
+_manifest_locks_guard = threading.Lock()
+
+
+def _symbol_dir(symbol, interval):
+    safe_symbol = re.sub(r'[^A-Za-z0-9]+', '', symbol)
+    return os.path.join(BACKFILL_DIR, f"{safe_symbol}_{interval}")
+
+
+def archive_path(symbol, interval='1h'):
+    return f"{_symbol_dir(symbol, interval)}.npz"
+
+
+def _manifest_path(symbol, interval):
+    return os.path.join(_symbol_dir(symbol, interval), "manifest.json")
+
+
+def _chunk_key(chunk_start):
+    return chunk_start.strftime("%Y%m%d%H%M")
+
+
+def _lock_for(symbol, interval):
+    with _manifest_locks_guard:
+        return _manifest_locks.setdefault((symbol, interval), threading.Lock())
+
+
+def plan_chunks(start, end, interval='1h', chunk_bars=TWELVE_DATA_MAX_OUTPUTSIZE):
+    """
+    Daftar (awal, akhir) potongan yang menutupi [start, end). Setiap potongan
+    selebar `chunk_bars - 1` bar kalender, sehingga request yang penuh
+    (`chunk_bars` bar) menandakan bar terpotong; jam pasar tutup hanya membuat
+    jumlah bar lebih sedikit.
+    """
+    span = interval_to_timedelta(interval) * (chunk_bars - 1)
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    first = _EPOCH + ((start - _EPOCH) // span) * span
+    return [(chunk_start, chunk_start + span) for chunk_start in pd.date_range(first, end, freq=span, inclusive='left')]
+
+
+def load_manifest(symbol, interval='1h', chunk_bars=TWELVE_DATA_MAX_OUTPUTSIZE):
+    path = _manifest_path(symbol, interval)
+    manifest = {'symbol': symbol, 'interval': interval, 'chunk_bars': chunk_bars, 'chunks': {}}
+    if not os.path.exists(path):
+        return manifest
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            stored = json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Manifest backfill {symbol} tidak bisa dibaca ({e}); semua potongan diunduh ulang.")
+        return manifest
+    if stored.get('chunk_bars') != chunk_bars:
+        logging.warning(f"Ukuran potongan backfill {symbol} berubah ({stored.get('chunk_bars')} -> {chunk_bars}); "
+                        f"semua potongan diunduh ulang.")
+        return manifest
+    return stored
+
+
+def _save_manifest(manifest):
+    path = _manifest_path(manifest['symbol'], manifest['interval'])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _save_records(path, records):
+    """np.savez_compressed secara atomik (file sementara lalu os.replace)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez_compressed(tmp_path, bars=records)
+    os.replace(tmp_path, path)
+
+
+def _load_records(path):
+    if not os.path.exists(path):
+        return np.empty(0, dtype=BAR_DTYPE)
+    with np.load(path) as archive:
+        return archive['bars']
+
+
+def _store_chunk(symbol, interval, manifest, chunk_start, chunk_end, df, fetched_at, chunk_bars):
+    """
+    Menyimpan bar satu potongan lalu mencatatnya di manifest (setelah file bar
+    aman di disk). Bar di luar [chunk_start, chunk_end) dibuang.
+    """
+    key = _chunk_key(chunk_start)
+    if len(df) >= chunk_bars:
+        logging.warning(f"Potongan {symbol} {chunk_start} berisi {len(df)} bar (= outputsize); "
+                        f"sebagian bar mungkin terpotong.")
+    if not df.empty:
+        df = df[(df.index >= chunk_start) & (df.index < chunk_end)]
+    _save_records(os.path.join(_symbol_dir(symbol, interval), f"{key}.npz"), frame_to_records(df))
+    with _lock_for(symbol, interval):
+        manifest['chunks'][key] = {
+            'start': str(chunk_start), 'end': str(chunk_end), 'rows': len(df),
+            'fetched_at': str(fetched_at),
+            # Potongan yang akhirnya belum lewat saat diunduh akan diunduh ulang pada run berikutnya.
+            'complete': bool(chunk_end <= fetched_at),
+        }
+        _save_manifest(manifest)
+
+
+def find_gaps(timestamps, interval='1h'):
+    """
+    Celah antar bar berurutan yang lebih lebar dari satu interval. Celah yang
+    seluruhnya jatuh pada jam tutup pasar akhir pekan (Jumat 20:00 - Senin
+    00:00 UTC) ditandai 'weekend'; sisanya (libur, data hilang) perlu diperiksa.
+    """
+    step = interval_to_timedelta(interval)
+    times = pd.DatetimeIndex(timestamps)
+    if len(times) < 2:
+        return []
+    deltas = times[1:] - times[:-1]
+    idx = np.flatnonzero(deltas > step)
+    if len(idx) == 0:
+        return []
+    first_missing = times[idx] + step
+    last_missing = times[idx + 1] - step
+    weekend = (in_weekend_closure(first_missing) & in_weekend_closure(last_missing)
+               & ((last_missing - first_missing) < pd.Timedelta(days=3)))
+    return [
+        {'after': str(times[i]), 'before': str(times[i + 1]), 'missing_bars': int(deltas[i] / step) - 1,
+         'weekend': bool(w)}
+        for i, w in zip(idx, weekend)
+    ]
+
+
+def stitch(symbol, interval='1h', start=None, end=None, manifest=None):
+    """
+    Menyambung semua potongan tersimpan menjadi arsip BACKFILL_DIR/<simbol>_<interval>.npz:
+    urut waktu, bar duplikat di batas potongan dibuang (versi dari potongan yang
+    diunduh paling akhir dipakai), dipotong ke [start, end), dan celah dicatat di
+    manifest. Mengembalikan ringkasan arsip.
+    """
+    manifest = manifest or load_manifest(symbol, interval)
+    chunks = sorted(manifest['chunks'].items(), key=lambda item: item[1]['fetched_at'])
+    parts = [_load_records(os.path.join(_symbol_dir(symbol, interval), f"{key}.npz")) for key, _ in chunks]
+    records = np.concatenate(parts) if parts else np.empty(0, dtype=BAR_DTYPE)
+
+    records = records[np.argsort(records['timestamp'], kind='stable')]
+    if len(records):
+        is_last = np.append(records['timestamp'][1:] != records['timestamp'][:-1], True)
+        records = records[is_last]
+    if start is not None:
+        records = records[records['timestamp'] >= pd.Timestamp(start).as_unit('ns').value]
+    if end is not None:
+        records = records[records['timestamp'] < pd.Timestamp(end).as_unit('ns').value]
+
+    gaps = find_gaps(records['timestamp'].astype('datetime64[ns]'), interval)
+    unexpected = [gap for gap in gaps if not gap['weekend']]
+    summary = {
+        'rows': len(records),
+        'first': str(pd.Timestamp(records['timestamp'][0])) if len(records) else None,
+        'last': str(pd.Timestamp(records['timestamp'][-1])) if len(records) else None,
+        'gaps': len(gaps),
+        'unexpected_gaps': len(unexpected),
+        'largest_gap_bars': max((gap['missing_bars'] for gap in unexpected), default=0),
+    }
+    _save_records(archive_path(symbol, interval), records)
+    with _lock_for(symbol, interval):
+        manifest['archive'] = summary
+        manifest['gaps'] = unexpected
+        _save_manifest(manifest)
+    if unexpected:
+        logging.warning(f"Arsip {symbol}: {len(unexpected)} celah di luar akhir pekan "
+                        f"(terbesar {summary['largest_gap_bars']} bar); rincian di manifest.")
+    return summary
+
+
+def backfill(symbols=None, start=BACKFILL_START, end=None, interval='1h', chunk_bars=TWELVE_DATA_MAX_OUTPUTSIZE,
+             batch_size=None, max_workers=None):
+    """
+    Mengunduh semua potongan yang belum lengkap untuk [start, end) lalu
+    menyambung arsip setiap simbol. Simbol yang membutuhkan potongan yang sama
+    digabung dalam request multi-simbol (TWELVE_DATA_BATCH_SIZE); semua request
+    melewati rate limiter kredit bersama. Potongan dicatat di manifest segera
+    setelah tersimpan, sehingga run yang terputus cukup dijalankan ulang.
+    Mengembalikan dict {simbol: ringkasan arsip}.
+    """
+    symbols = list(symbols or SYMBOLS)
+    end = pd.Timestamp(end) if end is not None else pd.Timestamp.now('UTC').tz_localize(None)
+    batch_size = cap_batch_size(max(1, batch_size or TWELVE_DATA_BATCH_SIZE))
+    chunks = plan_chunks(start, end, interval, chunk_bars)
+    manifests = {symbol: load_manifest(symbol, interval, chunk_bars) for symbol in symbols}
+
+    jobs = []
+    for chunk_start, chunk_end in chunks:
+        key = _chunk_key(chunk_start)
+        needed = [symbol for symbol in symbols if not manifests[symbol]['chunks'].get(key, {}).get('complete')]
+        for i in range(0, len(needed), batch_size):
+            jobs.append((chunk_start, chunk_end, needed[i:i + batch_size]))
+    total_requests = sum(len(batch) for _, _, batch in jobs)
+    logging.info(f"Backfill {len(symbols)} simbol {start} s/d {end}: {len(chunks)} potongan per simbol, "
+                 f"{total_requests} potongan belum lengkap dalam {len(jobs)} request.")
+
+    def run_job(chunk_start, chunk_end, batch):
+        # end_date Twelve Data inklusif; bar tepat di batas milik potongan berikutnya.
+        results = fetch_time_series_batch(batch, interval, chunk_bars, start_date=chunk_start,
+                                           end_date=chunk_end - pd.Timedelta(seconds=1))
+        fetched_at = pd.Timestamp.now('UTC').tz_localize(None)
+        for symbol, df in results.items():
+            _store_chunk(symbol, interval, manifests[symbol], chunk_start, chunk_end, df, fetched_at, chunk_bars)
+        return [symbol for symbol in batch if symbol not in results]
+
+    failed = 0
+    start_time = time.perf_counter()
+    executor = ThreadPoolExecutor(max_workers=max_workers or FETCH_MAX_WORKERS)
+    try:
+        futures = {executor.submit(run_job, *job): job for job in jobs}
+        for done, future in enumerate(as_completed(futures), 1):
+            chunk_start, _, batch = futures[future]
+            try:
+                missing = future.result()
+            except Exception as e:
+                logging.error(f"Potongan {chunk_start} untuk {len(batch)} simbol gagal: {e}")
+                missing = batch
+            if missing:
+                failed += len(missing)
+                logging.warning(f"Potongan {chunk_start} belum berhasil untuk {', '.join(missing)}; "
+                                f"akan dicoba lagi pada run berikutnya.")
+            logging.info(f"Backfill: {done}/{len(jobs)} request selesai "
+                         f"({time.perf_counter() - start_time:.1f} detik).")
+    finally:
+        # Ctrl+C: potongan yang sudah tersimpan tetap tercatat di manifest.
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    summaries = {}
+    for symbol in symbols:
+        summaries[symbol] = stitch(symbol, interval, start, end, manifests[symbol])
+        logging.info(f"Arsip {symbol}: {summaries[symbol]['rows']} bar "
+                     f"({summaries[symbol]['first']} s/d {summaries[symbol]['last']}).")
+    if failed:
+        logging.warning(f"{failed} potongan simbol gagal diunduh; jalankan ulang backfill untuk melanjutkan.")
+    return summaries
+
+
+def load_archive(symbol, interval='1h', start=None, end=None):
+    """Bar dari arsip backfill sebagai DataFrame OHLCV berindeks timestamp (kosong jika belum ada)."""
+    df = records_to_frame(_load_records(archive_path(symbol, interval)))
+    if start is not None:
+        df = df[df.index >= pd.Timestamp(start)]
+    if end is not None:
+        df = df[df.index < pd.Timestamp(end)]
+    return df
+
+
+def with_archive(symbol, recent, interval='1h'):
+    """
+    Menyambung arsip backfill dengan bar terbaru (mis. hasil get_historical_data).
+    Untuk timestamp yang sama, bar terbaru yang dipakai.
+    """
+    archived = load_archive(symbol, interval)
+    if archived.empty:
+        return recent
+    if recent is None or recent.empty:
+        return archived
+    combined = pd.concat([archived, recent[archived.columns]])
+    return combined[~combined.index.duplicated(keep='last')].sort_index()
+
+
+def verify_rejected_requests():
+    """
+    Pemeriksaan regresi tanpa jaringan: respons yang menolak kunci API atau
+    paket (code 401/403) tidak boleh tercatat sebagai potongan lengkap tanpa
+    bar, sedangkan jawaban "tidak ada data" (code 400) boleh. Melempar
+    AssertionError jika gagal; mengembalikan jumlah request per run.
+    """
+    import tempfile
+    import requests
+    import data_collector
+    import rate_limiter
+    global BACKFILL_DIR
+
+    def fake_get(code):
+        def get(endpoint, url, attempt=1, **kwargs):
+            calls.append(kwargs['params']['symbol'])
+            response = requests.Response()
+            response.status_code = 200
+            response._content = json.dumps({'code': code, 'message': f"error {code}", 'status': 'error'}).encode()
+            return response
+        return get
+
+    original = (BACKFILL_DIR, data_collector._timed_get, rate_limiter._limiter)
+    calls, report = [], {}
+    try:
+        with tempfile.TemporaryDirectory() as root:
+            BACKFILL_DIR = root
+            rate_limiter._limiter = rate_limiter.CreditRateLimiter(0)
+            for code, complete in ((401, False), (403, False), (400, True)):
+                data_collector._timed_get = fake_get(code)
+                symbols = [f"T{code}/USD", f"T{code}/JPY"]
+                runs = []
+                for _ in range(2):
+                    calls.clear()
+                    # Satu simbol per request lalu request multi-simbol.
+                    backfill(symbols[:1], start='2024-01-01', end='2024-12-01')
+                    backfill(symbols, start='2024-01-01', end='2024-12-01', batch_size=2)
+                    runs.append(len(calls))
+                chunks = [chunk for symbol in symbols for chunk in load_manifest(symbol)['chunks'].values()]
+                assert all(chunk['complete'] == complete for chunk in chunks), \
+                    f"code {code}: potongan tercatat complete={not complete}"
+                assert (runs[1] == 0) == complete, f"code {code}: run kedua mengirim {runs[1]} request"
+                report[code] = runs
+    finally:
+        BACKFILL_DIR, data_collector._timed_get, rate_limiter._limiter = original
+    return report
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Backfill data historis panjang untuk training.")
+    parser.add_argument('--symbols', nargs='+', default=None, help="default: SYMBOLS di config")
+    parser.add_argument('--start', default=BACKFILL_START, help=f"tanggal awal (default {BACKFILL_START})")
+    parser.add_argument('--end', default=None, help="tanggal akhir, eksklusif (default: sekarang)")
+    parser.add_argument('--interval', default='1h')
+    parser.add_argument('--workers', type=int, default=None, help="request paralel (default FETCH_MAX_WORKERS)")
+    parser.add_argument('--stitch-only', action='store_true', help="hanya menyambung ulang potongan tersimpan")
+    parser.add_argument('--verify', action='store_true', help="jalankan pemeriksaan regresi offline lalu keluar")
+    args = parser.parse_args()
+
+    if args.verify:
+        print(f"Request per run (run pertama, run kedua) menurut code error: {verify_rejected_requests()}")
+        raise SystemExit(0)
+    if args.stitch_only:
+        results = {symbol: stitch(symbol, args.interval, args.start, args.end) for symbol in (args.symbols or SYMBOLS)}
+    else:
+        results = backfill(args.symbols, args.start, args.end, args.interval, max_workers=args.workers)
+    for symbol, summary in results.items():
+        print(f"{symbol:<12} {summary['rows']:>8} bar  {summary['first']} s/d {summary['last']}  "
+              f"celah: {summary['gaps']} ({summary['unexpected_gaps']} di luar akhir pekan)")
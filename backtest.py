@@ -0,0 +1,300 @@
+# backtest.py
+import os
+import json
+import time
+import argparse
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from config import (SYMBOLS, SEQUENCE_LENGTH, PREDICTION_HORIZON, CONFIDENCE_THRESHOLD, TWELVE_DATA_MAX_OUTPUTSIZE,
+                    BACKTEST_WORKERS, BACKTEST_BATCH_SIZE, BACKTEST_SLTP_BARS, TRAIN_USE_BACKFILL)
+from feature_engine import create_lstm_features, prepare_sequences
+from signal_rules import percent_change, classify_trend, compute_confidence, stop_levels
+from backfill import with_archive
+from cross_asset import compute_cross_asset, is_requested as cross_asset_requested
+import bar_store
+
+# Kode hasil SL/TP per prediksi.
+OUTCOME_NONE, OUTCOME_TP, OUTCOME_SL, OUTCOME_OPEN = 0, 1, -1, 2
+_OUTCOME_NAMES = {OUTCOME_NONE: '', OUTCOME_TP: 'tp', OUTCOME_SL: 'sl', OUTCOME_OPEN: 'open'}
+
+
+def load_bars(symbol, end=None):
+    """
+    Bar per jam untuk backtest: arsip backfill (jika ada) disambung dengan bar
+    store lokal, atau (jika keduanya kosong) dari Twelve Data sebanyak
+    TWELVE_DATA_MAX_OUTPUTSIZE bar. Bar sebelum awal
+    periode evaluasi tetap dikembalikan sebagai pemanasan indikator;
+    pemotongan dilakukan setelah fitur dihitung.
+    """
+    bars = bar_store.load_bars(symbol, '1h')
+    if TRAIN_USE_BACKFILL:
+        bars = with_archive(symbol, bars)
+    if bars.empty:
+        from data_collector import get_historical_data
+        bars = get_historical_data(symbol, interval='1h', outputsize=TWELVE_DATA_MAX_OUTPUTSIZE)
+    if end is not None and not bars.empty:
+        bars = bars[bars.index <= pd.Timestamp(end)]
+    return bars
+
+
+def sltp_outcomes(trend, stop_loss, take_profit, high, low, rows, lookahead):
+    """
+    Untuk setiap prediksi pada baris `rows`, memeriksa `lookahead` bar
+    berikutnya: TP tersentuh lebih dulu (OUTCOME_TP), SL lebih dulu atau
+    bersamaan pada bar yang sama (OUTCOME_SL, asumsi konservatif), atau
+    keduanya tidak tersentuh (OUTCOME_OPEN). Tren 'Netral' dan prediksi yang
+    bar ke depannya belum lengkap bernilai OUTCOME_NONE.
+    """
+    outcome = np.full(len(rows), OUTCOME_NONE, dtype=np.int8)
+    valid = (trend != "Netral") & (rows + lookahead < len(high))
+    if not valid.any() or lookahead <= 0:
+        return outcome
+
+    idx = rows[valid]
+    # Jendela ke-i berisi bar i+1 .. i+lookahead.
+    highs = np.lib.stride_tricks.sliding_window_view(high[1:], lookahead)[idx]
+    lows = np.lib.stride_tricks.sliding_window_view(low[1:], lookahead)[idx]
+    is_long = (trend[valid] == "Naik")[:, None]
+    tp = take_profit[valid][:, None]
+    sl = stop_loss[valid][:, None]
+    tp_hit = np.where(is_long, highs >= tp, lows <= tp)
+    sl_hit = np.where(is_long, lows <= sl, highs >= sl)
+    first_tp = np.where(tp_hit.any(axis=1), tp_hit.argmax(axis=1), lookahead)
+    first_sl = np.where(sl_hit.any(axis=1), sl_hit.argmax(axis=1), lookahead)
+    outcome[valid] = np.select([(first_sl < lookahead) & (first_sl <= first_tp), first_tp < lookahead],
+                               [OUTCOME_SL, OUTCOME_TP], default=OUTCOME_OPEN)
+    return outcome
+
+
+def _summarize(symbol, frame, threshold, timings):
+    signals = frame[(frame['trend'] != "Netral") & (frame['confidence'] >= threshold)]
+    directional = frame[frame['trend'] != "Netral"]
+    decided = signals[signals['outcome'] != '']
+    rate = lambda mask, n: float(mask.sum()) / n if n else None
+    return {
+        'symbol': symbol,
+        'predictions': len(frame),
+        'start': str(frame.index[0]) if len(frame) else None,
+        'end': str(frame.index[-1]) if len(frame) else None,
+        'directional_accuracy': rate(frame['correct'], len(frame)),
+        'directional_predictions': len(directional),
+        'directional_accuracy_non_neutral': rate(directional['correct'], len(directional)),
+        'signals': len(signals),
+        'signal_accuracy': rate(signals['correct'], len(signals)),
+        # Sinyal yang sudah menyentuh TP/SL atau habis jendela; penyebut tp/sl/open_rate.
+        'decided_signals': len(decided),
+        'tp_hit_rate': rate(decided['outcome'] == 'tp', len(decided)),
+        'sl_hit_rate': rate(decided['outcome'] == 'sl', len(decided)),
+        'open_rate': rate(decided['outcome'] == 'open', len(decided)),
+        'mean_confidence': float(frame['confidence'].mean()) if len(frame) else None,
+        'timings': {name: round(seconds, 6) for name, seconds in timings.items()},
+        'inference_ms_per_window': round(timings['inference'] * 1000 / len(frame), 6) if len(frame) else None,
+    }
+
+
+def backtest_symbol(symbol, sentiment=None, start=None, end=None, threshold=CONFIDENCE_THRESHOLD,
+                    batch_size=BACKTEST_BATCH_SIZE, lookahead=BACKTEST_SLTP_BARS, cross_asset=None):
+    """
+    Walk-forward backtest satu simbol. Seluruh jendela SEQUENCE_LENGTH dibuat
+    sekaligus (view tanpa salinan) dan diprediksi per batch; setiap prediksi
+    pada bar t hanya memakai bar <= t. Hasil diterjemahkan dengan aturan tren,
+    confidence, dan SL/TP yang sama dengan predictor dan notifier, lalu
+    dibandingkan dengan harga aktual PREDICTION_HORIZON bar kemudian.
+    Mengembalikan (ringkasan dict, DataFrame per prediksi).
+    """
+    from model_registry import get_model, get_normalizer
+
+    timings = {}
+    clock = time.perf_counter()
+    bars = load_bars(symbol, end=end)
+    timings['load'] = time.perf_counter() - clock
+    if len(bars) <= SEQUENCE_LENGTH + PREDICTION_HORIZON:
+        raise ValueError(f"Data {symbol} tidak cukup untuk backtest ({len(bars)} bar).")
+
+    clock = time.perf_counter()
+    featured = create_lstm_features(bars, sentiment if sentiment is not None else pd.DataFrame(),
+                                    cross_asset=cross_asset)
+    timings['features'] = time.perf_counter() - clock
+
+    clock = time.perf_counter()
+    model = get_model()
+    normalizer = get_normalizer()
+    timings['model_load'] = time.perf_counter() - clock
+
+    clock = time.perf_counter()
+    X = normalizer.transform_features(symbol, featured)
+    close = featured['close'].to_numpy(dtype=np.float64)
+    windows, _ = prepare_sequences(X, close, SEQUENCE_LENGTH)
+    # Jendela ke-i berakhir di baris i + SEQUENCE_LENGTH - 1; hanya jendela yang
+    # harga aktualnya (PREDICTION_HORIZON bar kemudian) sudah diketahui.
+    rows = np.arange(len(windows)) + SEQUENCE_LENGTH - 1
+    keep = rows + PREDICTION_HORIZON < len(featured)
+    if start is not None:
+        keep &= featured.index[rows] >= pd.Timestamp(start)
+    selected = np.flatnonzero(keep)
+    rows = rows[selected]
+    timings['scaling'] = time.perf_counter() - clock
+
+    clock = time.perf_counter()
+    predicted_scaled = np.empty(len(selected), dtype=np.float64)
+    for offset in range(0, len(selected), batch_size):
+        # Hanya jendela dalam batch aktif yang disalin dari view.
+        X_batch = np.ascontiguousarray(windows[selected[offset:offset + batch_size]], dtype=np.float32)
+        predicted_scaled[offset:offset + len(X_batch)] = np.asarray(
+            model.predict(X_batch, batch_size=len(X_batch), verbose=0)).reshape(-1)
+    timings['inference'] = time.perf_counter() - clock
+
+    clock = time.perf_counter()
+    current = close[rows]
+    atr = featured['atr_14'].to_numpy(dtype=np.float64)[rows]
+    predicted = normalizer.inverse_target(symbol, predicted_scaled, current)
+    change = np.asarray(percent_change(predicted, current))
+    trend = np.asarray(classify_trend(change))
+    confidence = np.round(np.asarray(compute_confidence(change, atr, current)), 2)
+    actual = close[rows + PREDICTION_HORIZON]
+    actual_trend = np.asarray(classify_trend(np.asarray(percent_change(actual, current))))
+    stop_loss, take_profit = (np.asarray(level) for level in stop_levels(trend, current, atr))
+    outcome = sltp_outcomes(trend, stop_loss, take_profit, featured['high'].to_numpy(dtype=np.float64),
+                            featured['low'].to_numpy(dtype=np.float64), rows, lookahead)
+    frame = pd.DataFrame({
+        'symbol': symbol,
+        'current_price': current,
+        'predicted_price': predicted,
+        'trend': trend,
+        'confidence': confidence,
+        'atr': atr,
+        'actual_price': actual,
+        'actual_trend': actual_trend,
+        'correct': trend == actual_trend,
+        'stop_loss': stop_loss,
+        'take_profit': take_profit,
+        'outcome': [_OUTCOME_NAMES[code] for code in outcome],
+    }, index=featured.index[rows])
+    timings['rules'] = time.perf_counter() - clock
+
+    return _summarize(symbol, frame, threshold, timings), frame
+
+
+def _run_one(args):
+    symbol, kwargs = args
+    try:
+        return backtest_symbol(symbol, **kwargs)
+    except Exception as e:
+        logging.error(f"Backtest {symbol} gagal: {e}", exc_info=True)
+        return {'symbol': symbol, 'error': str(e)}, None
+
+
+def _aggregate(summaries):
+    ok = [s for s in summaries if 'error' not in s]
+    total = sum(s['predictions'] for s in ok)
+
+    def weighted(key, weight):
+        pairs = [(s[key], s[weight]) for s in ok if s[key] is not None and s[weight]]
+        n = sum(w for _, w in pairs)
+        return sum(v * w for v, w in pairs) / n if n else None
+
+    signals = sum(s['signals'] for s in ok)
+    return {
+        'symbols': len(ok),
+        'failed_symbols': [s['symbol'] for s in summaries if 'error' in s],
+        'predictions': total,
+        'directional_accuracy': weighted('directional_accuracy', 'predictions'),
+        'directional_accuracy_non_neutral': weighted('directional_accuracy_non_neutral', 'directional_predictions'),
+        'signals': signals,
+        'signal_accuracy': weighted('signal_accuracy', 'signals'),
+        'tp_hit_rate': weighted('tp_hit_rate', 'decided_signals'),
+        'sl_hit_rate': weighted('sl_hit_rate', 'decided_signals'),
+        'inference_seconds': sum(s['timings']['inference'] for s in ok),
+        'inference_ms_per_window': (sum(s['timings']['inference'] for s in ok) * 1000 / total) if total else None,
+    }
+
+
+def run_backtest(symbols=None, start=None, end=None, threshold=CONFIDENCE_THRESHOLD, workers=None,
+                 batch_size=BACKTEST_BATCH_SIZE, lookahead=BACKTEST_SLTP_BARS):
+    """
+    Backtest banyak simbol; setiap simbol dijalankan di proses terpisah
+    (ProcessPoolExecutor). Data sentimen (dan fitur lintas aset, jika diminta
+    di FEATURES) disiapkan sekali di proses induk.
+    Mengembalikan (laporan dict, DataFrame gabungan per prediksi).
+    """
+    from data_collector import get_sentiment_data
+
+    symbols = list(symbols or SYMBOLS)
+    started = time.perf_counter()
+    sentiment = get_sentiment_data()
+    kwargs = {'sentiment': sentiment, 'start': start, 'end': end, 'threshold': threshold,
+              'batch_size': batch_size, 'lookahead': lookahead}
+    cross_asset = {}
+    if cross_asset_requested():
+        # Komposit dihitung dari seluruh SYMBOLS seperti saat training, bukan hanya simbol yang diuji.
+        universe = list(dict.fromkeys(list(SYMBOLS) + symbols))
+        cross_asset = compute_cross_asset({symbol: load_bars(symbol, end=end) for symbol in universe})
+    workers = min(workers or BACKTEST_WORKERS or os.cpu_count() or 1, len(symbols))
+    jobs = [(symbol, dict(kwargs, cross_asset=cross_asset.get(symbol))) for symbol in symbols]
+    if workers <= 1:
+        results = [_run_one(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_run_one, jobs))
+
+    summaries = [summary for summary, _ in results]
+    frames = [frame for _, frame in results if frame is not None and not frame.empty]
+    report = {
+        'created_at': time.strftime("%Y-%m-%d %H:%M:%S"),
+        'parameters': {'start': start, 'end': end, 'threshold': threshold, 'horizon': PREDICTION_HORIZON,
+                       'sequence_length': SEQUENCE_LENGTH, 'sltp_bars': lookahead, 'workers': workers},
+        'overall': _aggregate(summaries),
+        'symbols': summaries,
+        'wall_seconds': round(time.perf_counter() - started, 3),
+    }
+    return report, (pd.concat(frames) if frames else pd.DataFrame())
+
+
+def _fmt(value, spec=".1%"):
+    return format(value, spec) if isinstance(value, float) else "-"
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Walk-forward backtest model D-1T atas bar per jam tersimpan.")
+    parser.add_argument('--symbols', help="daftar simbol dipisah koma (default: config.SYMBOLS)")
+    parser.add_argument('--start', help="awal periode evaluasi, mis. 2024-01-01")
+    parser.add_argument('--end', help="akhir periode evaluasi")
+    parser.add_argument('--threshold', type=float, default=CONFIDENCE_THRESHOLD,
+                        help="confidence minimum sebuah sinyal (default CONFIDENCE_THRESHOLD)")
+    parser.add_argument('--workers', type=int, default=None, help="jumlah proses (default BACKTEST_WORKERS / CPU)")
+    parser.add_argument('--report', help="simpan laporan JSON ke file ini")
+    parser.add_argument('--output', help="simpan hasil per prediksi ke CSV (boleh .csv.gz)")
+    args = parser.parse_args()
+
+    symbols = [s.strip() for s in args.symbols.split(',')] if args.symbols else None
+    report, predictions = run_backtest(symbols, args.start, args.end, args.threshold, args.workers)
+
+    logging.info("--- Laporan Backtest ---")
+    for s in report['symbols']:
+        if 'error' in s:
+            logging.info(f"  - {s['symbol']}: gagal ({s['error']})")
+            continue
+        logging.info(f"  - {s['symbol']}: {s['predictions']} prediksi ({s['start']} s/d {s['end']}), "
+                     f"akurasi arah {_fmt(s['directional_accuracy'])}, {s['signals']} sinyal "
+                     f"(akurasi {_fmt(s['signal_accuracy'])}, TP {_fmt(s['tp_hit_rate'])}, "
+                     f"SL {_fmt(s['sl_hit_rate'])}), inferensi {_fmt(s['inference_ms_per_window'], '.4f')} ms/jendela")
+    overall = report['overall']
+    logging.info(f"Total: {overall['predictions']} prediksi dari {overall['symbols']} simbol, "
+                 f"akurasi arah {_fmt(overall['directional_accuracy'])} "
+                 f"(non-netral {_fmt(overall['directional_accuracy_non_neutral'])}), "
+                 f"{overall['signals']} sinyal dengan akurasi {_fmt(overall['signal_accuracy'])}, "
+                 f"TP {_fmt(overall['tp_hit_rate'])} / SL {_fmt(overall['sl_hit_rate'])}; "
+                 f"selesai dalam {report['wall_seconds']:.1f} detik.")
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+        logging.info(f"Laporan disimpan di {args.report}")
+    if args.output and not predictions.empty:
+        predictions.rename_axis('timestamp').to_csv(args.output)
+        logging.info(f"{len(predictions)} prediksi disimpan di {args.output}")
@@ -0,0 +1,134 @@
+# bar_store.py
+import os
+import re
+import logging
+import threading
+import numpy as np
+import pandas as pd
+
+from config import BAR_STORE_DIR, BAR_STORE_MAX_ROWS
+
+BAR_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+BAR_DTYPE = np.dtype([('timestamp', '<i8')] + [(col, '<f8') for col in BAR_COLUMNS])
+
+_INTERVALS = {
+    '1min': pd.Timedelta(minutes=1),
+    '5min': pd.Timedelta(minutes=5),
+    '15min': pd.Timedelta(minutes=15),
+    '30min': pd.Timedelta(minutes=30),
+    '45min': pd.Timedelta(minutes=45),
+    '1h': pd.Timedelta(hours=1),
+    '2h': pd.Timedelta(hours=2),
+    '4h': pd.Timedelta(hours=4),
+    '8h': pd.Timedelta(hours=8),
+    '1day': pd.Timedelta(days=1),
+    '1week': pd.Timedelta(weeks=1),
+    '1month': pd.Timedelta(days=31),
+}
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def interval_to_timedelta(interval):
+    """Mengubah nama interval Twelve Data (mis. '1h', '1day') menjadi pd.Timedelta."""
+    if interval in _INTERVALS:
+        return _INTERVALS[interval]
+    return pd.Timedelta(interval)
+
+
+def in_weekend_closure(times):
+    """Array bool: True untuk timestamp (UTC) saat pasar FX tutup akhir pekan, Jumat 20:00 - Senin 00:00."""
+    times = pd.DatetimeIndex(times)
+    return np.asarray(((times.weekday == 4) & (times.hour >= 20)) | (times.weekday >= 5))
+
+
+def _store_path(symbol, interval):
+    safe_symbol = re.sub(r'[^A-Za-z0-9]+', '', symbol)
+    return os.path.join(BAR_STORE_DIR, f"{safe_symbol}_{interval}.npy")
+
+
+def _lock_for(path):
+    with _locks_guard:
+        return _locks.setdefault(path, threading.Lock())
+
+
+def _read_records(path, tail=None):
+    """Membaca array bar dengan memory-map; hanya `tail` baris terakhir yang disalin."""
+    if not os.path.exists(path):
+        return np.empty(0, dtype=BAR_DTYPE)
+    records = np.load(path, mmap_mode='r')
+    if tail is not None:
+        records = records[-tail:]
+    return np.array(records)
+
+
+def records_to_frame(records):
+    """Array bar (BAR_DTYPE) -> DataFrame OHLCV berindeks timestamp."""
+    df = pd.DataFrame({col: records[col] for col in BAR_COLUMNS},
+                      index=pd.DatetimeIndex(records['timestamp'].astype('datetime64[ns]'), name='timestamp'))
+    return df
+
+
+def frame_to_records(df):
+    """DataFrame OHLCV berindeks timestamp -> array bar (BAR_DTYPE); kolom yang tidak ada bernilai 0."""
+    records = np.empty(len(df), dtype=BAR_DTYPE)
+    records['timestamp'] = pd.DatetimeIndex(df.index).as_unit('ns').asi8
+    for col in BAR_COLUMNS:
+        records[col] = df[col].to_numpy(dtype=np.float64) if col in df.columns else 0.0
+    return records
+
+
+def load_bars(symbol, interval='1h', tail=None):
+    """Mengembalikan bar tersimpan sebagai DataFrame berindeks timestamp (urut naik)."""
+    return records_to_frame(_read_records(_store_path(symbol, interval), tail))
+
+
+def count_bars(symbol, interval='1h'):
+    """Jumlah bar tersimpan untuk simbol dan interval tertentu."""
+    path = _store_path(symbol, interval)
+    if not os.path.exists(path):
+        return 0
+    return len(np.load(path, mmap_mode='r'))
+
+
+def last_timestamp(symbol, interval='1h'):
+    """Timestamp bar terakhir yang tersimpan, atau None jika belum ada data."""
+    records = _read_records(_store_path(symbol, interval), tail=1)
+    if len(records) == 0:
+        return None
+    return pd.Timestamp(records['timestamp'][0])
+
+
+def append_bars(symbol, interval, new_data):
+    """
+    Menggabungkan bar baru ke store. Bar dengan timestamp yang sama ditimpa oleh
+    versi terbaru (bar terakhir sebelumnya mungkin belum tutup saat diambil).
+    Hanya BAR_STORE_MAX_ROWS bar terakhir yang disimpan. Mengembalikan jumlah bar
+    tersimpan setelah penggabungan.
+    """
+    if new_data is None or new_data.empty:
+        return count_bars(symbol, interval)
+
+    path = _store_path(symbol, interval)
+    new_records = frame_to_records(new_data)
+    with _lock_for(path):
+        existing = _read_records(path)
+        merged = np.concatenate([existing, new_records])
+        if not (len(existing) and existing['timestamp'][-1] < new_records['timestamp'].min()):
+            # Urutkan stabil lalu ambil kemunculan terakhir (data baru) untuk setiap timestamp.
+            merged = merged[np.argsort(merged['timestamp'], kind='stable')]
+            is_last = np.append(merged['timestamp'][1:] != merged['timestamp'][:-1], True)
+            merged = merged[is_last]
+        if BAR_STORE_MAX_ROWS and len(merged) > BAR_STORE_MAX_ROWS:
+            merged = merged[-BAR_STORE_MAX_ROWS:]
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(BAR_STORE_DIR, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                np.save(f, merged)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logging.warning(f"Gagal menyimpan bar store untuk {symbol}: {e}")
+    return len(merged)
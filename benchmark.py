@@ -0,0 +1,462 @@
+# benchmark.py
+"""
+Benchmark offline untuk jalur data & prediksi D-1T.
+
+Proses induk menjalankan server HTTP lokal pengganti Twelve Data
+(/time_series, termasuk permintaan multi-simbol) dan Fear & Greed (/fng)
+dengan data OHLCV per jam sintetis yang deterministik. Setiap skala (jumlah
+simbol) dijalankan di subprocess terpisah dengan semua path /tmp dari config
+dialihkan ke direktori sementara, sehingga hasil satu skala tidak memanaskan
+cache skala lain dan benchmark tidak menyentuh data produksi.
+
+Contoh:
+    python benchmark.py --scales 7,100,1000 --output bench_main.json
+    python benchmark.py --output bench_branch.json --compare bench_main.json
+"""
+import os
+import re
+import sys
+import json
+import time
+import zlib
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+import statistics
+import subprocess
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Harga awal per simbol acuan. Simbol sintetis tambahan (mis. "EUR0008/USD")
+# memakai simbol acuan yang sama setelah angkanya dibuang.
+_BASE_PRICES = {
+    "XAU/USD": 2000.0,
+    "EUR/USD": 1.10,
+    "USD/JPY": 150.0,
+    "GBP/USD": 1.27,
+    "GBP/JPY": 190.0,
+    "AUD/USD": 0.66,
+    "USD/CHF": 0.88,
+}
+_HOURLY_VOLATILITY = 0.0015
+
+# Perubahan lebih dari batas ini (relatif terhadap baseline) dianggap regresi,
+# kecuali waktunya di bawah NOISE_FLOOR_SECONDS.
+DEFAULT_TOLERANCE = 0.25
+NOISE_FLOOR_SECONDS = 0.005
+
+
+def template_symbol(symbol):
+    """Simbol acuan dari simbol sintetis ("EUR0008/USD" -> "EUR/USD")."""
+    return re.sub(r'\d+', '', symbol)
+
+
+def symbol_universe(count, base_symbols):
+    """`count` simbol: simbol dari config lebih dulu, lalu simbol sintetis turunannya."""
+    symbols = list(base_symbols[:count])
+    i = len(symbols)
+    while len(symbols) < count:
+        base, quote = base_symbols[i % len(base_symbols)].split('/')
+        symbols.append(f"{base}{i:04d}/{quote}")
+        i += 1
+    return symbols
+
+
+# --- Server pengganti API ---
+
+class SyntheticMarket:
+    """Deret OHLCV per jam (geometric Brownian motion) per simbol, dibuat saat pertama diminta."""
+
+    def __init__(self, bars, end=None):
+        self.bars = bars
+        self.end = (end or datetime.now(timezone.utc).replace(tzinfo=None)).replace(minute=0, second=0,
+                                                                                    microsecond=0)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def series(self, symbol):
+        with self._lock:
+            if symbol not in self._series:
+                self._series[symbol] = self._generate(symbol)
+            return self._series[symbol]
+
+    def _generate(self, symbol):
+        rng = np.random.default_rng(zlib.crc32(symbol.encode('utf-8')))
+        n = self.bars
+        start_price = _BASE_PRICES.get(template_symbol(symbol), 100.0)
+        close = start_price * np.exp(np.cumsum(rng.normal(0.0, _HOURLY_VOLATILITY, n)))
+        open_ = np.r_[start_price, close[:-1]]
+        wick = np.abs(rng.normal(0.0, _HOURLY_VOLATILITY / 2, (2, n)))
+        high = np.maximum(open_, close) * (1 + wick[0])
+        low = np.minimum(open_, close) * (1 - wick[1])
+        times = np.datetime64(self.end, 's') - np.arange(n - 1, -1, -1) * np.timedelta64(3600, 's')
+        return {
+            'times': times,
+            'datetime': np.datetime_as_string(times).astype(object),
+            'open': open_, 'high': high, 'low': low, 'close': close,
+        }
+
+    def time_series(self, symbol, outputsize=30, start_date=None, end_date=None):
+        """Payload seperti respons Twelve Data /time_series (bar terbaru lebih dulu)."""
+        s = self.series(symbol)
+        mask = np.ones(len(s['times']), dtype=bool)
+        if start_date:
+            mask &= s['times'] >= np.datetime64(start_date.replace(' ', 'T'), 's')
+        if end_date:
+            mask &= s['times'] <= np.datetime64(end_date.replace(' ', 'T'), 's')
+        idx = np.flatnonzero(mask)[-int(outputsize):][::-1]
+        if len(idx) == 0:
+            return {'code': 400, 'message': "No data is available on the specified dates.", 'status': 'error'}
+        values = [
+            {'datetime': s['datetime'][i].replace('T', ' '), 'open': f"{s['open'][i]:.5f}",
+             'high': f"{s['high'][i]:.5f}", 'low': f"{s['low'][i]:.5f}", 'close': f"{s['close'][i]:.5f}"}
+            for i in idx
+        ]
+        return {'meta': {'symbol': symbol, 'interval': '1h', 'type': 'Physical Currency'},
+                'values': values, 'status': 'ok'}
+
+    def fear_greed(self, limit=90):
+        """Payload seperti respons alternative.me /fng (timestamp epoch sebagai string)."""
+        rng = np.random.default_rng(0)
+        day = datetime(self.end.year, self.end.month, self.end.day, tzinfo=timezone.utc).timestamp()
+        return {'name': 'Fear and Greed Index', 'data': [
+            {'value': str(int(v)), 'value_classification': 'Neutral', 'timestamp': str(int(day - i * 86400))}
+            for i, v in enumerate(rng.integers(10, 90, int(limit)))
+        ]}
+
+
+def start_stub_server(market, latency=0.0):
+    """Menjalankan server pengganti API di thread latar; mengembalikan (server, base_url)."""
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            params = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+            if latency:
+                time.sleep(latency)
+            if parts.path.rstrip('/') == '/time_series':
+                symbols = [s for s in params.get('symbol', '').split(',') if s]
+                args = (params.get('outputsize', 30), params.get('start_date'), params.get('end_date'))
+                if len(symbols) == 1:
+                    payload = market.time_series(symbols[0], *args)
+                else:
+                    payload = {symbol: market.time_series(symbol, *args) for symbol in symbols}
+            elif parts.path.rstrip('/') == '/fng':
+                payload = market.fear_greed(params.get('limit', 90))
+            else:
+                payload = {'code': 404, 'message': f"Endpoint {parts.path} tidak dikenal.", 'status': 'error'}
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(404 if payload.get('code') == 404 else 200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='stub-api', daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+# --- Proses anak: satu skala ---
+
+def _isolate_config(root, base_url, symbols):
+    """Mengalihkan semua path /tmp di config ke `root` dan API ke server lokal (sebelum modul lain diimpor)."""
+    import config
+
+    for name in dir(config):
+        value = getattr(config, name)
+        if name.isupper() and isinstance(value, str) and value.startswith('/tmp/'):
+            setattr(config, name, os.path.join(root, value[len('/tmp/'):]))
+    config.LOGS_DIR = os.path.join(root, 'logs')
+    config.TWELVE_DATA_API_KEY = 'benchmark'
+    config.TWELVE_DATA_BASE_URL = base_url
+    config.FEAR_GREED_API_URL = f"{base_url}/fng/?limit=90"
+    config.SCHEDULER_HEALTH_PORT = 0
+    # Server lokal tidak membatasi kredit; yang diukur adalah biaya pipeline sendiri.
+    config.TWELVE_DATA_CREDITS_PER_MINUTE = 0
+    config.SYMBOLS = symbols
+
+
+def _peak_rss():
+    from instrumentation import _peak_rss_bytes
+    return _peak_rss_bytes()
+
+
+def _measure(results, name, fn, repeat=1, rows=None):
+    """Menjalankan `fn` sebanyak `repeat` kali dan mencatat median waktunya."""
+    times = []
+    value = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = fn()
+        times.append(time.perf_counter() - start)
+    results[name] = {
+        'seconds': round(statistics.median(times), 6),
+        'min_seconds': round(min(times), 6),
+        'runs': repeat,
+        'rows': rows(value) if callable(rows) else rows,
+        'peak_rss_bytes': _peak_rss(),
+    }
+    print(f"  {name}: {results[name]['seconds']:.4f} detik", flush=True)
+    return value
+
+
+def _seed_history(symbols, rows_per_symbol):
+    """Mengisi histori prediksi: separuh sudah dievaluasi, separuh menunggu evaluasi."""
+    import pandas as pd
+    import history_store
+    from config import PREDICTION_HORIZON
+
+    rng = np.random.default_rng(1)
+    now = pd.Timestamp.now().floor('h')
+    records = []
+    for symbol in symbols:
+        for k in range(rows_per_symbol):
+            price = _BASE_PRICES.get(template_symbol(symbol), 100.0)
+            records.append({
+                'timestamp': (now - pd.Timedelta(hours=PREDICTION_HORIZON + 2 * k)).strftime("%Y-%m-%d %H:%M:%S"),
+                'symbol': symbol, 'current_price': price, 'predicted_price': price * (1 + rng.normal(0, 0.002)),
+                'predicted_trend': rng.choice(["Naik", "Turun", "Netral"]), 'confidence': 60 + 30 * rng.random(),
+                'horizon': PREDICTION_HORIZON, 'adjusted_threshold': 75.0,
+            })
+    history_store.insert_predictions(records)
+    history = history_store.load_history()
+    evaluated = history.iloc[: len(history) // 2]
+    history_store.update_outcomes(pd.DataFrame({
+        'actual_price': evaluated['current_price'],
+        'actual_trend': evaluated['predicted_trend'],
+        'is_correct': rng.random(len(evaluated)) < 0.55,
+    }, index=evaluated.index))
+    return len(history)
+
+
+def run_scale(scale, base_url, root, history_rows):
+    """Isi proses anak: menjalankan seluruh benchmark untuk `scale` simbol dan mengembalikan hasilnya."""
+    import config
+
+    symbols = symbol_universe(scale, config.SYMBOLS)
+    _isolate_config(root, base_url, symbols)
+
+    import pandas as pd
+    import main
+    import data_cache
+    from config import BAR_STORE_DIR, FEATURES, SEQUENCE_LENGTH
+    from data_collector import get_historical_data, get_historical_data_many, get_sentiment_data
+    from feature_engine import create_lstm_features, prepare_sequences
+    from predictor import get_prediction, get_predictions
+    from performance_analyzer import analyze_performance
+    from dataset_builder import FeatureNormalizer
+    from model_registry import get_backend
+
+    main.send_telegram_notification = lambda *args, **kwargs: None
+    # Simbol sintetis memakai scaler simbol acuannya pada normalisasi per simbol.
+    original_key = FeatureNormalizer._key
+    FeatureNormalizer._key = lambda self, symbol: original_key(self, template_symbol(symbol))
+
+    results = {}
+    print(f"Skala {scale} simbol:", flush=True)
+
+    # Siklus penuh: proses baru, store & cache kosong, model belum dimuat.
+    cold = _measure(results, 'main_cycle_cold', main.main, rows=lambda s: s['predictions'])
+    results['main_cycle_cold']['stages'] = cold.get('stage_seconds', {})
+    warm = _measure(results, 'main_cycle_warm', main.main, rows=lambda s: s['predictions'])
+    results['main_cycle_warm']['stages'] = warm.get('stage_seconds', {})
+
+    shutil.rmtree(BAR_STORE_DIR, ignore_errors=True)
+    count_rows = lambda data: sum(len(df) for df in data.values())
+    data = _measure(results, 'get_historical_data_many_cold',
+                    lambda: get_historical_data_many(symbols, interval="1h", outputsize=500), rows=count_rows)
+    _measure(results, 'get_historical_data_many_warm',
+             lambda: get_historical_data_many(symbols, interval="1h", outputsize=500), rows=count_rows)
+    _measure(results, 'get_historical_data', lambda: get_historical_data(symbols[0], interval="1h", outputsize=500),
+             repeat=5, rows=len)
+
+    sentiment = get_sentiment_data()
+    frames = _measure(results, 'create_lstm_features',
+                      lambda: {s: create_lstm_features(df, sentiment) for s, df in data.items()},
+                      rows=count_rows)
+    _measure(results, 'create_lstm_features_streaming',
+             lambda: {s: create_lstm_features(df, sentiment, symbol=s) for s, df in data.items()},
+             rows=count_rows)
+    arrays = [(df[FEATURES].to_numpy(dtype=np.float32), df[['future_price']].to_numpy(dtype=np.float32))
+              for df in frames.values() if not df.empty]
+    _measure(results, 'prepare_sequences',
+             lambda: [np.ascontiguousarray(prepare_sequences(X, y, SEQUENCE_LENGTH)[0]) for X, y in arrays],
+             repeat=3, rows=lambda seqs: sum(len(s) for s in seqs))
+
+    data_cache.clear_cache(use_disk=True)
+    _measure(results, 'get_prediction_cold', lambda: get_prediction(symbols[0]))
+    _measure(results, 'get_prediction_cached', lambda: get_prediction(symbols[0]), repeat=5)
+    data_cache.clear_cache(use_disk=True)
+    _measure(results, 'get_predictions_all', lambda: get_predictions(symbols), rows=len)
+
+    seeded = _seed_history(symbols, history_rows)
+    _measure(results, 'analyze_performance', analyze_performance, rows=seeded)
+
+    return {
+        'symbols': scale,
+        'backend': get_backend(),
+        'peak_rss_bytes': _peak_rss(),
+        'benchmarks': results,
+        'pandas': pd.__version__,
+    }
+
+
+# --- Proses induk ---
+
+def _git(*args):
+    try:
+        return subprocess.run(['git', *args], cwd=REPO_DIR, capture_output=True, text=True,
+                              timeout=30).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _run_child(scale, base_url, args):
+    root = tempfile.mkdtemp(prefix=f"d1t_bench_{scale}_")
+    result_path = os.path.join(root, 'result.json')
+    log_path = os.path.join(root, 'child.log')
+    cmd = [sys.executable, os.path.abspath(__file__), '--child', '--scale', str(scale), '--base-url', base_url,
+           '--root', root, '--history-rows', str(args.history_rows), '--result-file', result_path]
+    env = dict(os.environ, TF_CPP_MIN_LOG_LEVEL='2')
+    try:
+        with open(log_path, 'w') as log:
+            proc = subprocess.Popen(cmd, cwd=REPO_DIR, env=env, stdout=subprocess.PIPE, stderr=log, text=True)
+            for line in proc.stdout:
+                print(line, end='', flush=True)
+            returncode = proc.wait()
+        if returncode != 0 or not os.path.exists(result_path):
+            with open(log_path) as log:
+                tail = log.read()[-4000:]
+            raise RuntimeError(f"Benchmark skala {scale} gagal (exit {returncode}). Log terakhir:\n{tail}")
+        with open(result_path) as f:
+            return json.load(f)
+    finally:
+        if args.keep:
+            print(f"  Direktori kerja disimpan di {root}")
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+def compare_reports(current, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Mencetak perbandingan dengan baseline; mengembalikan daftar regresi."""
+    regressions = []
+    print(f"\nPerbandingan dengan baseline {baseline.get('git_commit', '?')[:10]} "
+          f"(toleransi {tolerance:.0%}):")
+    print(f"{'skala':>6}  {'benchmark':<34} {'baseline':>10} {'sekarang':>10} {'rasio':>7}")
+    for scale, result in current['scales'].items():
+        base = baseline.get('scales', {}).get(scale)
+        if base is None:
+            continue
+        for name, entry in result['benchmarks'].items():
+            base_entry = base['benchmarks'].get(name)
+            if base_entry is None:
+                continue
+            ratio = entry['seconds'] / base_entry['seconds'] if base_entry['seconds'] > 0 else float('inf')
+            regressed = ratio > 1 + tolerance and entry['seconds'] > NOISE_FLOOR_SECONDS
+            if regressed:
+                regressions.append((scale, name, ratio))
+            print(f"{scale:>6}  {name:<34} {base_entry['seconds']:>10.4f} {entry['seconds']:>10.4f} "
+                  f"{ratio:>6.2f}x{'  REGRESI' if regressed else ''}")
+        rss_ratio = result['peak_rss_bytes'] / base['peak_rss_bytes'] if base.get('peak_rss_bytes') else 1.0
+        if rss_ratio > 1 + tolerance:
+            regressions.append((scale, 'peak_rss_bytes', rss_ratio))
+        print(f"{scale:>6}  {'peak_rss_mib':<34} {base['peak_rss_bytes'] / 2**20:>10.1f} "
+              f"{result['peak_rss_bytes'] / 2**20:>10.1f} {rss_ratio:>6.2f}x"
+              f"{'  REGRESI' if rss_ratio > 1 + tolerance else ''}")
+    return regressions
+
+
+def _print_summary(report):
+    scales = list(report['scales'])
+    names = list(dict.fromkeys(name for r in report['scales'].values() for name in r['benchmarks']))
+    print(f"\n{'benchmark (detik)':<34}" + ''.join(f"{s + ' simbol':>14}" for s in scales))
+    for name in names:
+        cells = [report['scales'][s]['benchmarks'].get(name, {}).get('seconds') for s in scales]
+        print(f"{name:<34}" + ''.join(f"{c:>14.4f}" if c is not None else f"{'-':>14}" for c in cells))
+    print(f"{'peak_rss_mib':<34}" + ''.join(f"{report['scales'][s]['peak_rss_bytes'] / 2**20:>14.1f}"
+                                          for s in scales))
+
+
+def run_benchmarks(args):
+    market = SyntheticMarket(args.bars)
+    server, base_url = start_stub_server(market, latency=args.latency_ms / 1000)
+    report = {
+        'created_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'git_commit': _git('rev-parse', 'HEAD'),
+        'git_dirty': bool(_git('status', '--porcelain', '--untracked-files=no')),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'parameters': {'bars': args.bars, 'history_rows': args.history_rows, 'latency_ms': args.latency_ms},
+        'scales': {},
+    }
+    try:
+        for scale in args.scales:
+            report['scales'][str(scale)] = _run_child(scale, base_url, args)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    _print_summary(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nHasil benchmark disimpan di {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_reports(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regresi performa terdeteksi.")
+            return 1
+    return 0
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark offline D-1T dengan data & API sintetis.")
+    parser.add_argument('--scales', default='7,100,1000',
+                        type=lambda s: [int(x) for x in s.split(',') if x.strip()],
+                        help="jumlah simbol per skala, dipisah koma (default 7,100,1000)")
+    parser.add_argument('--bars', type=int, default=3000, help="panjang deret OHLCV sintetis per simbol (jam)")
+    parser.add_argument('--history-rows', type=int, default=20,
+                        help="jumlah prediksi histori per simbol untuk analyze_performance")
+    parser.add_argument('--latency-ms', type=float, default=0.0,
+                        help="latensi tambahan setiap respons server pengganti API")
+    parser.add_argument('--output', help="file JSON hasil benchmark")
+    parser.add_argument('--compare', help="file JSON baseline untuk dibandingkan")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="batas kenaikan relatif sebelum dianggap regresi (default 0.25)")
+    parser.add_argument('--keep', action='store_true', help="jangan hapus direktori kerja setiap skala")
+    # Argumen internal untuk proses anak.
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--scale', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--base-url', help=argparse.SUPPRESS)
+    parser.add_argument('--root', help=argparse.SUPPRESS)
+    parser.add_argument('--result-file', help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    if args.child:
+        result = run_scale(args.scale, args.base_url, args.root, args.history_rows)
+        with open(args.result_file, 'w') as f:
+            json.dump(result, f)
+    else:
+        sys.exit(run_benchmarks(args))
@@ -2,6 +2,7 @@
 
 # -- Konfigurasi API --
 TWELVE_DATA_API_KEY = "MASUKKAN_API_KEY_ANDA_DISINI"
+TWELVE_DATA_BASE_URL = "https://api.twelvedata.com"
 FEAR_GREED_API_URL = 'https://api.alternative.me/fng/?limit=90'
 
 # -- Konfigurasi Aset & Simbol --
@@ -41,21 +42,139 @@ FEATURES = [
     'bbu_20_2.0',
     # ----------------------------------------------------
     'sentiment_value'
+    # Fitur multi-timeframe (lihat MTF_TIMEFRAMES di bawah) bisa ditambahkan,
+    # mis. 'rsi_14_1d', 'ema_50_4h', 'close_1d'; model harus dilatih ulang.
 ]
 SEQUENCE_LENGTH = 24
 PREDICTION_HORIZON = 4
 
+# Backend perhitungan indikator batch: "numpy" (kernel bawaan, default) atau
+# "pandas_ta" (dependensi opsional, perlu `pip install pandas-ta`).
+INDICATOR_BACKEND = "numpy"
+
+# Indikator untuk prediksi diperbarui per bar dari state tersimpan (O(1) per bar
+# baru) alih-alih dihitung ulang dari seluruh data setiap siklus.
+STREAMING_INDICATORS = True
+INDICATOR_STATE_DIR = "/tmp/d1t_indicator_state"
+INDICATOR_STREAM_HISTORY = 500  # jumlah baris output indikator terakhir yang disimpan
+
+# Timeframe lebih tinggi diturunkan dari bar 1h (resample.py), tanpa request
+# API tambahan. Fitur MTF bernama <indikator atau open/high/low/close>_<sufiks>;
+# nilainya diambil dari bar timeframe tinggi terakhir yang sudah tutup.
+# Indikator harian butuh cukup bar 1h (mis. rsi_14_1d >= 15 hari).
+MTF_TIMEFRAMES = {'4h': '4h', '1d': '1day'}  # sufiks fitur -> interval
+MTF_SESSION_OFFSET_HOURS = 0  # awal bucket harian dalam jam UTC (mis. 22 = penutupan sesi New York)
+LOCAL_RESAMPLING = True  # get_historical_data(interval='4h'/'1day') diturunkan dari bar 1h tersimpan jika cukup
+
+# Fitur lintas aset (cross_asset.py), dihitung sekali per siklus dari data semua
+# simbol dan hanya jika diminta di FEATURES: 'usd_strength_24' (komposit
+# kekuatan USD ala DXY), 'usd_corr_24' (korelasi bergulir dengan komposit itu),
+# 'rel_return_24' (return relatif terhadap rata-rata semua simbol).
+CROSS_ASSET_WINDOW = 24  # jendela bergulir dalam bar; juga menjadi sufiks nama fitur
+
 # -- Konfigurasi Path File --
 MODELS_DIR = "models"
 LOGS_DIR = "logs"
 MODEL_PATH = f"{MODELS_DIR}/lstm_forex_model.keras"
 SCALER_X_PATH = f"{MODELS_DIR}/scaler_x.pkl"
 SCALER_Y_PATH = f"{MODELS_DIR}/scaler_y.pkl"
+# Normalisasi fitur: "per_symbol" (scaler per simbol), "returns" (fitur harga
+# relatif terhadap close, satu scaler bersama), atau "global" (perilaku lama).
+# Model di models/ masih dilatih dengan "global"; ganti ke "per_symbol" bersamaan
+# dengan melatih ulang model (train_model.py menulis normalizer & bundle baru).
+NORMALIZATION_MODE = "global"
+NORMALIZER_PATH = f"{MODELS_DIR}/normalizer.joblib"
+# Bobot model dalam format NumPy (.npz) untuk inferensi tanpa TensorFlow.
+# Dibuat oleh `python numpy_lstm.py` atau otomatis setelah training.
+NUMPY_MODEL_PATH = f"{MODELS_DIR}/lstm_forex_model.npz"
+NUMPY_MODEL_DTYPE = "float32"  # "float16" untuk file bobot setengah ukuran
+# Bundle model tunggal (bobot ter-memory-map, parameter scaler, skema fitur,
+# horizon, dan hash isi) yang ditulis train_model.py.
+MODEL_BUNDLE_PATH = f"{MODELS_DIR}/lstm_forex_model.d1t"
+# Backend inferensi: "auto" (bundle jika ada, lalu Keras jika TensorFlow
+# terpasang, selain itu NumPy), "bundle", "keras", atau "numpy".
+INFERENCE_BACKEND = "auto"
 # Lingkungan serverless Vercel hanya bisa menulis ke direktori /tmp
-HISTORY_FILE = "/tmp/prediction_history.csv"
+HISTORY_FILE = "/tmp/prediction_history.csv"  # format lama, hanya untuk migrasi satu kali
+HISTORY_DB = "/tmp/prediction_history.db"  # SQLite (WAL) berindeks untuk histori prediksi
 
 # -- Konfigurasi API Sentimen --
 FEAR_GREED_API_URL = 'https://api.alternative.me/fng/?limit=90'
+# Nilai Fear & Greed harian diselaraskan as-of ke setiap bar (nilai terakhir
+# yang sudah terbit). Nilai yang lebih tua dari batas ini dianggap tidak ada
+# dan diisi nilai netral.
+SENTIMENT_MAX_STALENESS_HOURS = 48
+SENTIMENT_NEUTRAL_VALUE = 50.0
+
+# -- Konfigurasi Pengambilan Data --
+FETCH_MAX_WORKERS = 8  # batas jumlah request paralel ke Twelve Data
+HTTP_TIMEOUT = 30  # detik
+TWELVE_DATA_MAX_OUTPUTSIZE = 5000  # batas jumlah bar per request time_series
+# Jumlah simbol per request time_series multi-simbol (dipisah koma); 1 = satu
+# request per simbol. Setiap simbol dalam batch tetap memakai satu kredit.
+TWELVE_DATA_BATCH_SIZE = 8
+# Kredit Twelve Data per menit (paket gratis: 8; satu kredit per simbol per
+# request time_series). Semua request dibagi lewat satu token bucket; 0 = tanpa batas.
+TWELVE_DATA_CREDITS_PER_MINUTE = 8
+FETCH_MAX_ATTEMPTS = 3  # percobaan untuk error selain rate limit
+FETCH_MAX_RATE_LIMIT_RETRIES = 5  # respons 429 tidak menghabiskan jatah FETCH_MAX_ATTEMPTS
+FETCH_BACKOFF_BASE = 5.0  # detik; jeda retry ke-n acak antara 1/2 dan 1 kali base * 2^(n-1)
+FETCH_BACKOFF_MAX = 60.0
+
+# -- Konfigurasi Transport HTTP --
+# "live" (langsung ke API), "record" (langsung ke API dan setiap respons
+# disimpan terkompresi), atau "replay" (dilayani dari rekaman tanpa jaringan
+# dan tanpa jeda retry). Env D1T_TRANSPORT_MODE menimpa nilai ini.
+TRANSPORT_MODE = "live"
+TRANSPORT_RECORD_DIR = "/tmp/d1t_recordings"
+
+# -- Konfigurasi Bar Store Lokal --
+# Bar OHLCV disimpan per simbol & interval sehingga setiap run hanya mengunduh
+# bar baru sejak timestamp terakhir yang tersimpan.
+BAR_STORE_ENABLED = True
+BAR_STORE_DIR = "/tmp/d1t_bars"
+BAR_STORE_MAX_ROWS = 50000
+
+# -- Konfigurasi Backfill Historis (`python backfill.py`) --
+# Data historis bertahun-tahun untuk training, diunduh per potongan
+# start_date/end_date dan disimpan sebagai arsip terkompresi per simbol.
+BACKFILL_DIR = "data/backfill"
+BACKFILL_START = "2020-01-01"
+TRAIN_USE_BACKFILL = True  # train_model.py & backtest.py menyambung arsip backfill jika tersedia
+
+# -- Konfigurasi Cache Data --
+# Cache memori (dan opsional disk di /tmp) untuk respons API yang jarang berubah.
+CACHE_DIR = "/tmp/d1t_cache"
+CACHE_USE_DISK = True
+SENTIMENT_CACHE_TTL = 6 * 60 * 60  # detik; data Fear & Greed hanya berubah sekali sehari
+OHLCV_CACHE_TTL = 0  # detik; 0 = cache data harga nonaktif
+# Hasil prediksi di-cache per (simbol, timestamp bar terakhir, hash model):
+# selama belum ada bar baru yang tutup, prediksi tidak dihitung ulang.
+PREDICTION_CACHE_ENABLED = True
+PREDICTION_CACHE_TTL = 24 * 60 * 60  # detik; batas umur entri sebagai pengaman
+
+# -- Konfigurasi Scheduler (mode daemon: `python main.py --daemon`) --
+SCHEDULER_INTERVAL = "1h"  # siklus dijalankan setiap bar interval ini tutup
+SCHEDULER_BAR_CLOSE_DELAY = 60  # detik setelah bar tutup, memberi waktu data bar final tersedia
+SCHEDULER_JITTER = 30  # detik; jeda acak tambahan
+SCHEDULER_RUN_ON_START = True
+SCHEDULER_HEALTH_PORT = 8080  # 0 = endpoint HTTP /health nonaktif
+SCHEDULER_HEALTH_FILE = "/tmp/d1t_scheduler_health.json"
+SCHEDULER_MAX_FAILURES = 3  # status "unhealthy" setelah sekian siklus gagal berturut-turut
+
+# -- Konfigurasi Instrumentasi --
+# Metrik per tahap setiap siklus: satu baris JSON per siklus dan textfile
+# Prometheus (untuk node_exporter textfile collector). Profiling diaktifkan
+# lewat env D1T_PROFILE=cprofile,tracemalloc.
+METRICS_ENABLED = True
+METRICS_JSONL_PATH = "/tmp/d1t_metrics.jsonl"
+METRICS_PROM_PATH = "/tmp/d1t_metrics.prom"
+PROFILE_DIR = "/tmp/d1t_profiles"
+
+# -- Konfigurasi Backtest (`python backtest.py`) --
+BACKTEST_WORKERS = 0  # jumlah proses paralel (satu simbol per proses); 0 = jumlah CPU
+BACKTEST_BATCH_SIZE = 4096  # jumlah jendela per forward pass
+BACKTEST_SLTP_BARS = 24  # jumlah bar ke depan untuk menilai apakah SL/TP tersentuh
 
 # -- Konfigurasi Notifikasi Telegram --
 TELEGRAM_BOT_TOKEN = "ISI_TOKEN_ANDA_DISINI"
@@ -68,5 +187,9 @@ MIN_CONFIDENCE = 60.0
 MAX_CONFIDENCE = 90.0
 ACCURACY_LOOKBACK = 50
 PERFORMANCE_THRESHOLD = 0.5
+PREDICTION_EXPIRY_DAYS = 4  # prediksi yang targetnya lebih tua dari ini tanpa bar pencocok ditandai kedaluwarsa
+TREND_THRESHOLD_PERCENT = 0.1  # perubahan harga (%) minimum untuk tren "Naik"/"Turun"
+SL_ATR_MULTIPLIER = 1.5  # stop loss = harga -/+ 1.5 x ATR
+TP_ATR_MULTIPLIER = 2.0  # take profit = harga +/- 2.0 x ATR
 
 
@@ -0,0 +1,147 @@
+# cross_asset.py
+import numpy as np
+import pandas as pd
+
+from config import CROSS_ASSET_WINDOW, FEATURES
+
+# Fitur lintas aset yang dihitung sekali per siklus dari data semua simbol:
+# close seluruh simbol diselaraskan menjadi satu matriks (waktu x simbol), lalu
+# semua statistik bergulir dihitung dengan selisih cumsum di sepanjang sumbu
+# waktu. Setiap simbol hanya dibandingkan dengan faktor bersama (komposit
+# kekuatan USD dan rata-rata lintas simbol), sehingga biaya tumbuh linear
+# terhadap jumlah simbol, bukan kuadratik seperti korelasi berpasangan.
+
+# Kaki non-mata uang; pair-nya tidak ikut komposit kekuatan USD (seperti DXY).
+_NON_CURRENCY = {'XAU', 'XAG', 'XPT', 'XPD'}
+
+
+def cross_asset_columns(window=CROSS_ASSET_WINDOW):
+    """Nama kolom fitur lintas aset untuk jendela `window` bar."""
+    return [f"usd_strength_{window}", f"usd_corr_{window}", f"rel_return_{window}"]
+
+
+def is_requested(features=None, window=CROSS_ASSET_WINDOW):
+    """True jika salah satu fitur lintas aset ada di `features` (default config.FEATURES)."""
+    return any(col in (features or FEATURES) for col in cross_asset_columns(window))
+
+
+def usd_exposure(symbol):
+    """+1 jika USD mata uang dasar (USD/JPY), -1 jika kuotasi (EUR/USD), 0 jika tidak ada USD atau logam."""
+    base, _, quote = symbol.partition('/')
+    if base in _NON_CURRENCY or quote in _NON_CURRENCY:
+        return 0.0
+    return 1.0 if base == 'USD' else -1.0 if quote == 'USD' else 0.0
+
+
+def _rolling_sum(values, window):
+    """Jumlah bergulir sepanjang sumbu 0 lewat selisih cumsum (O(n), tanpa loop per baris)."""
+    cumsum = np.cumsum(values, axis=0)
+    out = cumsum.copy()
+    out[window:] = cumsum[window:] - cumsum[:-window]
+    return out
+
+
+def _close_matrix(frames):
+    """(indeks gabungan, matriks close waktu x simbol) dengan forward fill per kolom."""
+    index = pd.DatetimeIndex(np.unique(np.concatenate([df.index.to_numpy() for df in frames.values()])))
+    close = np.full((len(index), len(frames)), np.nan)
+    for j, df in enumerate(frames.values()):
+        close[index.get_indexer(df.index), j] = df['close'].to_numpy(dtype=np.float64)
+    # Forward fill vektorisasi: posisi baris valid terakhir untuk setiap sel.
+    rows = np.where(~np.isnan(close), np.arange(len(index))[:, None], 0)
+    close = np.take_along_axis(close, np.maximum.accumulate(rows, axis=0), axis=0)
+    return index, close
+
+
+def compute_cross_asset(data, window=CROSS_ASSET_WINDOW):
+    """
+    Fitur lintas aset untuk dict {simbol: DataFrame OHLCV}:
+    - usd_strength_<w>: log return komposit kekuatan USD selama w bar (rata-rata
+      return pair ber-USD dengan tanda menurut posisi USD), sama untuk semua simbol;
+    - usd_corr_<w>: korelasi bergulir return simbol dengan komposit tersebut;
+    - rel_return_<w>: log return w bar simbol dikurangi rata-rata semua simbol.
+    Nilai pada bar t hanya memakai bar <= t. Mengembalikan dict {simbol:
+    DataFrame berindeks sama dengan data simbol tersebut}; kosong jika simbol
+    valid kurang dari dua.
+    """
+    frames = {symbol: df for symbol, df in data.items()
+              if isinstance(df, pd.DataFrame) and not df.empty and 'close' in df.columns}
+    if len(frames) < 2:
+        return {}
+    symbols = list(frames)
+    index, close = _close_matrix(frames)
+
+    # Sebelum bar pertama suatu simbol, return-nya tidak dihitung.
+    returns = np.diff(np.log(close), axis=0, prepend=np.nan)
+    valid = ~np.isnan(returns)
+    returns = np.where(valid, returns, 0.0)
+
+    exposure = np.array([usd_exposure(symbol) for symbol in symbols])
+    usd_valid = valid & (exposure != 0)
+    usd_count = usd_valid.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        usd = np.where(usd_count > 0, (returns * exposure * usd_valid).sum(axis=1) / usd_count, 0.0)
+
+        # Korelasi bergulir dengan komposit USD dari jumlah bergulir x, y, x², y², xy.
+        y = usd[:, None]
+        n = _rolling_sum(valid.astype(np.float64), window)
+        sx, sy = _rolling_sum(returns, window), _rolling_sum(y * valid, window)
+        sxx, syy = _rolling_sum(returns ** 2, window), _rolling_sum(y ** 2 * valid, window)
+        sxy = _rolling_sum(returns * y, window)
+        cov = sxy - sx * sy / n
+        var_x, var_y = sxx - sx ** 2 / n, syy - sy ** 2 / n
+        corr = cov / np.sqrt(var_x * var_y)
+        corr[(n < window) | (var_x <= 1e-18) | (var_y <= 1e-18)] = np.nan
+
+        window_returns = np.where(n >= window, sx, np.nan)
+        complete = ~np.isnan(window_returns)
+        mean_return = (np.where(complete, window_returns, 0.0).sum(axis=1, keepdims=True)
+                       / complete.sum(axis=1, keepdims=True))
+        relative = window_returns - mean_return
+
+    strength = _rolling_sum(usd, window)
+    strength[:window] = np.nan
+    strength[_rolling_sum(usd_count > 0, window) < window] = np.nan
+
+    strength_col, corr_col, relative_col = cross_asset_columns(window)
+    result = {}
+    for j, symbol in enumerate(symbols):
+        rows = index.get_indexer(frames[symbol].index)
+        result[symbol] = pd.DataFrame({strength_col: strength[rows], corr_col: corr[rows, j],
+                                       relative_col: relative[rows, j]}, index=frames[symbol].index)
+    return result
+
+
+if __name__ == "__main__":
+    import time
+    import warnings
+
+    # Paritas dengan pandas rolling dan skala terhadap jumlah simbol.
+    rng = np.random.default_rng(0)
+    index = pd.date_range("2020-01-01", periods=20_000, freq="h")
+
+    def make_data(n_symbols):
+        data = {}
+        for i in range(n_symbols):
+            symbol = ["EUR/USD", "USD/JPY", "XAU/USD", "GBP/JPY"][i % 4] + ("" if i < 4 else f"#{i}")
+            close = np.exp(np.cumsum(rng.normal(0, 0.001, len(index))))
+            data[symbol] = pd.DataFrame({'close': close}, index=index).drop(index[50 + i:60 + i])
+        return data
+
+    data = make_data(4)
+    features = compute_cross_asset(data, 24)
+    frame = pd.DataFrame({s: df['close'] for s, df in data.items()}).ffill()
+    returns = np.log(frame).diff()
+    usd = (returns * [usd_exposure(s) for s in frame]).sum(axis=1, min_count=1) / 2
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        expected_corr = returns['EUR/USD'].rolling(24).corr(usd)
+    ours = features['EUR/USD']['usd_corr_24'].reindex(frame.index)
+    mask = ours.notna() & expected_corr.notna()
+    print(f"usd_corr cocok dengan pandas rolling: {np.allclose(ours[mask], expected_corr[mask], atol=1e-6)}")
+
+    for n_symbols in (8, 32, 128):
+        data = make_data(n_symbols)
+        start = time.perf_counter()
+        compute_cross_asset(data, 24)
+        print(f"{n_symbols:>4} simbol x {len(index)} bar: {(time.perf_counter() - start) * 1000:.0f} ms")
@@ -0,0 +1,140 @@
+# data_cache.py
+import os
+import time
+import pickle
+import hashlib
+import logging
+import threading
+
+from config import CACHE_DIR, CACHE_USE_DISK
+
+# Cache memori: key -> (waktu disimpan, nilai). Key berupa tuple yang elemen
+# pertamanya adalah namespace, misalnya ('sentiment', url).
+_memory = {}
+_lock = threading.RLock()
+_stats = {}
+
+
+def _count(key, field):
+    namespace = key[0] if isinstance(key, tuple) and key else str(key)
+    with _lock:
+        ns_stats = _stats.setdefault(namespace, {'hits': 0, 'misses': 0, 'stale_served': 0, 'fetch_errors': 0})
+        ns_stats[field] += 1
+
+
+def _disk_path(key):
+    digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+    return os.path.join(CACHE_DIR, f"{digest}.pkl")
+
+
+def _is_valid(value):
+    """Nilai None atau DataFrame kosong dianggap sebagai kegagalan fetch."""
+    return value is not None and not getattr(value, 'empty', False)
+
+
+def _read_entry(key, use_disk):
+    """Mengembalikan (waktu disimpan, nilai) dari memori atau disk, tanpa memeriksa TTL."""
+    with _lock:
+        entry = _memory.get(key)
+    if entry is not None or not use_disk:
+        return entry
+
+    path = _disk_path(key)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            stored_key, stored_at, value = pickle.load(f)
+        if stored_key != key:
+            return None
+    except Exception as e:
+        logging.warning(f"Gagal membaca cache disk {path}: {e}")
+        return None
+
+    with _lock:
+        _memory[key] = (stored_at, value)
+    return stored_at, value
+
+
+def get_cached(key, ttl, use_disk=CACHE_USE_DISK, count=False):
+    """
+    Mengembalikan nilai yang masih berlaku (umur <= ttl detik), atau None.
+    Jika `count`, hasil pencarian dicatat sebagai hit/miss di statistik namespace.
+    """
+    entry = _read_entry(key, use_disk)
+    value = None
+    if entry is not None and time.time() - entry[0] <= ttl:
+        value = entry[1]
+    if count:
+        _count(key, 'hits' if value is not None else 'misses')
+    return value
+
+
+def set_cached(key, value, use_disk=CACHE_USE_DISK):
+    """Menyimpan nilai ke memori dan, jika diaktifkan, ke disk."""
+    stored_at = time.time()
+    with _lock:
+        _memory[key] = (stored_at, value)
+    if not use_disk:
+        return
+
+    path = _disk_path(key)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            pickle.dump((key, stored_at, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logging.warning(f"Gagal menulis cache disk {path}: {e}")
+
+
+def get_or_fetch(key, fetch_fn, ttl, use_disk=CACHE_USE_DISK, is_valid=_is_valid):
+    """
+    Mengembalikan nilai dari cache jika masih berlaku. Jika tidak, memanggil
+    `fetch_fn()` dan menyimpan hasilnya. Bila fetch gagal (exception atau hasil
+    tidak valid), data lama (stale) dikembalikan jika tersedia.
+    """
+    value = get_cached(key, ttl, use_disk)
+    if value is not None:
+        _count(key, 'hits')
+        return value
+
+    _count(key, 'misses')
+    try:
+        value = fetch_fn()
+    except Exception as e:
+        logging.warning(f"Fetch untuk cache {key[0] if isinstance(key, tuple) else key} gagal: {e}")
+        value = None
+
+    if is_valid(value):
+        set_cached(key, value, use_disk)
+        return value
+
+    _count(key, 'fetch_errors')
+    entry = _read_entry(key, use_disk)
+    if entry is not None:
+        stored_at, stale_value = entry
+        _count(key, 'stale_served')
+        logging.warning(f"Menggunakan data cache lama (umur {time.time() - stored_at:.0f} detik) karena fetch gagal.")
+        return stale_value
+    return value
+
+
+def get_cache_stats():
+    """Mengembalikan salinan statistik cache per namespace."""
+    with _lock:
+        return {ns: dict(values) for ns, values in _stats.items()}
+
+
+def clear_cache(use_disk=False):
+    """Mengosongkan cache memori, dan opsional juga file cache di disk."""
+    with _lock:
+        _memory.clear()
+    if use_disk and os.path.isdir(CACHE_DIR):
+        for name in os.listdir(CACHE_DIR):
+            if name.endswith('.pkl'):
+                try:
+                    os.remove(os.path.join(CACHE_DIR, name))
+                except OSError:
+                    pass
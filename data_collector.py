@@ -3,71 +3,434 @@ import requests
 import pandas as pd
 import logging
 import time
-from config import TWELVE_DATA_API_KEY, FEAR_GREED_API_URL
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from config import (TWELVE_DATA_API_KEY, TWELVE_DATA_BASE_URL, FEAR_GREED_API_URL, FETCH_MAX_WORKERS,
+                    HTTP_TIMEOUT, SENTIMENT_CACHE_TTL, OHLCV_CACHE_TTL, BAR_STORE_ENABLED,
+                    FETCH_MAX_ATTEMPTS, FETCH_MAX_RATE_LIMIT_RETRIES, TWELVE_DATA_BATCH_SIZE, LOCAL_RESAMPLING)
+from data_cache import get_or_fetch, get_cached
+from instrumentation import record_http
+from rate_limiter import RateLimitedError, get_limiter, retry_after, backoff_delay
+import bar_store
+import resample
+import transport
 
-def get_historical_data(symbol, interval='1h', outputsize=500):
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """
+    Mengembalikan satu requests.Session bersama (keep-alive) untuk seluruh proses.
+    Ukuran pool koneksi disesuaikan dengan FETCH_MAX_WORKERS agar request paralel
+    tidak saling menunggu koneksi.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(FETCH_MAX_WORKERS, 1))
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+def _timed_get(endpoint, url, attempt=1, **kwargs):
+    """
+    GET lewat transport (live/record/replay, lihat transport.py) di atas session
+    bersama; latensi, status, dan retry dicatat ke instrumentation.
+    """
+    start = time.perf_counter()
+    try:
+        response = transport.fetch(url, get_session, **kwargs)
+    except Exception:
+        record_http(endpoint, time.perf_counter() - start, ok=False, attempt=attempt)
+        raise
+    record_http(endpoint, time.perf_counter() - start, response.status_code, response.status_code < 400, attempt)
+    return response
+
+def get_historical_data(symbol, interval='1h', outputsize=500, cache_ttl=None):
     """
     Mengambil data harga historis dari Twelve Data API.
     Fungsi ini sekarang menambahkan kolom 'volume' default untuk stabilitas.
+    Jika `cache_ttl` (atau OHLCV_CACHE_TTL di config) lebih dari 0, hasilnya
+    disimpan di cache bersama yang juga dipakai oleh data sentimen.
+    """
+    ttl = OHLCV_CACHE_TTL if cache_ttl is None else cache_ttl
+    if ttl <= 0:
+        return _get_bars(symbol, interval, outputsize)
+
+    df = get_or_fetch(('ohlcv', symbol, interval, outputsize),
+                      lambda: _get_bars(symbol, interval, outputsize), ttl)
+    return df.copy() if df is not None else pd.DataFrame()
+
+def _plan_fetch(symbol, interval, outputsize):
+    """
+    Menentukan (start_date, jumlah bar tersimpan) untuk satu simbol. start_date
+    berisi timestamp terakhir di bar store jika cukup bar baru saja yang perlu
+    diminta, atau None untuk unduhan penuh.
+    """
+    if not BAR_STORE_ENABLED:
+        return None, 0
+
+    last_ts = bar_store.last_timestamp(symbol, interval)
+    stored_count = bar_store.count_bars(symbol, interval) if last_ts is not None else 0
+
+    start_date = None
+    if last_ts is not None and stored_count >= outputsize:
+        bars_missing = (pd.Timestamp.now('UTC').tz_localize(None) - last_ts) / bar_store.interval_to_timedelta(interval)
+        if bars_missing < outputsize:
+            # Bar terakhir ikut diminta ulang karena saat disimpan mungkin belum tutup.
+            start_date = last_ts
+    return start_date, stored_count
+
+def _merge_bars(symbol, interval, outputsize, new_data, start_date, stored_count):
+    """Menggabungkan bar baru ke bar store dan mengembalikan `outputsize` bar terakhir."""
+    if not BAR_STORE_ENABLED:
+        return new_data
+    if new_data.empty and stored_count == 0:
+        return new_data
+    if new_data.empty:
+        logging.warning(f"Tidak ada data baru untuk {symbol}. Menggunakan {stored_count} bar dari store lokal.")
+    else:
+        bar_store.append_bars(symbol, interval, new_data)
+        if start_date is not None:
+            logging.info(f"Bar store {symbol}: {len(new_data)} bar baru sejak {start_date}.")
+
+    df = bar_store.load_bars(symbol, interval, tail=outputsize)
+    if df.empty:
+        # Store tidak bisa ditulis (mis. disk penuh); gunakan hasil request langsung.
+        return new_data
+    return df
+
+def _get_bars(symbol, interval, outputsize):
+    """
+    Mengembalikan `outputsize` bar terakhir. Jika bar store lokal aktif, hanya bar
+    sejak timestamp terakhir yang tersimpan yang diminta ke Twelve Data (lewat
+    `start_date`), lalu digabung dan dideduplikasi di store. Interval yang lebih
+    tinggi dari 1h diturunkan dari bar 1h tersimpan jika store cukup panjang
+    dan mutakhir (LOCAL_RESAMPLING).
+    """
+    if LOCAL_RESAMPLING and BAR_STORE_ENABLED and resample.can_resample(interval):
+        df = _resample_from_store(symbol, interval, outputsize)
+        if df is not None:
+            return df
+    start_date, stored_count = _plan_fetch(symbol, interval, outputsize)
+    new_data = _fetch_historical_data(symbol, interval, outputsize, start_date=start_date)
+    return _merge_bars(symbol, interval, outputsize, new_data, start_date, stored_count)
+
+def _resample_from_store(symbol, interval, outputsize):
+    """Bar `interval` dari bar 1h tersimpan, atau None jika store kurang panjang/sudah usang."""
+    last_ts = bar_store.last_timestamp(symbol, resample.BASE_INTERVAL)
+    if last_ts is None:
+        return None
+    step = bar_store.interval_to_timedelta(resample.BASE_INTERVAL)
+    if pd.Timestamp.now('UTC').tz_localize(None) - last_ts > 2 * step:
+        return None
+    df = resample.load_resampled(symbol, interval, outputsize)
+    if len(df) < outputsize:
+        return None
+    logging.info(f"{len(df)} bar {interval} untuk {symbol} diturunkan dari bar {resample.BASE_INTERVAL} tersimpan.")
+    return df
+
+def _request_twelve_data(url, params, attempt=1, credits=1):
+    """
+    Satu request Twelve Data lewat rate limiter kredit bersama. Respons rate
+    limit (HTTP 429 atau JSON code 429) menahan semua request berikutnya sampai
+    Retry-After lewat, lalu dilaporkan sebagai RateLimitedError.
     """
-    api_url = f"https://api.twelvedata.com/time_series"
+    replay = transport.is_replay()
+    if not replay:
+        get_limiter().acquire(credits)
+    response = _timed_get('time_series', url, attempt, params=params, timeout=HTTP_TIMEOUT)
+    try:
+        data = response.json()
+    except ValueError:
+        data = None
+    delay = retry_after(response, data)
+    if delay is not None:
+        if not replay:
+            get_limiter().block_for(delay)
+        message = data.get('message') if isinstance(data, dict) else None
+        raise RateLimitedError(delay, message)
+    response.raise_for_status()
+    if data is None:
+        raise ValueError("Respons Twelve Data bukan JSON.")
+    return data
+
+def _time_series_params(symbols, interval, outputsize, start_date, end_date=None):
     params = {
-        "symbol": symbol,
+        "symbol": ",".join(symbols),
         "interval": interval,
         "apikey": TWELVE_DATA_API_KEY,
         "outputsize": outputsize,
         "timezone": "UTC"
     }
-    for attempt in range(1, 4):
-        try:
-            response = requests.get(api_url, params=params)
-            response.raise_for_status()
-            data = response.json()
+    if start_date is not None:
+        params["start_date"] = pd.Timestamp(start_date).strftime("%Y-%m-%d %H:%M:%S")
+    if end_date is not None:
+        params["end_date"] = pd.Timestamp(end_date).strftime("%Y-%m-%d %H:%M:%S")
+    return params
+
+def _parse_time_series(data):
+    """Mengubah satu payload time_series Twelve Data menjadi DataFrame OHLCV berurutan kronologis."""
+    if data.get('status') != 'ok' or 'values' not in data:
+        raise ValueError(f"API response tidak valid: {data.get('message', 'No message')}")
+
+    df = pd.DataFrame(data['values'])
+    
+    # --- [PERBAIKAN] Penanganan Volume untuk Forex ---
+    # Twelve Data tidak menyediakan volume untuk FX spot, jadi kita buat kolom default.
+    # Ini memastikan konsistensi fitur dengan model yang sudah dilatih.
+    if 'volume' not in df.columns:
+        df['volume'] = 0.0
+    # --- AKHIR PERBAIKAN ---
+
+    # Ganti nama dan atur tipe data
+    df.rename(columns={'datetime': 'timestamp'}, inplace=True)
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    df.set_index('timestamp', inplace=True)
+    
+    numeric_cols = ['open', 'high', 'low', 'close', 'volume']
+    for col in numeric_cols:
+        df[col] = pd.to_numeric(df[col])
+
+    return df.iloc[::-1] # API mengembalikan data dari terbaru ke terlama, kita balik urutannya
+
+def _fetch_historical_data(symbol, interval, outputsize, start_date=None):
+    """Melakukan request ke Twelve Data tanpa cache untuk satu simbol."""
+    return _fetch_historical_data_batch([symbol], interval, outputsize, start_date)[symbol]
 
-            if data.get('status') != 'ok' or 'values' not in data:
+# Code error Twelve Data yang merupakan jawaban permanen tentang datanya (mis.
+# "no data is available on the specified dates"): simbol bernilai DataFrame kosong.
+_NO_DATA_CODES = {400}
+# Kunci API salah atau paket tidak mencakup request ini: bukan jawaban tentang
+# datanya dan tidak berubah jika langsung diulang, jadi simbol ditinggalkan
+# dari hasil tanpa dicoba ulang.
+_ACCOUNT_ERROR_CODES = {401, 403}
+
+def _error_code(data):
+    code = data.get('code') if isinstance(data, dict) else None
+    return code if isinstance(code, int) else None
+
+def cap_batch_size(batch_size):
+    """
+    Ukuran batch multi-simbol yang muat dalam kapasitas rate limiter: satu
+    request memakai satu kredit per simbol, dan limiter tidak bisa menagih
+    lebih dari kapasitasnya dalam satu acquire.
+    """
+    limiter = get_limiter()
+    if limiter.enabled and batch_size > limiter.capacity:
+        capped = max(1, int(limiter.capacity))
+        logging.warning(f"Ukuran batch {batch_size} melebihi {limiter.capacity:g} kredit/menit; "
+                        f"dibatasi menjadi {capped} simbol per request.")
+        return capped
+    return batch_size
+
+def _fetch_historical_data_batch(symbols, interval, outputsize, start_date=None, end_date=None):
+    """
+    Mengambil beberapa simbol dalam satu request time_series (daftar simbol
+    dipisah koma; respons berisi satu payload per simbol). Simbol yang gagal
+    tidak menggagalkan simbol lain: hanya simbol gagal yang dicoba ulang.
+    Error biasa dicoba ulang hingga FETCH_MAX_ATTEMPTS kali dengan exponential
+    backoff + jitter; respons rate limit dicoba ulang terpisah setelah kredit
+    tersedia kembali. Mengembalikan dict {simbol: DataFrame}; simbol yang gagal
+    bernilai DataFrame kosong.
+    """
+    results = fetch_time_series_batch(symbols, interval, outputsize, start_date, end_date)
+    return {symbol: results.get(symbol, pd.DataFrame()) for symbol in symbols}
+
+def fetch_time_series_batch(symbols, interval, outputsize, start_date=None, end_date=None):
+    """
+    Inti _fetch_historical_data_batch. Simbol yang dijawab API tanpa data
+    (code 400, mis. tidak ada data pada rentang tanggal) bernilai DataFrame
+    kosong. Simbol yang ditolak karena kunci API atau paket (401/403), terkena
+    rate limit terus-menerus, atau tetap gagal setelah semua percobaan tidak
+    ada dalam hasil, sehingga pemanggil (mis. backfill.py) bisa mencobanya
+    lagi nanti.
+    """
+    api_url = f"{TWELVE_DATA_BASE_URL}/time_series"
+    label = symbols[0] if len(symbols) == 1 else f"{len(symbols)} simbol ({symbols[0]}, ...)"
+    results = {}
+    pending = list(symbols)
+    failures = 0
+    rate_limited = 0
+    while pending:
+        attempt = failures + rate_limited + 1
+        try:
+            data = _request_twelve_data(api_url,
+                                        _time_series_params(pending, interval, outputsize, start_date, end_date),
+                                        attempt, credits=len(pending))
+            # Satu simbol: payload langsung; banyak simbol: {simbol: payload}.
+            # Penolakan kunci API/paket berlaku untuk semua simbol dalam request.
+            if len(pending) == 1 or _error_code(data) in _ACCOUNT_ERROR_CODES:
+                payloads = {symbol: data for symbol in pending}
+            else:
+                payloads = data
+            if len(pending) > 1 and not any(symbol in payloads for symbol in pending):
                 raise ValueError(f"API response tidak valid: {data.get('message', 'No message')}")
 
-            df = pd.DataFrame(data['values'])
-            
-            # --- [PERBAIKAN] Penanganan Volume untuk Forex ---
-            # Twelve Data tidak menyediakan volume untuk FX spot, jadi kita buat kolom default.
-            # Ini memastikan konsistensi fitur dengan model yang sudah dilatih.
-            if 'volume' not in df.columns:
-                df['volume'] = 0.0
-            # --- AKHIR PERBAIKAN ---
-
-            # Ganti nama dan atur tipe data
-            df.rename(columns={'datetime': 'timestamp'}, inplace=True)
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            df.set_index('timestamp', inplace=True)
-            
-            numeric_cols = ['open', 'high', 'low', 'close', 'volume']
-            for col in numeric_cols:
-                df[col] = pd.to_numeric(df[col])
-
-            df = df.iloc[::-1] # API mengembalikan data dari terbaru ke terlama, kita balik urutannya
-            
-            logging.info(f"Berhasil mengambil {len(df)} baris data untuk {symbol} dari Twelve Data.")
-            return df
+            failed = {}
+            limited = {}
+            for symbol in pending:
+                payload = payloads.get(symbol) or {'message': "Simbol tidak ada dalam respons batch."}
+                try:
+                    results[symbol] = _parse_time_series(payload)
+                    logging.info(f"Berhasil mengambil {len(results[symbol])} baris data untuk {symbol} dari Twelve Data.")
+                except Exception as e:
+                    code = _error_code(payload)
+                    if code == 429:
+                        limited[symbol] = retry_after(None, payload)
+                    elif code in _NO_DATA_CODES:
+                        logging.error(f"Gagal mengambil data untuk {symbol}: {e}")
+                        results[symbol] = pd.DataFrame()
+                    elif code in _ACCOUNT_ERROR_CODES:
+                        logging.error(f"Twelve Data menolak request {symbol} (code {code}, periksa kunci API "
+                                      f"atau paket): {e}")
+                    else:
+                        failed[symbol] = e
+            if limited:
+                # Rate limit per simbol di dalam batch: sama seperti 429 untuk seluruh request.
+                pending = [symbol for symbol in pending if symbol in failed or symbol in limited]
+                delay = max(limited.values())
+                if not transport.is_replay():
+                    get_limiter().block_for(delay)
+                raise RateLimitedError(delay, f"{len(limited)} simbol dalam batch terkena rate limit.")
+            if not failed:
+                break
+            pending = list(failed)
+            raise ValueError("; ".join(f"{symbol}: {e}" for symbol, e in failed.items()))
+
+        except RateLimitedError as e:
+            rate_limited += 1
+            label = pending[0] if len(pending) == 1 else f"{len(pending)} simbol ({pending[0]}, ...)"
+            if rate_limited > FETCH_MAX_RATE_LIMIT_RETRIES:
+                logging.error(f"Gagal mengambil data untuk {label}: rate limit terus berlanjut ({e}).")
+                break
+            logging.warning(f"Rate limit Twelve Data saat mengambil {label}; menunggu {e.retry_after:.1f} detik "
+                            f"({rate_limited}/{FETCH_MAX_RATE_LIMIT_RETRIES}).")
+            if transport.is_replay():
+                break
 
         except Exception as e:
-            logging.warning(f"Gagal mengambil data untuk {symbol} (percobaan {attempt}/3): {e}")
-            if attempt < 3:
-                time.sleep(5)
+            failures += 1
+            label = pending[0] if len(pending) == 1 else f"{len(pending)} simbol ({pending[0]}, ...)"
+            logging.warning(f"Gagal mengambil data untuk {label} (percobaan {failures}/{FETCH_MAX_ATTEMPTS}): {e}")
+            if failures >= FETCH_MAX_ATTEMPTS:
+                logging.error(f"Gagal total mengambil data untuk {label} setelah {FETCH_MAX_ATTEMPTS} percobaan.")
+                break
+            # Rekaman replay tidak berubah antar percobaan; tidak perlu menunggu.
+            if not transport.is_replay():
+                time.sleep(backoff_delay(failures))
+
+    return results
+
+def get_historical_data_many(symbols, interval='1h', outputsize=500, max_workers=None, batch_size=None):
+    """
+    Mengambil data historis untuk banyak simbol. Dengan TWELVE_DATA_BATCH_SIZE
+    (atau `batch_size`) lebih dari 1, simbol dikelompokkan menjadi request
+    multi-simbol sehingga jumlah round trip turun dari N menjadi
+    ceil(N / batch_size). Tanpa batch, setiap simbol diambil paralel memakai
+    thread pool di atas session HTTP bersama. Retry satu request hanya menahan
+    worker-nya sendiri. Mengembalikan dict {symbol: DataFrame}; simbol yang
+    gagal bernilai DataFrame kosong.
+    """
+    symbols = list(dict.fromkeys(symbols))
+    if not symbols:
+        return {}
+
+    batch_size = TWELVE_DATA_BATCH_SIZE if batch_size is None else batch_size
+    if batch_size > 1 and len(symbols) > 1:
+        return _get_historical_data_batched(symbols, interval, outputsize, batch_size, max_workers)
+
+    workers = min(max_workers or FETCH_MAX_WORKERS, len(symbols))
+    if workers <= 1:
+        return {symbol: get_historical_data(symbol, interval, outputsize) for symbol in symbols}
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fetch") as executor:
+        futures = {symbol: executor.submit(get_historical_data, symbol, interval, outputsize)
+                   for symbol in symbols}
+        for symbol, future in futures.items():
+            try:
+                results[symbol] = future.result()
+            except Exception as e:
+                logging.error(f"Gagal mengambil data untuk {symbol}: {e}")
+                results[symbol] = pd.DataFrame()
+    return results
+
+def _get_historical_data_batched(symbols, interval, outputsize, batch_size, max_workers=None):
+    """
+    Mode batch get_historical_data_many. Simbol yang masih ada di cache OHLCV
+    dilewati; sisanya dikelompokkan menurut start_date dari bar store (pada
+    run rutin semua simbol berbagi timestamp terakhir yang sama), dipecah per
+    `batch_size`, dan setiap batch diambil paralel.
+    """
+    ttl = OHLCV_CACHE_TTL
+    cache_key = lambda symbol: ('ohlcv', symbol, interval, outputsize)
+    to_fetch = [symbol for symbol in symbols if ttl <= 0 or get_cached(cache_key(symbol), ttl) is None]
+
+    plans = {symbol: _plan_fetch(symbol, interval, outputsize) for symbol in to_fetch}
+    groups = {}
+    for symbol in to_fetch:
+        groups.setdefault(plans[symbol][0], []).append(symbol)
+    batch_size = cap_batch_size(batch_size)
+    batches = [(start_date, group[i:i + batch_size])
+               for start_date, group in groups.items() for i in range(0, len(group), batch_size)]
+
+    fetched = {}
+    workers = min(max_workers or FETCH_MAX_WORKERS, len(batches))
+    if batches:
+        with ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="fetch") as executor:
+            futures = [(batch, executor.submit(_fetch_historical_data_batch, batch, interval, outputsize, start_date))
+                       for start_date, batch in batches]
+            for batch, future in futures:
+                try:
+                    fetched.update(future.result())
+                except Exception as e:
+                    logging.error(f"Gagal mengambil batch {batch}: {e}")
+        logging.info(f"{len(to_fetch)} simbol diambil dalam {len(batches)} request batch.")
+
+    results = {}
+    for symbol in symbols:
+        try:
+            if symbol in plans:
+                start_date, stored_count = plans[symbol]
+                df = _merge_bars(symbol, interval, outputsize, fetched.get(symbol, pd.DataFrame()),
+                                 start_date, stored_count)
             else:
-                logging.error(f"Gagal total mengambil data untuk {symbol} setelah 3 percobaan.")
-                return pd.DataFrame()
+                df = None
+            if ttl > 0:
+                # Hit cache tercatat di sini; hasil gagal digantikan data cache lama jika ada.
+                fresh = df
+                df = get_or_fetch(cache_key(symbol), lambda: fresh, ttl)
+            results[symbol] = df.copy() if df is not None else pd.DataFrame()
+        except Exception as e:
+            logging.error(f"Gagal mengambil data untuk {symbol}: {e}")
+            results[symbol] = pd.DataFrame()
+    return results
+
+def get_sentiment_data(cache_ttl=None):
+    """
+    Mengambil data Fear & Greed Index. Hasilnya di-cache selama
+    SENTIMENT_CACHE_TTL detik sehingga satu siklus prediksi hanya memanggil API
+    sekali; bila API gagal, data cache lama tetap dipakai.
+    """
+    ttl = SENTIMENT_CACHE_TTL if cache_ttl is None else cache_ttl
+    df = get_or_fetch(('sentiment', FEAR_GREED_API_URL), _fetch_sentiment_data, ttl)
+    return df.copy() if df is not None else pd.DataFrame()
 
-def get_sentiment_data():
-    """Mengambil data Fear & Greed Index."""
+def _fetch_sentiment_data():
+    """Melakukan request ke API Fear & Greed tanpa cache."""
     try:
-        response = requests.get(FEAR_GREED_API_URL)
+        response = _timed_get('fear_greed', FEAR_GREED_API_URL, timeout=HTTP_TIMEOUT)
         response.raise_for_status()
         data = response.json().get('data', [])
         df = pd.DataFrame(data)
         if df.empty:
             raise ValueError("Data sentimen kosong.")
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s').dt.date
+        # API mengirim epoch sebagai string; ubah ke angka dulu agar unit='s' berlaku.
+        df['timestamp'] = pd.to_datetime(pd.to_numeric(df['timestamp']), unit='s')
         df.set_index('timestamp', inplace=True)
         df['value'] = pd.to_numeric(df['value'], errors='coerce')
         df = df[['value']].dropna()
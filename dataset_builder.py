@@ -0,0 +1,234 @@
+# dataset_builder.py
+import logging
+import joblib
+import numpy as np
+import pandas as pd
+
+from config import FEATURES, NORMALIZATION_MODE
+from feature_engine import prepare_sequences
+from resample import split_mtf_feature
+
+NORMALIZATION_MODES = ('global', 'per_symbol', 'returns')
+
+# Fitur bersatuan harga. Level harga diubah menjadi selisih relatif terhadap
+# close (x / close - 1); fitur berupa selisih harga cukup dibagi close.
+PRICE_LEVEL_FEATURES = ['open', 'high', 'low', 'close', 'ema_10', 'ema_50', 'sma_20',
+                        'bbl_20_2.0', 'bbm_20_2.0', 'bbu_20_2.0']
+PRICE_SPREAD_FEATURES = ['macd_12_26_9', 'macdh_12_26_9', 'macds_12_26_9', 'atr_14']
+
+
+def _base_feature(feature):
+    """Nama fitur tanpa sufiks timeframe ('ema_50_1d' -> 'ema_50')."""
+    parsed = split_mtf_feature(feature)
+    return parsed[0] if parsed else feature
+
+# Kunci scaler bersama (mode 'global' dan 'returns').
+SHARED_KEY = '*'
+
+
+class ArrayMinMaxScaler:
+    """
+    Transformasi MinMaxScaler yang direkonstruksi dari array `scale_` dan
+    `min_` saja (tanpa pickle), dipakai saat memuat bundle model.
+    """
+
+    def __init__(self, scale, min_):
+        self.scale_ = np.asarray(scale, dtype=np.float64)
+        self.min_ = np.asarray(min_, dtype=np.float64)
+
+    def transform(self, X):
+        return np.asarray(X, dtype=np.float64) * self.scale_ + self.min_
+
+    def inverse_transform(self, X):
+        return (np.asarray(X, dtype=np.float64) - self.min_) / self.scale_
+
+
+class FeatureNormalizer:
+    """
+    Normalisasi fitur & target yang dipakai bersama oleh training dan predictor.
+
+    - 'global': satu MinMaxScaler untuk semua simbol (perilaku lama).
+    - 'per_symbol': MinMaxScaler terpisah per simbol, sehingga harga yang
+      berbeda beberapa orde besaran tidak saling menekan rentang skala.
+    - 'returns': fitur harga dan target dinyatakan relatif terhadap close
+      (bebas skala), lalu diskalakan dengan satu scaler bersama; bisa dipakai
+      untuk simbol yang tidak ikut training.
+    """
+
+    def __init__(self, mode=NORMALIZATION_MODE, features=None):
+        if mode not in NORMALIZATION_MODES:
+            raise ValueError(f"Mode normalisasi tidak dikenal: {mode}. Pilih salah satu dari {NORMALIZATION_MODES}.")
+        self.mode = mode
+        self.features = list(features or FEATURES)
+        self.scalers = {}  # kunci -> (scaler_x, scaler_y)
+        self._level_idx = [i for i, f in enumerate(self.features) if _base_feature(f) in PRICE_LEVEL_FEATURES]
+        self._spread_idx = [i for i, f in enumerate(self.features) if _base_feature(f) in PRICE_SPREAD_FEATURES]
+
+    @classmethod
+    def from_scalers(cls, scaler_x, scaler_y, features=None):
+        """Membungkus pasangan scaler global lama (scaler_x.pkl / scaler_y.pkl)."""
+        normalizer = cls('global', features)
+        normalizer.scalers[SHARED_KEY] = (scaler_x, scaler_y)
+        return normalizer
+
+    def _key(self, symbol):
+        return symbol if self.mode == 'per_symbol' else SHARED_KEY
+
+    def _scalers_for(self, symbol):
+        try:
+            return self.scalers[self._key(symbol)]
+        except KeyError:
+            raise ValueError(f"Scaler untuk {symbol} tidak ditemukan (mode {self.mode}). Latih ulang model.")
+
+    def has_symbol(self, symbol):
+        return self._key(symbol) in self.scalers
+
+    def _raw_features(self, df):
+        X = df[self.features].to_numpy(dtype=np.float64, copy=True)
+        if self.mode == 'returns':
+            close = df['close'].to_numpy(dtype=np.float64)[:, None]
+            X[:, self._level_idx] = X[:, self._level_idx] / close - 1.0
+            X[:, self._spread_idx] = X[:, self._spread_idx] / close
+        return X
+
+    def _raw_target(self, df):
+        y = df[['future_price']].to_numpy(dtype=np.float64, copy=True)
+        if self.mode == 'returns':
+            y = y / df[['close']].to_numpy(dtype=np.float64) - 1.0
+        return y
+
+    def fit(self, frames):
+        """Menyesuaikan scaler dari dict {simbol: DataFrame hasil create_lstm_features}."""
+        # sklearn hanya dibutuhkan saat training; inferensi dari bundle tidak memuatnya.
+        from sklearn.preprocessing import MinMaxScaler
+
+        self.scalers = {}
+        if self.mode == 'per_symbol':
+            for symbol, df in frames.items():
+                self.scalers[symbol] = (MinMaxScaler().fit(self._raw_features(df)),
+                                        MinMaxScaler().fit(self._raw_target(df)))
+        else:
+            X = np.concatenate([self._raw_features(df) for df in frames.values()])
+            y = np.concatenate([self._raw_target(df) for df in frames.values()])
+            self.scalers[SHARED_KEY] = (MinMaxScaler().fit(X), MinMaxScaler().fit(y))
+        return self
+
+    def transform_features(self, symbol, df):
+        scaler_x, _ = self._scalers_for(symbol)
+        X = self._raw_features(df)
+        if hasattr(scaler_x, 'feature_names_in_'):
+            # Scaler lama di-fit dengan DataFrame; sertakan nama kolom agar sklearn tidak memberi peringatan.
+            X = pd.DataFrame(X, columns=scaler_x.feature_names_in_)
+        return scaler_x.transform(X).astype(np.float32)
+
+    def transform_target(self, symbol, df):
+        _, scaler_y = self._scalers_for(symbol)
+        return scaler_y.transform(self._raw_target(df)).astype(np.float32)
+
+    def inverse_target(self, symbol, y_scaled, reference_close):
+        """Mengubah output model kembali menjadi harga; `reference_close` adalah close bar terakhir."""
+        _, scaler_y = self._scalers_for(symbol)
+        y = scaler_y.inverse_transform(np.asarray(y_scaled, dtype=np.float64).reshape(-1, 1))[:, 0]
+        if self.mode == 'returns':
+            y = (1.0 + y) * reference_close
+        return y
+
+    def to_arrays(self):
+        """Mengembalikan (metadata JSON, dict array) berisi parameter setiap scaler."""
+        keys = sorted(self.scalers)
+        arrays = {}
+        for idx, key in enumerate(keys):
+            scaler_x, scaler_y = self.scalers[key]
+            arrays[f"scaler{idx}_x_scale"] = np.asarray(scaler_x.scale_, dtype=np.float64)
+            arrays[f"scaler{idx}_x_min"] = np.asarray(scaler_x.min_, dtype=np.float64)
+            arrays[f"scaler{idx}_y_scale"] = np.asarray(scaler_y.scale_, dtype=np.float64)
+            arrays[f"scaler{idx}_y_min"] = np.asarray(scaler_y.min_, dtype=np.float64)
+        return {'mode': self.mode, 'keys': keys}, arrays
+
+    @classmethod
+    def from_arrays(cls, meta, arrays, features=None):
+        """Kebalikan dari to_arrays."""
+        normalizer = cls(meta['mode'], features)
+        for idx, key in enumerate(meta['keys']):
+            normalizer.scalers[key] = (
+                ArrayMinMaxScaler(arrays[f"scaler{idx}_x_scale"], arrays[f"scaler{idx}_x_min"]),
+                ArrayMinMaxScaler(arrays[f"scaler{idx}_y_scale"], arrays[f"scaler{idx}_y_min"]),
+            )
+        return normalizer
+
+    def save(self, path):
+        joblib.dump({'mode': self.mode, 'features': self.features, 'scalers': self.scalers}, path)
+        logging.info(f"Normalizer ({self.mode}, {len(self.scalers)} scaler) disimpan di {path}.")
+
+    @classmethod
+    def load(cls, path):
+        state = joblib.load(path)
+        normalizer = cls(state['mode'], state['features'])
+        normalizer.scalers = state['scalers']
+        return normalizer
+
+
+class SequenceDataset:
+    """
+    Dataset sekuens multi-simbol. Setiap simbol dijadikan jendela secara
+    terpisah (view tanpa salinan dari prepare_sequences), sehingga tidak ada
+    sekuens yang melintasi batas dua instrumen. 10% jendela terakhir setiap
+    simbol dipakai untuk validasi. Batch dibentuk dengan mengacak pasangan
+    (simbol, jendela) sehingga simbol-simbol tercampur dalam setiap batch.
+    """
+
+    def __init__(self, frames, normalizer, sequence_length, val_fraction=0.1):
+        self.symbols = []
+        self.windows = []
+        train_index, val_index = [], []
+        for symbol, df in frames.items():
+            X, y = prepare_sequences(normalizer.transform_features(symbol, df),
+                                     normalizer.transform_target(symbol, df), sequence_length)
+            if len(X) == 0:
+                logging.warning(f"Data {symbol} tidak cukup untuk membuat sekuens. Dilewati.")
+                continue
+            symbol_idx = len(self.windows)
+            self.symbols.append(symbol)
+            self.windows.append((X, y))
+
+            n_val = int(len(X) * val_fraction)
+            pairs = np.column_stack((np.full(len(X), symbol_idx), np.arange(len(X))))
+            train_index.append(pairs[:len(X) - n_val])
+            val_index.append(pairs[len(X) - n_val:])
+
+        empty = np.empty((0, 2), dtype=np.int64)
+        self.index = {
+            'train': np.concatenate(train_index) if train_index else empty,
+            'val': np.concatenate(val_index) if val_index else empty,
+        }
+
+    @property
+    def feature_shape(self):
+        return self.windows[0][0].shape[1:]
+
+    def __len__(self):
+        return len(self.index['train']) + len(self.index['val'])
+
+    def n_windows(self, split):
+        return len(self.index[split])
+
+    def n_batches(self, split, batch_size):
+        return -(-self.n_windows(split) // batch_size)
+
+    def iter_batches(self, split, batch_size, shuffle=True, rng=None):
+        """Menghasilkan batch (X_batch, y_batch) float32; hanya batch aktif yang disalin."""
+        index = self.index[split]
+        if shuffle:
+            rng = rng if rng is not None else np.random.default_rng()
+            index = index[rng.permutation(len(index))]
+        target_shape = self.windows[0][1].shape[1:]
+        for start in range(0, len(index), batch_size):
+            batch = index[start:start + batch_size]
+            X_batch = np.empty((len(batch),) + self.feature_shape, dtype=np.float32)
+            y_batch = np.empty((len(batch),) + target_shape, dtype=np.float32)
+            for symbol_idx in np.unique(batch[:, 0]):
+                rows = batch[:, 0] == symbol_idx
+                X, y = self.windows[symbol_idx]
+                X_batch[rows] = X[batch[rows, 1]]
+                y_batch[rows] = y[batch[rows, 1]]
+            yield X_batch, y_batch
@@ -1,45 +1,39 @@
 # evaluate_model.py
-import pandas as pd
+import argparse
 import logging
-from config import HISTORY_FILE
+import history_store
 
-def evaluate_performance():
+def evaluate_performance(last_n=None):
     """
-    Menganalisis file histori prediksi untuk menghitung metrik performa.
-    Fungsi ini perlu dijalankan setelah hasil aktual diisi.
+    Menganalisis histori prediksi untuk menghitung metrik performa.
+    Fungsi ini perlu dijalankan setelah hasil aktual diisi (lihat
+    performance_analyzer.analyze_performance). Jika `last_n` diisi, hanya N
+    prediksi terakhir per simbol yang dihitung.
     """
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
     
-    try:
-        df = pd.read_csv(HISTORY_FILE)
-    except FileNotFoundError:
-        logging.error(f"File histori '{HISTORY_FILE}' tidak ditemukan.")
-        return
-
-    # Filter hanya baris yang sudah punya hasil aktual
-    df.dropna(subset=['actual_close'], inplace=True)
+    # Hanya baris yang sudah punya hasil aktual
+    if last_n:
+        df = history_store.get_last_evaluated_per_symbol(last_n)
+    else:
+        df = history_store.load_history(evaluated_only=True)
 
     if df.empty:
         logging.info("Tidak ada data prediksi dengan hasil aktual untuk dievaluasi.")
         return
 
-    # Tentukan apakah prediksi benar
-    conditions = [
-        (df['trend_prediction'] == 'Naik') & (df['actual_close'] > df['last_price']),
-        (df['trend_prediction'] == 'Turun') & (df['actual_close'] < df['last_price'])
-    ]
-    df['is_correct'] = pd.np.select(conditions, [True, True], default=False)
-
-    accuracy = (df['is_correct'].sum() / len(df)) * 100
+    df['is_correct'] = df['is_correct'].astype(bool)
+    accuracy = df['is_correct'].mean() * 100
     
     logging.info("--- Laporan Performa Model ---")
     logging.info(f"Total Prediksi Dievaluasi: {len(df)}")
     logging.info(f"Akurasi Arah (Directional Accuracy): {accuracy:.2f}%")
 
-    for symbol in df['symbol'].unique():
-        symbol_df = df[df['symbol'] == symbol]
-        symbol_accuracy = (symbol_df['is_correct'].sum() / len(symbol_df)) * 100
-        logging.info(f"  - Akurasi untuk {symbol}: {symbol_accuracy:.2f}% ({len(symbol_df)} prediksi)")
+    per_symbol = df.groupby('symbol')['is_correct'].agg(['mean', 'size'])
+    for symbol, row in per_symbol.iterrows():
+        logging.info(f"  - Akurasi untuk {symbol}: {row['mean'] * 100:.2f}% ({int(row['size'])} prediksi)")
         
 if __name__ == "__main__":
-    evaluate_performance()
+    parser = argparse.ArgumentParser(description="Laporan akurasi histori prediksi.")
+    parser.add_argument('--last', type=int, default=None, help="hanya N prediksi terakhir per simbol")
+    evaluate_performance(parser.parse_args().last)
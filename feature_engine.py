@@ -1,40 +1,34 @@
 # feature_engine.py
 import pandas as pd
-import pandas_ta as ta
 import numpy as np
 import logging
-from config import PREDICTION_HORIZON, FEATURES
+from config import (PREDICTION_HORIZON, FEATURES, STREAMING_INDICATORS, INDICATOR_BACKEND,
+                    SENTIMENT_MAX_STALENESS_HOURS, SENTIMENT_NEUTRAL_VALUE)
+from indicators import INDICATOR_COLUMNS, compute_indicator_array
+from indicator_stream import update_indicators
+from resample import mtf_features
+from alignment import ExogenousSeries, align_inputs
 
-def create_lstm_features(historical_data, sentiment_data):
+def compute_indicators(df, backend=None):
     """
-    Menciptakan fitur teknikal dan sentimen untuk model LSTM.
-    Fungsi ini dirancang agar kuat (robust) dengan menangani nama kolom yang tidak konsisten,
-    nilai NaN, dan memastikan struktur data output selalu sesuai dengan yang diharapkan model.
+    Menghitung seluruh indikator teknikal secara batch dan mengembalikan
+    DataFrame dengan nama kolom standar (INDICATOR_COLUMNS). Secara default
+    memakai kernel NumPy di indicators.py; pandas_ta hanya dipakai jika
+    `backend` (atau INDICATOR_BACKEND di config) bernilai 'pandas_ta'.
     """
-    if not isinstance(historical_data, pd.DataFrame) or historical_data.empty:
-        logging.warning("Menerima data historis kosong atau tidak valid. Melewati pembuatan fitur.")
-        return pd.DataFrame()
+    backend = backend or INDICATOR_BACKEND
+    if backend == 'pandas_ta':
+        return compute_indicators_pandas_ta(df)
 
-    df = historical_data.copy()
+    values = compute_indicator_array(df['high'].to_numpy(), df['low'].to_numpy(), df['close'].to_numpy())
+    return pd.DataFrame(values, index=df.index, columns=INDICATOR_COLUMNS)
 
-    # --- TAHAP 1: Standardisasi & Penggabungan Data ---
+def compute_indicators_pandas_ta(df):
+    """Jalur lama berbasis pandas_ta (dependensi opsional)."""
+    import pandas_ta  # noqa: F401 -- mendaftarkan accessor df.ta
 
-    # Standarkan nama kolom input ke huruf kecil untuk konsistensi universal.
-    df.columns = [col.lower() for col in df.columns]
-
-    # Gabungkan data sentimen dengan aman.
-    if sentiment_data is not None and not sentiment_data.empty:
-        if 'value' in sentiment_data.columns:
-            df.index = pd.to_datetime(df.index)
-            sentiment_data.index = pd.to_datetime(sentiment_data.index)
-            df = pd.merge(df, sentiment_data[['value']], left_index=True, right_index=True, how='left')
-            df.rename(columns={'value': 'sentiment_value'}, inplace=True)
-    
-    if 'sentiment_value' not in df.columns:
-        df['sentiment_value'] = 50.0  # Nilai netral
+    df = df[[col for col in ('open', 'high', 'low', 'close', 'volume') if col in df.columns]].copy()
 
-    # --- TAHAP 2: Perhitungan Indikator Teknikal ---
-    
     df.ta.ema(length=10, append=True)
     df.ta.ema(length=50, append=True)
     df.ta.sma(length=20, append=True)
@@ -43,15 +37,6 @@ def create_lstm_features(historical_data, sentiment_data):
     df.ta.atr(length=14, append=True)
     df.ta.bbands(length=20, std=2.0, append=True)
 
-    # --- TAHAP 3: Pembuatan Target & Pembersihan Akhir ---
-
-    # Buat target harga di masa depan.
-    if 'close' in df.columns:
-        df['future_price'] = df['close'].shift(-PREDICTION_HORIZON)
-    else:
-        logging.error("Kolom 'close' tidak ditemukan. Tidak dapat membuat target.")
-        return pd.DataFrame() 
-
     # Standarkan SEMUA nama kolom (termasuk yang baru dibuat) ke huruf kecil.
     df.columns = [col.lower() for col in df.columns]
     
@@ -70,8 +55,80 @@ def create_lstm_features(historical_data, sentiment_data):
             df.rename(columns={col: 'bbu_20_2.0'}, inplace=True)
     # --- AKHIR PERBAIKAN ---
 
-    # Tangani nilai NaN yang muncul di awal data akibat perhitungan indikator.
-    df = df.bfill().ffill()
+    return df[[col for col in INDICATOR_COLUMNS if col in df.columns]]
+
+def exogenous_inputs(sentiment_data):
+    """
+    Input eksogen yang diselaraskan as-of ke indeks bar, {nama kolom: ExogenousSeries}.
+    Input baru cukup ditambahkan di sini.
+    """
+    inputs = {}
+    if sentiment_data is not None and not sentiment_data.empty and 'value' in sentiment_data.columns:
+        inputs['sentiment_value'] = ExogenousSeries(sentiment_data['value'],
+                                                    pd.Timedelta(hours=SENTIMENT_MAX_STALENESS_HOURS),
+                                                    SENTIMENT_NEUTRAL_VALUE)
+    return inputs
+
+def create_lstm_features(historical_data, sentiment_data, symbol=None, cross_asset=None, interval='1h'):
+    """
+    Menciptakan fitur teknikal dan sentimen untuk model LSTM.
+    Fungsi ini dirancang agar kuat (robust) dengan menangani nama kolom yang tidak konsisten,
+    nilai NaN, dan memastikan struktur data output selalu sesuai dengan yang diharapkan model.
+    Jika `symbol` diberikan dan STREAMING_INDICATORS aktif, indikator diperbarui
+    secara inkremental dari state tersimpan simbol tersebut pada `interval`
+    (interval bar `historical_data`, lihat indicator_stream),
+    bukan dihitung ulang dari seluruh data. `cross_asset` berisi kolom fitur
+    lintas aset simbol ini (lihat cross_asset.compute_cross_asset) yang
+    ditempelkan apa adanya.
+    """
+    if not isinstance(historical_data, pd.DataFrame) or historical_data.empty:
+        logging.warning("Menerima data historis kosong atau tidak valid. Melewati pembuatan fitur.")
+        return pd.DataFrame()
+
+    df = historical_data.copy()
+
+    # --- TAHAP 1: Standardisasi & Penggabungan Data ---
+
+    # Standarkan nama kolom input ke huruf kecil untuk konsistensi universal.
+    df.columns = [col.lower() for col in df.columns]
+
+    # Gabungkan data sentimen (dan input eksogen lain) secara as-of: setiap bar
+    # memakai nilai terakhir yang sudah terbit, tidak pernah nilai masa depan.
+    # Nilai yang lebih tua dari max_staleness input sudah diganti fill_value-nya
+    # di sini, jadi kolom eksogen tidak perlu (dan tidak boleh) di-ffill lagi.
+    df.index = pd.to_datetime(df.index)
+    df = df.join(align_inputs(df.index, exogenous_inputs(sentiment_data)))
+
+    if 'sentiment_value' not in df.columns:
+        df['sentiment_value'] = SENTIMENT_NEUTRAL_VALUE  # Nilai netral
+
+    # --- TAHAP 2: Perhitungan Indikator Teknikal ---
+    
+    if symbol is not None and STREAMING_INDICATORS:
+        indicators = update_indicators(symbol, df, interval)
+    else:
+        indicators = compute_indicators(df)
+    df = df.join(indicators)
+
+    # Fitur multi-timeframe (mis. 'rsi_14_1d') hanya dihitung jika diminta di FEATURES.
+    df = df.join(mtf_features(df, FEATURES))
+    if cross_asset is not None and not cross_asset.empty:
+        cross_cols = [col for col in cross_asset.columns if col not in df.columns]
+        df = df.join(cross_asset[cross_cols])
+
+    # --- TAHAP 3: Pembuatan Target & Pembersihan Akhir ---
+
+    # Buat target harga di masa depan.
+    if 'close' in df.columns:
+        df['future_price'] = df['close'].shift(-PREDICTION_HORIZON)
+    else:
+        logging.error("Kolom 'close' tidak ditemukan. Tidak dapat membuat target.")
+        return pd.DataFrame() 
+
+    # Tidak ada kolom yang diisi: baris pemanasan indikator (dan fitur lintas
+    # aset) yang masih NaN dibuang di tahap 4, dan future_price tetap NaN untuk
+    # PREDICTION_HORIZON baris terakhir (training membuangnya; prediksi tetap
+    # memakai baris terakhir).
 
     # --- TAHAP 4: Finalisasi Struktur DataFrame ---
 
@@ -84,7 +141,7 @@ def create_lstm_features(historical_data, sentiment_data):
     
     final_cols = available_features + ['future_price']
     if all(col in df.columns for col in final_cols):
-        df.dropna(inplace=True)
+        df.dropna(subset=available_features, inplace=True)
         return df[final_cols]
     else:
         logging.error("Gagal membuat DataFrame final karena kolom penting hilang.")
@@ -92,15 +149,22 @@ def create_lstm_features(historical_data, sentiment_data):
 
 
 def prepare_sequences(features, targets, sequence_length):
-    """Mengubah data tabular menjadi sekuens untuk input LSTM."""
-    X, y = [], []
-    if len(features) < sequence_length:
+    """
+    Mengubah data tabular menjadi sekuens untuk input LSTM.
+    X adalah view bergeser (sliding_window_view) di atas `features` tanpa
+    menyalin data, berbentuk (n - sequence_length, sequence_length, n_fitur);
+    y[i] adalah target pada baris terakhir jendela ke-i.
+    """
+    features = np.asarray(features)
+    targets = np.asarray(targets)
+    if len(features) <= sequence_length:
         logging.warning("Data tidak cukup panjang untuk membuat sekuens.")
-        return np.array(X), np.array(y)
-        
-    for i in range(len(features) - sequence_length):
-        X.append(features[i:(i + sequence_length)])
-        y.append(targets[i + sequence_length - 1])
-    
-    return np.array(X), np.array(y)
+        return (np.empty((0, sequence_length) + features.shape[1:], dtype=features.dtype),
+                targets[:0])
 
+    n_windows = len(features) - sequence_length
+    windows = np.lib.stride_tricks.sliding_window_view(features, sequence_length, axis=0)
+    # sliding_window_view meletakkan sumbu jendela di akhir: (n, fitur, L) -> (n, L, fitur).
+    X = np.moveaxis(windows, -1, 1)[:n_windows]
+    y = targets[sequence_length - 1:sequence_length - 1 + n_windows]
+    return X, y
@@ -0,0 +1,236 @@
+# history_store.py
+import os
+import sqlite3
+import logging
+import threading
+from contextlib import closing
+from datetime import datetime
+import pandas as pd
+
+from config import HISTORY_DB, HISTORY_FILE
+
+PREDICTION_COLUMNS = [
+    'timestamp', 'symbol', 'current_price', 'predicted_price', 'predicted_trend',
+    'confidence', 'horizon', 'actual_price', 'actual_trend', 'is_correct', 'adjusted_threshold',
+]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    current_price REAL,
+    predicted_price REAL,
+    predicted_trend TEXT,
+    confidence REAL,
+    horizon INTEGER,
+    actual_price REAL,
+    actual_trend TEXT,
+    is_correct INTEGER,
+    evaluated INTEGER NOT NULL DEFAULT 0,
+    adjusted_threshold REAL
+);
+CREATE INDEX IF NOT EXISTS idx_predictions_symbol_ts_eval ON predictions (symbol, timestamp, evaluated);
+CREATE INDEX IF NOT EXISTS idx_predictions_eval_id ON predictions (evaluated, id);
+CREATE TABLE IF NOT EXISTS thresholds (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    value REAL NOT NULL,
+    accuracy REAL,
+    sample_size INTEGER
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_initialized = set()
+_init_lock = threading.Lock()
+
+
+def connect(db_path=HISTORY_DB):
+    """
+    Membuka koneksi SQLite dalam mode WAL sehingga pembaca tidak diblokir oleh
+    penulis, dan dua run yang bersamaan saling menunggu alih-alih merusak data.
+    """
+    directory = os.path.dirname(db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    return conn
+
+
+def init_store(db_path=HISTORY_DB, csv_path=HISTORY_FILE):
+    """Membuat skema (jika belum ada) dan menjalankan migrasi CSV satu kali."""
+    with _init_lock:
+        if db_path in _initialized:
+            return
+        with closing(connect(db_path)) as conn:
+            conn.executescript(_SCHEMA)
+        migrate_from_csv(csv_path, db_path)
+        _initialized.add(db_path)
+
+
+def migrate_from_csv(csv_path=HISTORY_FILE, db_path=HISTORY_DB):
+    """
+    Memindahkan isi file histori CSV lama ke database satu kali saja. Status
+    migrasi dicatat di tabel meta sehingga pemanggilan berikutnya tidak
+    menduplikasi data. Mengembalikan jumlah baris yang dimigrasikan.
+    """
+    if not csv_path or not os.path.exists(csv_path):
+        return 0
+
+    with closing(connect(db_path)) as conn, conn:
+        conn.execute("BEGIN IMMEDIATE")
+        done = conn.execute("SELECT value FROM meta WHERE key = 'migrated_csv'").fetchone()
+        if done:
+            return 0
+
+        df = pd.read_csv(csv_path)
+        for col in PREDICTION_COLUMNS:
+            if col not in df.columns:
+                df[col] = None
+        df = df[PREDICTION_COLUMNS].astype(object).where(df[PREDICTION_COLUMNS].notna(), None)
+        df['is_correct'] = df['is_correct'].map(_to_flag)
+        df['evaluated'] = df['is_correct'].notna().astype(int)
+
+        rows = list(df[PREDICTION_COLUMNS + ['evaluated']].itertuples(index=False, name=None))
+        conn.executemany(
+            f"INSERT INTO predictions ({', '.join(PREDICTION_COLUMNS)}, evaluated) "
+            f"VALUES ({', '.join('?' * (len(PREDICTION_COLUMNS) + 1))})",
+            rows,
+        )
+        conn.execute("INSERT INTO meta (key, value) VALUES ('migrated_csv', ?)", (csv_path,))
+    logging.info(f"Migrasi histori: {len(rows)} baris dari {csv_path} dipindahkan ke {db_path}.")
+    return len(rows)
+
+
+def _to_flag(value):
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return None
+    if isinstance(value, str):
+        return 1 if value.strip().lower() in ('true', '1') else 0
+    return int(bool(value))
+
+
+def insert_predictions(records, db_path=HISTORY_DB):
+    """Menambahkan prediksi baru (list dict berkolom PREDICTION_COLUMNS). Biaya O(baris baru)."""
+    if not records:
+        return 0
+    init_store(db_path)
+    rows = [tuple(record.get(col) for col in PREDICTION_COLUMNS) for record in records]
+    with closing(connect(db_path)) as conn, conn:
+        conn.executemany(
+            f"INSERT INTO predictions ({', '.join(PREDICTION_COLUMNS)}) "
+            f"VALUES ({', '.join('?' * len(PREDICTION_COLUMNS))})",
+            rows,
+        )
+    return len(rows)
+
+
+def count_predictions(db_path=HISTORY_DB):
+    init_store(db_path)
+    with closing(connect(db_path)) as conn:
+        return conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+
+
+def _query(sql, params=(), db_path=HISTORY_DB):
+    init_store(db_path)
+    with closing(connect(db_path)) as conn:
+        return pd.read_sql_query(sql, conn, params=params, index_col='id')
+
+
+def get_pending(limit, db_path=HISTORY_DB):
+    """N prediksi terakhir yang belum dievaluasi, berindeks id dan urut kronologis."""
+    df = _query("SELECT * FROM predictions WHERE evaluated = 0 ORDER BY id DESC LIMIT ?", (int(limit),), db_path)
+    return df.iloc[::-1]
+
+
+def get_evaluated(limit=None, symbol=None, db_path=HISTORY_DB):
+    """Prediksi yang sudah dievaluasi (opsional: N terakhir dan/atau satu simbol), urut kronologis."""
+    sql = "SELECT * FROM predictions WHERE evaluated = 1"
+    params = []
+    if symbol is not None:
+        sql += " AND symbol = ?"
+        params.append(symbol)
+    sql += " ORDER BY id DESC"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(int(limit))
+    return _query(sql, tuple(params), db_path).iloc[::-1]
+
+
+def get_last_evaluated_per_symbol(n, db_path=HISTORY_DB):
+    """N prediksi terakhir yang sudah dievaluasi untuk setiap simbol."""
+    sql = """
+        SELECT * FROM (
+            SELECT *, ROW_NUMBER() OVER (PARTITION BY symbol ORDER BY timestamp DESC, id DESC) AS rn
+            FROM predictions WHERE evaluated = 1
+        ) WHERE rn <= ? ORDER BY symbol, timestamp
+    """
+    return _query(sql, (int(n),), db_path).drop(columns='rn')
+
+
+def load_history(evaluated_only=False, db_path=HISTORY_DB):
+    """Seluruh histori prediksi sebagai DataFrame."""
+    sql = "SELECT * FROM predictions"
+    if evaluated_only:
+        sql += " WHERE evaluated = 1"
+    return _query(sql + " ORDER BY id", (), db_path)
+
+
+def update_outcomes(outcomes, db_path=HISTORY_DB):
+    """
+    Menyimpan hasil evaluasi secara in-place. `outcomes` berindeks id dengan
+    kolom actual_price, actual_trend, dan is_correct.
+    """
+    if outcomes is None or outcomes.empty:
+        return 0
+    rows = [
+        (float(row.actual_price), str(row.actual_trend), int(bool(row.is_correct)), int(idx))
+        for idx, row in outcomes.iterrows()
+    ]
+    with closing(connect(db_path)) as conn, conn:
+        conn.executemany(
+            "UPDATE predictions SET actual_price = ?, actual_trend = ?, is_correct = ?, evaluated = 1 "
+            "WHERE id = ?",
+            rows,
+        )
+    return len(rows)
+
+
+def expire_predictions(ids, db_path=HISTORY_DB):
+    """
+    Menandai prediksi yang tidak akan pernah punya harga aktual (mis. target
+    jatuh pada hari libur) dengan evaluated = 2: tidak lagi menunggu evaluasi,
+    tetapi juga tidak ikut dihitung dalam akurasi.
+    """
+    rows = [(int(idx),) for idx in ids]
+    if not rows:
+        return 0
+    init_store(db_path)
+    with closing(connect(db_path)) as conn, conn:
+        conn.executemany("UPDATE predictions SET evaluated = 2 WHERE id = ? AND evaluated = 0", rows)
+    return len(rows)
+
+
+def record_threshold(value, accuracy=None, sample_size=None, db_path=HISTORY_DB):
+    """Mencatat confidence threshold hasil analisis (satu baris per siklus)."""
+    init_store(db_path)
+    with closing(connect(db_path)) as conn, conn:
+        conn.execute(
+            "INSERT INTO thresholds (timestamp, value, accuracy, sample_size) VALUES (?, ?, ?, ?)",
+            (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), float(value), accuracy, sample_size),
+        )
+
+
+def get_last_threshold(db_path=HISTORY_DB):
+    """Threshold terakhir yang dicatat, atau None."""
+    init_store(db_path)
+    with closing(connect(db_path)) as conn:
+        row = conn.execute("SELECT value FROM thresholds ORDER BY id DESC LIMIT 1").fetchone()
+    return row[0] if row else None
@@ -0,0 +1,350 @@
+# indicator_stream.py
+import os
+import re
+import glob
+import copy
+import math
+import pickle
+import logging
+import threading
+from collections import deque
+import numpy as np
+import pandas as pd
+
+from config import INDICATOR_STATE_DIR, INDICATOR_STREAM_HISTORY
+from indicators import INDICATOR_COLUMNS
+
+# Versi format state; state lama dengan versi berbeda akan dibangun ulang.
+STATE_VERSION = 1
+
+
+class _Ema:
+    """EMA ala pandas_ta: nilai pertama adalah SMA dari `length` data awal."""
+
+    def __init__(self, length):
+        self.length = length
+        self.alpha = 2.0 / (length + 1)
+        self.count = 0
+        self.total = 0.0
+        self.value = math.nan
+
+    def update(self, x):
+        self.count += 1
+        if self.count < self.length:
+            self.total += x
+            return math.nan
+        if self.count == self.length:
+            self.value = (self.total + x) / self.length
+        else:
+            self.value = self.alpha * x + (1 - self.alpha) * self.value
+        return self.value
+
+
+class _Rma:
+    """Rata-rata Wilder (ewm alpha=1/length, adjust=True, min_periods=length)."""
+
+    def __init__(self, length):
+        self.length = length
+        self.decay = 1.0 - 1.0 / length
+        self.count = 0
+        self.numerator = 0.0
+        self.denominator = 0.0
+
+    def update(self, x):
+        self.count += 1
+        self.numerator = x + self.decay * self.numerator
+        self.denominator = 1.0 + self.decay * self.denominator
+        if self.count < self.length:
+            return math.nan
+        return self.numerator / self.denominator
+
+
+class StreamingIndicators:
+    """
+    Menyimpan state berjalan semua indikator di INDICATOR_COLUMNS untuk satu
+    simbol dan memperbaruinya per bar dalam waktu konstan. Rumus mengikuti
+    pandas_ta (EMA dengan seed SMA, RSI/ATR memakai RMA Wilder, Bollinger Bands
+    dengan ddof=0).
+    """
+
+    def __init__(self):
+        self.ema_10 = _Ema(10)
+        self.ema_50 = _Ema(50)
+        self.ema_12 = _Ema(12)
+        self.ema_26 = _Ema(26)
+        self.macd_signal = _Ema(9)
+        self.rsi_gain = _Rma(14)
+        self.rsi_loss = _Rma(14)
+        self.atr = _Rma(14)
+        self.closes = deque(maxlen=20)
+        self.prev_close = None
+
+    def update(self, high, low, close):
+        """Memproses satu bar dan mengembalikan tuple nilai sesuai INDICATOR_COLUMNS."""
+        nan = math.nan
+
+        ema_10 = self.ema_10.update(close)
+        ema_50 = self.ema_50.update(close)
+
+        # MACD: sinyal baru dihitung setelah MACD pertama valid.
+        fast = self.ema_12.update(close)
+        slow = self.ema_26.update(close)
+        macd = fast - slow
+        if math.isnan(macd):
+            signal = histogram = nan
+        else:
+            signal = self.macd_signal.update(macd)
+            histogram = macd - signal
+
+        # RSI & ATR membutuhkan close sebelumnya.
+        if self.prev_close is None:
+            rsi = atr = nan
+        else:
+            diff = close - self.prev_close
+            avg_gain = self.rsi_gain.update(diff if diff > 0 else 0.0)
+            avg_loss = self.rsi_loss.update(-diff if diff < 0 else 0.0)
+            total = avg_gain + avg_loss
+            rsi = 100.0 * avg_gain / total if total != 0 else nan
+
+            true_range = max(high - low, abs(high - self.prev_close), abs(self.prev_close - low))
+            atr = self.atr.update(true_range)
+        self.prev_close = close
+
+        # SMA & Bollinger Bands dari ring buffer 20 close terakhir.
+        self.closes.append(close)
+        if len(self.closes) == self.closes.maxlen:
+            window = np.fromiter(self.closes, dtype=np.float64, count=len(self.closes))
+            sma = window.mean()
+            std = window.std()
+            bbl, bbm, bbu = sma - 2.0 * std, sma, sma + 2.0 * std
+        else:
+            sma = bbl = bbm = bbu = nan
+
+        return (ema_10, ema_50, sma, rsi, macd, histogram, signal, atr, bbl, bbm, bbu)
+
+
+class _SymbolState:
+    """State per (simbol, interval): indikator sebelum bar terakhir, bar terakhir, dan riwayat output."""
+
+    def __init__(self):
+        self.version = STATE_VERSION
+        self.committed = StreamingIndicators()  # state sebelum bar terakhir
+        self.last_bar = None                     # (timestamp, high, low, close)
+        self.history_index = deque(maxlen=INDICATOR_STREAM_HISTORY)
+        self.history_rows = deque(maxlen=INDICATOR_STREAM_HISTORY)
+        self.bars_processed = 0
+
+    @property
+    def last_timestamp(self):
+        return self.last_bar[0] if self.last_bar else None
+
+
+# State dikunci per (simbol, interval): bar 1h dan bar 4h simbol yang sama
+# tidak boleh saling menimpa state satu sama lain.
+_states = {}
+_lock = threading.Lock()
+
+
+def _safe_name(value):
+    return re.sub(r'[^A-Za-z0-9]+', '', value)
+
+
+def _state_path(key):
+    symbol, interval = key
+    return os.path.join(INDICATOR_STATE_DIR, f"{_safe_name(symbol)}_{_safe_name(interval)}.pkl")
+
+
+def _load_state(key):
+    state = _states.get(key)
+    if state is not None:
+        return state
+    path = _state_path(key)
+    if os.path.exists(path):
+        try:
+            with open(path, 'rb') as f:
+                state = pickle.load(f)
+            if getattr(state, 'version', None) != STATE_VERSION:
+                state = None
+        except Exception as e:
+            logging.warning(f"Gagal memuat state indikator untuk {key[0]} ({key[1]}): {e}")
+            state = None
+    return state
+
+
+def _save_state(key, state):
+    _states[key] = state
+    path = _state_path(key)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(INDICATOR_STATE_DIR, exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logging.warning(f"Gagal menyimpan state indikator untuk {key[0]} ({key[1]}): {e}")
+
+
+def _apply_bars(state, timestamps, highs, lows, closes):
+    """
+    Menerapkan bar baru ke state. Bar terakhir selalu diproses pada salinan state
+    sehingga pada pemanggilan berikutnya bisa diproses ulang bila nilainya
+    berubah (bar yang belum tutup).
+    """
+    new_bars = len(timestamps)
+    if state.last_bar is not None:
+        if timestamps[0] != state.last_bar[0]:
+            # Bar terakhir sebelumnya sudah final; komit ke state.
+            last_ts, last_high, last_low, last_close = state.last_bar
+            state.committed.update(last_high, last_low, last_close)
+        else:
+            # Bar terakhir diproses ulang dengan nilai terbarunya.
+            new_bars -= 1
+            if state.history_index and state.history_index[-1] == timestamps[0]:
+                state.history_index.pop()
+                state.history_rows.pop()
+
+    for i in range(len(timestamps) - 1):
+        row = state.committed.update(highs[i], lows[i], closes[i])
+        state.history_index.append(timestamps[i])
+        state.history_rows.append(row)
+
+    pending = copy.deepcopy(state.committed)
+    row = pending.update(highs[-1], lows[-1], closes[-1])
+    state.history_index.append(timestamps[-1])
+    state.history_rows.append(row)
+    state.last_bar = (timestamps[-1], highs[-1], lows[-1], closes[-1])
+    state.bars_processed += new_bars
+
+
+def update_indicators(symbol, ohlcv, interval='1h'):
+    """
+    Memperbarui state indikator `symbol` pada `interval` dengan bar di `ohlcv` yang belum
+    diproses, lalu mengembalikan DataFrame INDICATOR_COLUMNS berindeks sama
+    dengan `ohlcv`. Jika data tidak bersambung dengan state tersimpan (state
+    baru, celah data, atau data lebih lama), state dibangun ulang dari `ohlcv`.
+    """
+    index = pd.DatetimeIndex(ohlcv.index)
+    timestamps = index.as_unit('ns').asi8
+    highs = ohlcv['high'].to_numpy(dtype=np.float64)
+    lows = ohlcv['low'].to_numpy(dtype=np.float64)
+    closes = ohlcv['close'].to_numpy(dtype=np.float64)
+
+    key = (symbol, interval)
+    with _lock:
+        state = _load_state(key)
+        last_ts = state.last_timestamp if state is not None else None
+
+        if last_ts is None or timestamps[0] > last_ts or timestamps[-1] < last_ts:
+            state = _SymbolState()
+            start = 0
+        else:
+            start = int(np.searchsorted(timestamps, last_ts, side='left'))
+
+        if start < len(timestamps):
+            _apply_bars(state, timestamps[start:], highs[start:], lows[start:], closes[start:])
+        _save_state(key, state)
+
+        history = pd.DataFrame(list(state.history_rows), columns=INDICATOR_COLUMNS,
+                               index=pd.DatetimeIndex(np.asarray(state.history_index, dtype='datetime64[ns]')))
+
+    return history.reindex(index.as_unit('ns')).set_axis(ohlcv.index)
+
+
+def reset_indicator_state(symbol=None, interval=None):
+    """
+    Menghapus state indikator dari memori dan disk: satu (simbol, interval),
+    semua interval satu simbol jika `interval` None, atau semua state jika
+    `symbol` juga None.
+    """
+    with _lock:
+        keys = [key for key in _states
+                if (symbol is None or key[0] == symbol) and (interval is None or key[1] == interval)]
+        paths = {_state_path(key) for key in keys}
+        for key in keys:
+            _states.pop(key, None)
+        if symbol is not None and interval is not None:
+            paths.add(_state_path((symbol, interval)))
+        elif symbol is not None:
+            paths.update(glob.glob(os.path.join(INDICATOR_STATE_DIR, f"{_safe_name(symbol)}_*.pkl")))
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def compute_streaming(ohlcv):
+    """Menjalankan engine streaming bar demi bar di atas `ohlcv` tanpa menyimpan state."""
+    engine = StreamingIndicators()
+    highs = ohlcv['high'].to_numpy(dtype=np.float64)
+    lows = ohlcv['low'].to_numpy(dtype=np.float64)
+    closes = ohlcv['close'].to_numpy(dtype=np.float64)
+    rows = [engine.update(h, l, c) for h, l, c in zip(highs, lows, closes)]
+    return pd.DataFrame(rows, columns=INDICATOR_COLUMNS, index=ohlcv.index)
+
+
+def verify_parity(ohlcv=None, tolerance=1e-6, chunk_size=37, backend=None):
+    """
+    Uji paritas: membandingkan output engine streaming dengan jalur batch di
+    feature_engine (kernel NumPy float32, atau pandas_ta jika `backend` bernilai
+    'pandas_ta'). Juga memastikan pembaruan bertahap per potongan
+    data (dengan bar terakhir yang direvisi) memberi hasil yang sama dengan
+    satu kali proses. Mengembalikan selisih relatif maksimum per kolom dan
+    melempar AssertionError jika melebihi `tolerance`.
+    """
+    from feature_engine import compute_indicators
+
+    if ohlcv is None:
+        rng = np.random.default_rng(42)
+        n = 1000
+        close = 1.1 * np.exp(np.cumsum(rng.normal(0, 0.001, n)))
+        open_ = np.r_[close[0], close[:-1]]
+        high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.0005, n)))
+        low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.0005, n)))
+        ohlcv = pd.DataFrame({'open': open_, 'high': high, 'low': low, 'close': close, 'volume': 0.0},
+                             index=pd.date_range("2024-01-01", periods=n, freq="h", name='timestamp'))
+
+    batch = compute_indicators(ohlcv, backend=backend)[INDICATOR_COLUMNS]
+    streaming = compute_streaming(ohlcv)
+
+    # Pembaruan bertahap: bar terakhir setiap potongan awalnya bernilai "belum tutup".
+    symbol = "__parity__"
+    with _lock:
+        _states.pop((symbol, '1h'), None)
+    incremental = None
+    try:
+        for end in range(chunk_size, len(ohlcv) + chunk_size, chunk_size):
+            window = ohlcv.iloc[max(0, end - 3 * chunk_size):end].copy()
+            if end < len(ohlcv):
+                window.iloc[-1, window.columns.get_loc('close')] *= 1.001
+            incremental = update_indicators(symbol, window)
+        incremental = incremental.reindex(ohlcv.index)
+    finally:
+        reset_indicator_state(symbol, '1h')
+
+    report = {}
+    for col in INDICATOR_COLUMNS:
+        expected = batch[col].to_numpy(dtype=np.float64)
+        for name, actual in (('streaming', streaming[col].to_numpy()), ('incremental', incremental[col].to_numpy())):
+            mask = ~np.isnan(expected) & ~np.isnan(actual)
+            if name == 'streaming':
+                assert np.array_equal(np.isnan(expected), np.isnan(actual)), f"Posisi NaN berbeda pada {col}"
+            scale = np.maximum(np.abs(expected[mask]), 1e-12)
+            diff = float(np.max(np.abs(actual[mask] - expected[mask]) / scale)) if mask.any() else 0.0
+            report[(col, name)] = diff
+            assert diff <= tolerance, f"Selisih {name} pada {col} ({diff:.2e}) melebihi toleransi {tolerance:.0e}"
+    return report
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    backends = ['numpy']
+    try:
+        import pandas_ta  # noqa: F401
+        backends.append('pandas_ta')
+    except ImportError:
+        logging.info("pandas_ta tidak terpasang; paritas hanya diuji terhadap kernel NumPy.")
+
+    for backend in backends:
+        results = verify_parity(backend=backend)
+        for (col, name), diff in results.items():
+            logging.info(f"Paritas [{backend}] {col:<15} {name:<12} selisih relatif maks: {diff:.2e}")
+    logging.info("Uji paritas engine indikator streaming berhasil.")
@@ -0,0 +1,231 @@
+# indicators.py
+import time
+import logging
+import tracemalloc
+import numpy as np
+
+# Nama kolom indikator teknikal, sama dengan nama di config.FEATURES.
+INDICATOR_COLUMNS = [
+    'ema_10', 'ema_50', 'sma_20', 'rsi_14',
+    'macd_12_26_9', 'macdh_12_26_9', 'macds_12_26_9',
+    'atr_14',
+    'bbl_20_2.0', 'bbm_20_2.0', 'bbu_20_2.0',
+]
+
+# Batas eksponen agar faktor peluruhan d**-k tidak overflow di float64.
+_MAX_LOG_SCALE = 300.0
+
+
+def _recursive_filter(x, decay, initial=0.0):
+    """
+    Menghitung y[t] = x[t] + decay * y[t-1] (dengan y[-1] = initial) secara
+    vektorisasi. Data diproses per blok; di dalam blok rekursi diselesaikan
+    dengan bentuk tertutup memakai cumsum, sehingga loop Python hanya berjalan
+    sekali per blok (ribuan bar), bukan sekali per bar.
+    """
+    n = len(x)
+    out = np.empty(n, dtype=np.float64)
+    if n == 0:
+        return out
+    if decay <= 0.0:
+        out[:] = x
+        return out
+
+    block = max(1, min(n, int(_MAX_LOG_SCALE / -np.log(decay))))
+    exponents = np.arange(block, dtype=np.float64)
+    powers = decay ** exponents            # d**k
+    inverse_powers = decay ** -exponents   # d**-k
+
+    carry = initial
+    for start in range(0, n, block):
+        end = min(start + block, n)
+        size = end - start
+        scaled = np.cumsum(x[start:end] * inverse_powers[:size])
+        out[start:end] = powers[:size] * (scaled + decay * carry)
+        carry = out[end - 1]
+    return out
+
+
+def _ema(values, length):
+    """EMA ala pandas_ta: nilai ke-`length` adalah SMA awal, lalu ewm(adjust=False)."""
+    out = np.full(len(values), np.nan)
+    valid = np.flatnonzero(~np.isnan(values))
+    if len(valid) < length:
+        return out
+    first = valid[0]
+    seed_idx = first + length - 1
+    alpha = 2.0 / (length + 1)
+    seed = values[first:seed_idx + 1].mean()
+    out[seed_idx] = seed
+    if seed_idx + 1 < len(values):
+        out[seed_idx + 1:] = _recursive_filter(alpha * values[seed_idx + 1:], 1.0 - alpha, seed)
+    return out
+
+
+def _rma(values, length):
+    """RMA Wilder: ewm(alpha=1/length, adjust=True, min_periods=length) dari data valid pertama."""
+    out = np.full(len(values), np.nan)
+    valid = np.flatnonzero(~np.isnan(values))
+    if len(valid) < length:
+        return out
+    first = valid[0]
+    decay = 1.0 - 1.0 / length
+    size = len(values) - first
+    numerator = _recursive_filter(values[first:], decay)
+    # Penyebut sum(d**j) konvergen ke 1/(1-d); hanya bagian awal yang perlu dihitung.
+    denominator = np.full(size, 1.0 / (1.0 - decay))
+    head = min(size, int(40.0 / -np.log(decay)) + 1)
+    denominator[:head] = (1.0 - decay ** np.arange(1, head + 1)) / (1.0 - decay)
+    out[first:] = numerator / denominator
+    out[first:first + length - 1] = np.nan
+    return out
+
+
+def _rolling_mean_std(values, length):
+    """
+    Rata-rata dan standar deviasi (ddof=0) bergulir memakai selisih cumsum.
+    Data dipusatkan terlebih dahulu agar jumlah kuadrat tidak kehilangan presisi.
+    """
+    n = len(values)
+    mean = np.full(n, np.nan)
+    std = np.full(n, np.nan)
+    if n >= length:
+        reference = values[:length].mean()
+        centered = values - reference
+        csum = np.concatenate(([0.0], np.cumsum(centered)))
+        csq = np.concatenate(([0.0], np.cumsum(centered * centered)))
+        window_mean = (csum[length:] - csum[:-length]) / length
+        window_sq = (csq[length:] - csq[:-length]) / length
+        mean[length - 1:] = window_mean + reference
+        std[length - 1:] = np.sqrt(np.maximum(window_sq - window_mean * window_mean, 0.0))
+    return mean, std
+
+
+def compute_indicator_array(high, low, close, out=None):
+    """
+    Menghitung semua indikator di INDICATOR_COLUMNS langsung ke array 2-D float32
+    berukuran (n, len(INDICATOR_COLUMNS)). Rumus mengikuti pandas_ta sehingga
+    hasilnya setara dengan jalur lama. `out` dapat diisi array yang sudah
+    dialokasikan untuk menghindari alokasi ulang.
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    n = len(close)
+    if out is None:
+        out = np.empty((n, len(INDICATOR_COLUMNS)), dtype=np.float32)
+
+    out[:, 0] = _ema(close, 10)
+    out[:, 1] = _ema(close, 50)
+
+    sma, std = _rolling_mean_std(close, 20)
+    out[:, 2] = sma
+    out[:, 8] = sma - 2.0 * std
+    out[:, 9] = sma
+    out[:, 10] = sma + 2.0 * std
+
+    diff = np.full(n, np.nan)
+    diff[1:] = np.diff(close)
+    gain = _rma(np.where(diff > 0, diff, np.where(np.isnan(diff), np.nan, 0.0)), 14)
+    loss = _rma(np.where(diff < 0, -diff, np.where(np.isnan(diff), np.nan, 0.0)), 14)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        out[:, 3] = 100.0 * gain / (gain + loss)
+
+    macd = _ema(close, 12) - _ema(close, 26)
+    signal = _ema(macd, 9)
+    out[:, 4] = macd
+    out[:, 5] = macd - signal
+    out[:, 6] = signal
+
+    prev_close = np.full(n, np.nan)
+    prev_close[1:] = close[:-1]
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(prev_close - low)))
+    true_range[:1] = np.nan
+    out[:, 7] = _rma(true_range, 14)
+    return out
+
+
+def check_parity(df, rtol=1e-6, atol=1e-10):
+    """
+    Membandingkan kernel NumPy dengan jalur pandas_ta pada DataFrame OHLCV
+    `df`. Melempar AssertionError jika ada kolom yang berbeda di luar
+    toleransi (dibandingkan pada baris yang terisi di keduanya) atau tidak
+    punya baris bersama sama sekali. Mengembalikan dict {kolom: selisih
+    absolut maksimum}.
+    """
+    from feature_engine import compute_indicators_pandas_ta
+
+    ours = compute_indicator_array(df['high'].to_numpy(), df['low'].to_numpy(), df['close'].to_numpy())
+    reference = compute_indicators_pandas_ta(df)
+    max_diff, mismatched = {}, []
+    for j, col in enumerate(INDICATOR_COLUMNS):
+        if col not in reference.columns:
+            mismatched.append(f"{col} (tidak ada di keluaran pandas_ta)")
+            continue
+        expected = reference[col].to_numpy(dtype=np.float64)
+        both = ~np.isnan(ours[:, j]) & ~np.isnan(expected)
+        if not both.any():
+            mismatched.append(f"{col} (tidak ada baris yang terisi di keduanya)")
+            continue
+        max_diff[col] = float(np.max(np.abs(ours[both, j] - expected[both])))
+        if not np.allclose(ours[both, j], expected[both], rtol=rtol, atol=atol):
+            mismatched.append(f"{col} (selisih maks {max_diff[col]:.3g})")
+    if mismatched:
+        raise AssertionError(f"Kernel NumPy tidak cocok dengan pandas_ta: {', '.join(mismatched)}")
+    return max_diff
+
+
+def benchmark(sizes=(500, 100_000), repeats=3):
+    """
+    Membandingkan kernel NumPy dengan jalur pandas_ta untuk kecepatan dan
+    memori puncak (tracemalloc), setelah memastikan hasil keduanya cocok
+    (check_parity). pandas_ta wajib terpasang: tanpa pembanding, benchmark
+    ini tidak membuktikan apa pun. Mengembalikan list dict hasil.
+    """
+    import pandas as pd
+
+    try:
+        import pandas_ta  # noqa: F401
+    except ImportError as e:
+        raise ImportError("benchmark() membutuhkan pandas_ta sebagai pembanding; "
+                          "pasang dengan `pip install pandas_ta`.") from e
+    from feature_engine import compute_indicators_pandas_ta
+
+    results = []
+    rng = np.random.default_rng(0)
+    for size in sizes:
+        close = 1.1 * np.exp(np.cumsum(rng.normal(0, 0.001, size)))
+        high = close * (1 + np.abs(rng.normal(0, 0.0005, size)))
+        low = close * (1 - np.abs(rng.normal(0, 0.0005, size)))
+        df = pd.DataFrame({'open': close, 'high': high, 'low': low, 'close': close, 'volume': 0.0},
+                          index=pd.date_range("2020-01-01", periods=size, freq="h"))
+        max_diff = check_parity(df)
+
+        for backend in ('numpy', 'pandas_ta'):
+            if backend == 'numpy':
+                run = lambda: compute_indicator_array(high, low, close)
+            else:
+                run = lambda: compute_indicators_pandas_ta(df)
+
+            timings = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                run()
+                timings.append(time.perf_counter() - start)
+
+            tracemalloc.start()
+            run()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            results.append({'backend': backend, 'bars': size, 'best_seconds': min(timings),
+                            'peak_bytes': peak, 'max_abs_diff': max(max_diff.values())})
+    return results
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    for r in benchmark():
+        logging.info(f"{r['backend']:<10} {r['bars']:>7} bar: {r['best_seconds'] * 1000:9.2f} ms, "
+                     f"memori puncak {r['peak_bytes'] / 1024:10.1f} KiB, "
+                     f"selisih maks vs pandas_ta {r['max_abs_diff']:.3g}")
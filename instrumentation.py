@@ -0,0 +1,246 @@
+# instrumentation.py
+import io
+import os
+import sys
+import json
+import time
+import pstats
+import logging
+import resource
+import threading
+import cProfile
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+from config import METRICS_ENABLED, METRICS_JSONL_PATH, METRICS_PROM_PATH, PROFILE_DIR
+
+# D1T_PROFILE=cprofile, tracemalloc, atau keduanya (dipisah koma) mengaktifkan
+# profiling untuk setiap siklus; hasilnya ditulis ke PROFILE_DIR.
+PROFILE_ENV = 'D1T_PROFILE'
+
+_lock = threading.Lock()
+_cycle = None
+
+
+class _Cycle:
+    def __init__(self, name):
+        self.name = name
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.stages = []  # dict per pemanggilan tahap
+        self.http = {}  # endpoint -> agregat
+        self.rate_limit = {'acquires': 0, 'throttled': 0, 'wait_seconds_total': 0.0, 'wait_seconds_max': 0.0,
+                           'queue_depth_max': 0, 'rate_limited_responses': 0}
+        self.profiler = None
+        self.tracemalloc_started = False
+
+
+def _peak_rss_bytes():
+    # ru_maxrss dalam KiB di Linux (byte di macOS).
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _profile_modes():
+    return {mode.strip().lower() for mode in os.environ.get(PROFILE_ENV, '').split(',') if mode.strip()}
+
+
+def start_cycle(name='prediction'):
+    """Memulai pengumpulan metrik untuk satu siklus (menggantikan siklus yang belum ditutup)."""
+    global _cycle
+    if not METRICS_ENABLED:
+        return
+    cycle = _Cycle(name)
+    modes = _profile_modes()
+    if 'tracemalloc' in modes and not tracemalloc.is_tracing():
+        tracemalloc.start(25)
+        cycle.tracemalloc_started = True
+    if 'cprofile' in modes:
+        cycle.profiler = cProfile.Profile()
+        cycle.profiler.enable()
+    with _lock:
+        _cycle = cycle
+
+
+@contextmanager
+def stage(name, symbol=None, rows=None):
+    """
+    Mengukur waktu dinding satu tahap. Objek yang di-yield adalah dict; isi
+    `rows` di dalamnya jika jumlah baris baru diketahui di tengah tahap.
+    Tanpa siklus aktif, tahap tidak dicatat.
+    """
+    record = {'stage': name, 'symbol': symbol, 'rows': rows}
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record['seconds'] = time.perf_counter() - start
+        with _lock:
+            if _cycle is not None:
+                _cycle.stages.append(record)
+
+
+def record_http(endpoint, seconds, status=None, ok=True, attempt=1):
+    """Mencatat satu request HTTP: latensi, status, dan apakah merupakan retry."""
+    with _lock:
+        if _cycle is None:
+            return
+        stats = _cycle.http.setdefault(endpoint, {
+            'requests': 0, 'errors': 0, 'retries': 0,
+            'latency_seconds_total': 0.0, 'latency_seconds_max': 0.0, 'status_codes': {},
+        })
+        stats['requests'] += 1
+        stats['errors'] += 0 if ok else 1
+        stats['retries'] += 1 if attempt > 1 else 0
+        stats['latency_seconds_total'] += seconds
+        stats['latency_seconds_max'] = max(stats['latency_seconds_max'], seconds)
+        if status is not None:
+            stats['status_codes'][str(status)] = stats['status_codes'].get(str(status), 0) + 1
+
+
+def record_rate_limit(wait_seconds=0.0, queue_depth=0, rate_limited=False):
+    """Mencatat satu pengambilan kredit dari rate limiter (lama antre, kedalaman antrean) atau satu respons 429."""
+    with _lock:
+        if _cycle is None:
+            return
+        stats = _cycle.rate_limit
+        if rate_limited:
+            stats['rate_limited_responses'] += 1
+            return
+        stats['acquires'] += 1
+        stats['throttled'] += 1 if wait_seconds > 0.001 else 0
+        stats['wait_seconds_total'] += wait_seconds
+        stats['wait_seconds_max'] = max(stats['wait_seconds_max'], wait_seconds)
+        stats['queue_depth_max'] = max(stats['queue_depth_max'], queue_depth + 1)
+
+
+def _summarize(cycle):
+    totals = {}
+    per_symbol = {}
+    for record in cycle.stages:
+        total = totals.setdefault(record['stage'], {'count': 0, 'seconds': 0.0, 'rows': 0})
+        total['count'] += 1
+        total['seconds'] += record['seconds']
+        total['rows'] += record['rows'] or 0
+        if record['symbol'] is not None:
+            per_symbol.setdefault(record['symbol'], {}).setdefault(record['stage'], 0.0)
+            per_symbol[record['symbol']][record['stage']] += record['seconds']
+    return {
+        'timestamp': datetime.fromtimestamp(cycle.started_at).strftime("%Y-%m-%d %H:%M:%S"),
+        'started_at': cycle.started_at,
+        'cycle': cycle.name,
+        'duration_seconds': round(time.perf_counter() - cycle.start, 6),
+        'peak_rss_bytes': _peak_rss_bytes(),
+        'stages': {name: {**t, 'seconds': round(t['seconds'], 6)} for name, t in totals.items()},
+        'symbols': {symbol: {name: round(sec, 6) for name, sec in stages.items()}
+                    for symbol, stages in per_symbol.items()},
+        'http': cycle.http,
+        'rate_limit': {**cycle.rate_limit, 'wait_seconds_total': round(cycle.rate_limit['wait_seconds_total'], 6),
+                       'wait_seconds_max': round(cycle.rate_limit['wait_seconds_max'], 6)},
+    }
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def _prometheus_text(summary):
+    lines = []
+
+    def metric(name, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        for labels, value in samples:
+            label_text = ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+    cycle = {'cycle': summary['cycle']}
+    metric('d1t_cycle_duration_seconds', 'Durasi siklus terakhir.', [(cycle, summary['duration_seconds'])])
+    metric('d1t_cycle_timestamp_seconds', 'Waktu mulai siklus terakhir (epoch).',
+           [(cycle, round(summary['started_at'], 3))])
+    metric('d1t_peak_rss_bytes', 'Puncak resident set size proses.', [(cycle, summary['peak_rss_bytes'])])
+    stages = summary['stages'].items()
+    metric('d1t_stage_seconds', 'Total waktu per tahap pada siklus terakhir.',
+           [({'stage': name}, t['seconds']) for name, t in stages])
+    metric('d1t_stage_calls', 'Jumlah pemanggilan per tahap.', [({'stage': name}, t['count']) for name, t in stages])
+    metric('d1t_stage_rows', 'Jumlah baris yang diproses per tahap.', [({'stage': name}, t['rows']) for name, t in stages])
+    metric('d1t_symbol_stage_seconds', 'Waktu per simbol per tahap.',
+           [({'symbol': symbol, 'stage': name}, sec)
+            for symbol, per_stage in summary['symbols'].items() for name, sec in per_stage.items()])
+    http = summary['http'].items()
+    metric('d1t_http_requests', 'Jumlah request HTTP per endpoint.', [({'endpoint': e}, s['requests']) for e, s in http])
+    metric('d1t_http_errors', 'Jumlah request HTTP gagal.', [({'endpoint': e}, s['errors']) for e, s in http])
+    metric('d1t_http_retries', 'Jumlah retry HTTP.', [({'endpoint': e}, s['retries']) for e, s in http])
+    metric('d1t_http_latency_seconds_sum', 'Total latensi HTTP.',
+           [({'endpoint': e}, round(s['latency_seconds_total'], 6)) for e, s in http])
+    metric('d1t_http_latency_seconds_max', 'Latensi HTTP maksimum.',
+           [({'endpoint': e}, round(s['latency_seconds_max'], 6)) for e, s in http])
+    rate_limit = summary['rate_limit']
+    metric('d1t_rate_limit_wait_seconds_sum', 'Total waktu request menunggu kredit API.',
+           [(cycle, rate_limit['wait_seconds_total'])])
+    metric('d1t_rate_limit_wait_seconds_max', 'Waktu tunggu kredit API terlama.', [(cycle, rate_limit['wait_seconds_max'])])
+    metric('d1t_rate_limit_queue_depth_max', 'Kedalaman antrean rate limiter maksimum.',
+           [(cycle, rate_limit['queue_depth_max'])])
+    metric('d1t_rate_limit_throttled_requests', 'Jumlah request yang harus menunggu kredit.',
+           [(cycle, rate_limit['throttled'])])
+    metric('d1t_rate_limit_responses', 'Jumlah respons rate limit (429) dari API.',
+           [(cycle, rate_limit['rate_limited_responses'])])
+    return '\n'.join(lines) + '\n'
+
+
+def _write_profiles(cycle, stamp):
+    if cycle.profiler is None and not cycle.tracemalloc_started:
+        return
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    if cycle.profiler is not None:
+        cycle.profiler.disable()
+        path = os.path.join(PROFILE_DIR, f"cycle_{stamp}.prof")
+        cycle.profiler.dump_stats(path)
+        text = io.StringIO()
+        pstats.Stats(cycle.profiler, stream=text).sort_stats('cumulative').print_stats(25)
+        with open(os.path.join(PROFILE_DIR, f"cycle_{stamp}_cprofile.txt"), 'w') as f:
+            f.write(text.getvalue())
+        logging.info(f"Profil cProfile disimpan di {path}")
+    if cycle.tracemalloc_started:
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        path = os.path.join(PROFILE_DIR, f"cycle_{stamp}_tracemalloc.txt")
+        with open(path, 'w') as f:
+            f.write(f"peak_traced_bytes {peak}\n")
+            for stat in snapshot.statistics('lineno')[:25]:
+                f.write(f"{stat}\n")
+        logging.info(f"Profil tracemalloc (puncak {peak / 1024 / 1024:.1f} MiB) disimpan di {path}")
+
+
+def end_cycle():
+    """
+    Menutup siklus aktif: ringkasan ditambahkan sebagai satu baris JSON ke
+    METRICS_JSONL_PATH dan ditulis ulang sebagai textfile Prometheus di
+    METRICS_PROM_PATH. Mengembalikan ringkasan (atau None tanpa siklus aktif).
+    """
+    global _cycle
+    with _lock:
+        cycle, _cycle = _cycle, None
+    if cycle is None:
+        return None
+
+    summary = _summarize(cycle)
+    stamp = datetime.fromtimestamp(cycle.started_at).strftime("%Y%m%d_%H%M%S")
+    try:
+        _write_profiles(cycle, stamp)
+    except Exception as e:
+        logging.warning(f"Gagal menulis hasil profiling: {e}")
+
+    try:
+        os.makedirs(os.path.dirname(METRICS_JSONL_PATH) or '.', exist_ok=True)
+        with open(METRICS_JSONL_PATH, 'a') as f:
+            f.write(json.dumps(summary) + '\n')
+        tmp_path = f"{METRICS_PROM_PATH}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(_prometheus_text(summary))
+        os.replace(tmp_path, METRICS_PROM_PATH)
+    except Exception as e:
+        logging.warning(f"Gagal menulis metrik: {e}")
+    return summary
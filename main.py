@@ -1,13 +1,19 @@
 # main.py
+import argparse
 import logging
 import os
 from datetime import datetime
 
 # Impor dari modul-modul lain dalam proyek
 from config import SYMBOLS, LOGS_DIR, AI_NAME
-from predictor import get_prediction
+from predictor import get_predictions
 from notifier import send_telegram_notification
 from performance_analyzer import analyze_performance, update_history
+from model_registry import get_registry_stats
+from data_cache import get_cache_stats
+from rate_limiter import get_limiter_stats
+import instrumentation
+from instrumentation import stage
 
 # Konfigurasi logging
 os.makedirs(LOGS_DIR, exist_ok=True)
@@ -21,22 +27,38 @@ logging.basicConfig(
 )
 
 def main():
-    """Fungsi utama untuk menjalankan siklus prediksi."""
+    """
+    Fungsi utama untuk menjalankan siklus prediksi. Waktu setiap tahap dicatat
+    oleh modul instrumentation dan ditulis sebagai JSON lines dan textfile
+    Prometheus di akhir siklus.
+    """
+    instrumentation.start_cycle('prediction')
+    try:
+        summary = _run_cycle()
+    finally:
+        metrics = instrumentation.end_cycle()
+    if metrics:
+        stage_text = ", ".join(f"{name} {t['seconds']:.3f}s" for name, t in metrics['stages'].items())
+        logging.info(f"Durasi siklus {metrics['duration_seconds']:.3f} detik ({stage_text}); "
+                     f"puncak RSS {metrics['peak_rss_bytes'] / 1024 / 1024:.1f} MiB.")
+        summary['duration_seconds'] = metrics['duration_seconds']
+        summary['stage_seconds'] = {name: t['seconds'] for name, t in metrics['stages'].items()}
+    return summary
+
+def _run_cycle():
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     logging.info(f"===== Memulai Siklus Prediksi pada {timestamp} =====")
 
     # 1. Analisis performa dari histori dan dapatkan threshold adaptif
-    current_confidence_threshold = analyze_performance()
+    with stage('performance_analysis'):
+        current_confidence_threshold = analyze_performance()
 
-    all_predictions = []
-    # 2. Dapatkan prediksi untuk setiap simbol
-    for symbol in SYMBOLS:
-        try:
-            prediction_result = get_prediction(symbol)
-            if prediction_result:
-                all_predictions.append(prediction_result)
-        except Exception as e:
-            logging.error(f"Gagal total mendapatkan prediksi untuk {symbol}: {e}", exc_info=True)
+    # 2. Dapatkan prediksi untuk semua simbol dalam satu batch inferensi
+    try:
+        all_predictions = get_predictions(SYMBOLS)
+    except Exception as e:
+        logging.error(f"Gagal total mendapatkan prediksi: {e}", exc_info=True)
+        all_predictions = []
 
     # 3. Filter prediksi berdasarkan confidence threshold yang sudah disesuaikan
     high_confidence_predictions = [
@@ -46,19 +68,59 @@ def main():
     # 4. Kirim notifikasi jika ada sinyal dengan confidence tinggi
     if high_confidence_predictions:
         try:
-            send_telegram_notification(high_confidence_predictions, current_confidence_threshold, AI_NAME)
+            with stage('notification', rows=len(high_confidence_predictions)):
+                send_telegram_notification(high_confidence_predictions, current_confidence_threshold, AI_NAME)
             logging.info(f"Notifikasi berhasil dikirim untuk {len(high_confidence_predictions)} sinyal.")
         except Exception as e:
             logging.error(f"Gagal mengirim notifikasi Telegram: {e}")
     else:
         logging.info("Tidak ada sinyal dengan confidence tinggi untuk dilaporkan saat ini.")
 
-    # 5. Perbarui file histori dengan semua prediksi (baik yang dikirim maupun tidak)
+    # 5. Perbarui histori dengan semua prediksi (baik yang dikirim maupun tidak)
     if all_predictions:
-        update_history(all_predictions)
+        with stage('history_update', rows=len(all_predictions)):
+            update_history(all_predictions, current_confidence_threshold)
 
+    stats = get_registry_stats()
+    logging.info(
+        f"Statistik model registry: {stats['hits']} hit, {stats['misses']} miss, "
+        f"{stats['reloads']} reload, total waktu muat {stats['load_time_total']:.3f} detik."
+    )
+    limiter = get_limiter_stats()
+    if limiter['throttled'] or limiter['rate_limited']:
+        logging.info(
+            f"Rate limiter Twelve Data: {limiter['throttled']} request menunggu kredit "
+            f"(total {limiter['throttle_seconds_total']:.1f} detik, antrean maks {limiter['queue_depth_max']}), "
+            f"{limiter['rate_limited']} respons 429."
+        )
+    prediction_cache = get_cache_stats().get('prediction')
+    if prediction_cache:
+        lookups = prediction_cache['hits'] + prediction_cache['misses']
+        logging.info(
+            f"Cache prediksi: {prediction_cache['hits']} hit, {prediction_cache['misses']} miss "
+            f"(hit rate {prediction_cache['hits'] / lookups:.0%})."
+        )
     logging.info("===== Siklus Prediksi Selesai =====")
+    return {
+        'predictions': len(all_predictions),
+        'signals': len(high_confidence_predictions),
+        'confidence_threshold': float(current_confidence_threshold),
+    }
+
+def run_daemon():
+    """Mode daemon: model, session HTTP, dan cache tetap hangat di antara siklus."""
+    from model_registry import preload
+    from scheduler import PredictionScheduler
+
+    preload()
+    PredictionScheduler(main).run_forever()
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Siklus prediksi D-1T.")
+    parser.add_argument('--daemon', action='store_true',
+                        help="jalankan terus-menerus, satu siklus setelah setiap bar tutup")
+    if parser.parse_args().daemon:
+        run_daemon()
+    else:
+        main()
 
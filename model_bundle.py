@@ -0,0 +1,174 @@
+# model_bundle.py
+import os
+import json
+import time
+import struct
+import hashlib
+import logging
+from datetime import datetime
+import numpy as np
+
+from config import (MODEL_PATH, MODEL_BUNDLE_PATH, NUMPY_MODEL_DTYPE, FEATURES, SEQUENCE_LENGTH,
+                    PREDICTION_HORIZON, NORMALIZER_PATH, SCALER_X_PATH, SCALER_Y_PATH)
+from numpy_lstm import collect_layers, build_model
+
+# Struktur file:
+#   MAGIC (8 byte) | panjang header (uint32 LE) | header JSON (UTF-8) | padding
+#   | blok data: setiap array disimpan mentah (C-order) pada offset kelipatan _ALIGN.
+# Header mencatat skema fitur, panjang sekuens, horizon, spesifikasi layer,
+# metadata normalisasi, lokasi setiap array, dan hash isi bundle.
+MAGIC = b"D1TMODEL"
+FORMAT_VERSION = 1
+_ALIGN = 64
+
+
+def _aligned(offset):
+    return -(-offset // _ALIGN) * _ALIGN
+
+
+def _content_hash(header, arrays):
+    """SHA-256 dari header (tanpa hash & waktu pembuatan) dan isi seluruh array."""
+    meta = {k: v for k, v in header.items() if k not in ('content_sha256', 'created_at')}
+    digest = hashlib.sha256(json.dumps(meta, sort_keys=True).encode('utf-8'))
+    for name in sorted(arrays):
+        digest.update(np.ascontiguousarray(arrays[name]).tobytes())
+    return digest.hexdigest()
+
+
+class ModelBundle:
+    """Hasil load_bundle: model NumPy, normalizer, dan header bundle."""
+
+    def __init__(self, model, normalizer, header, path):
+        self.model = model
+        self.normalizer = normalizer
+        self.header = header
+        self.path = path
+
+    @property
+    def content_hash(self):
+        return self.header['content_sha256']
+
+
+def write_bundle(normalizer, keras_path=MODEL_PATH, bundle_path=MODEL_BUNDLE_PATH, dtype=NUMPY_MODEL_DTYPE,
+                 features=None, sequence_length=SEQUENCE_LENGTH, horizon=PREDICTION_HORIZON):
+    """
+    Menulis satu file bundle berisi bobot model (dari `keras_path`), parameter
+    scaler dari `normalizer`, skema fitur, panjang sekuens, dan horizon.
+    Mengembalikan header yang ditulis.
+    """
+    layer_specs, arrays = collect_layers(keras_path, dtype)
+    normalization, scaler_arrays = normalizer.to_arrays()
+    arrays.update(scaler_arrays)
+    arrays = {name: np.ascontiguousarray(arr) for name, arr in arrays.items()}
+
+    entries = {}
+    offset = 0
+    for name, arr in arrays.items():
+        offset = _aligned(offset)
+        entries[name] = {'dtype': arr.dtype.str, 'shape': list(arr.shape), 'offset': offset}
+        offset += arr.nbytes
+
+    header = {
+        'format_version': FORMAT_VERSION,
+        'created_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'features': list(features or normalizer.features),
+        'sequence_length': sequence_length,
+        'prediction_horizon': horizon,
+        'dtype': dtype,
+        'layers': layer_specs,
+        'normalization': normalization,
+        'arrays': entries,
+    }
+    header['content_sha256'] = _content_hash(header, arrays)
+    header_bytes = json.dumps(header).encode('utf-8')
+    data_start = _aligned(len(MAGIC) + 4 + len(header_bytes))
+
+    tmp_path = f"{bundle_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<I', len(header_bytes)))
+        f.write(header_bytes)
+        for name, arr in arrays.items():
+            f.write(b'\0' * (data_start + entries[name]['offset'] - f.tell()))
+            f.write(arr.tobytes())
+    os.replace(tmp_path, bundle_path)
+    logging.info(f"Bundle model ditulis ke {bundle_path} ({os.path.getsize(bundle_path) / 1024:.1f} KiB).")
+    return header
+
+
+def read_header(bundle_path=MODEL_BUNDLE_PATH):
+    """Membaca header bundle. Mengembalikan (header, offset awal blok data)."""
+    with open(bundle_path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{bundle_path} bukan file bundle model.")
+        (header_len,) = struct.unpack('<I', f.read(4))
+        header = json.loads(f.read(header_len).decode('utf-8'))
+    if header.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Versi format {bundle_path} tidak dikenal: {header.get('format_version')}")
+    return header, _aligned(len(MAGIC) + 4 + header_len)
+
+
+def check_schema(header, features=None, sequence_length=SEQUENCE_LENGTH, horizon=PREDICTION_HORIZON):
+    """Memastikan bundle dilatih dengan skema yang sama dengan config; ValueError jika tidak."""
+    features = list(features or FEATURES)
+    if header['features'] != features:
+        missing = [f for f in header['features'] if f not in features]
+        extra = [f for f in features if f not in header['features']]
+        detail = f"hilang: {missing}, tambahan: {extra}" if missing or extra else "urutan berbeda"
+        raise ValueError(f"FEATURES di config tidak cocok dengan bundle model ({detail}). "
+                         "Latih ulang model atau kembalikan config.FEATURES.")
+    if header['sequence_length'] != sequence_length:
+        raise ValueError(f"SEQUENCE_LENGTH config ({sequence_length}) berbeda dengan bundle "
+                         f"({header['sequence_length']}).")
+    if header['prediction_horizon'] != horizon:
+        raise ValueError(f"PREDICTION_HORIZON config ({horizon}) berbeda dengan bundle "
+                         f"({header['prediction_horizon']}).")
+
+
+def load_bundle(bundle_path=MODEL_BUNDLE_PATH, verify=False):
+    """
+    Memuat bundle: header JSON dibaca, lalu setiap array dipetakan langsung
+    dari file dengan memory-map (tanpa unpickle dan tanpa TensorFlow).
+    Menolak bundle yang skemanya tidak cocok dengan config. Jika `verify`,
+    hash isi dihitung ulang dan dibandingkan.
+    """
+    from dataset_builder import FeatureNormalizer
+
+    header, data_start = read_header(bundle_path)
+    check_schema(header)
+
+    mapped = np.memmap(bundle_path, dtype=np.uint8, mode='r')
+    arrays = {}
+    for name, entry in header['arrays'].items():
+        dtype = np.dtype(entry['dtype'])
+        count = int(np.prod(entry['shape'], dtype=np.int64))
+        arrays[name] = np.frombuffer(mapped, dtype=dtype, count=count,
+                                     offset=data_start + entry['offset']).reshape(entry['shape'])
+
+    if verify and _content_hash(header, arrays) != header['content_sha256']:
+        raise ValueError(f"Hash isi {bundle_path} tidak cocok; file rusak atau diubah.")
+
+    model = build_model(header['layers'], arrays)
+    normalizer = FeatureNormalizer.from_arrays(header['normalization'], arrays, header['features'])
+    return ModelBundle(model, normalizer, header, bundle_path)
+
+
+def build_from_legacy(bundle_path=MODEL_BUNDLE_PATH):
+    """Membuat bundle dari artefak lama (model .keras + normalizer/scaler yang ada)."""
+    import joblib
+    from dataset_builder import FeatureNormalizer
+
+    if os.path.exists(NORMALIZER_PATH):
+        normalizer = FeatureNormalizer.load(NORMALIZER_PATH)
+    else:
+        normalizer = FeatureNormalizer.from_scalers(joblib.load(SCALER_X_PATH), joblib.load(SCALER_Y_PATH))
+    return write_bundle(normalizer, bundle_path=bundle_path, features=FEATURES)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    build_from_legacy()
+    start = time.perf_counter()
+    bundle = load_bundle(verify=True)
+    logging.info(f"Bundle dimuat & diverifikasi dalam {(time.perf_counter() - start) * 1000:.1f} ms "
+                 f"(hash {bundle.content_hash[:12]}).")
@@ -0,0 +1,233 @@
+# model_registry.py
+import os
+import time
+import hashlib
+import logging
+import threading
+import importlib.util
+import joblib
+
+from config import (MODEL_PATH, SCALER_X_PATH, SCALER_Y_PATH, NUMPY_MODEL_PATH, INFERENCE_BACKEND,
+                    NORMALIZER_PATH, MODEL_BUNDLE_PATH, NORMALIZATION_MODE)
+
+# Cache tingkat proses: path file -> objek yang sudah dimuat beserta sidik jarinya.
+_cache = {}
+_lock = threading.RLock()
+_stats = {
+    'hits': 0,
+    'misses': 0,
+    'reloads': 0,
+    'load_time_total': 0.0,
+    'last_load_time': {},
+}
+# Normalizer yang sudah diperingatkan karena mode-nya berbeda dari config.
+_mode_warned = set()
+
+
+def _file_hash(path):
+    """Menghitung hash SHA-256 dari isi file."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _load_keras_model(path):
+    # Impor TensorFlow ditunda sampai model benar-benar dibutuhkan.
+    from tensorflow.keras.models import load_model
+    return load_model(path)
+
+
+def _load_numpy_model(path):
+    from numpy_lstm import load_numpy_model
+    model = load_numpy_model(path)
+    if os.path.exists(MODEL_PATH) and model.source_sha256 != _file_hash(MODEL_PATH):
+        logging.warning(f"{path} diekspor dari versi {MODEL_PATH} yang berbeda. "
+                        f"Jalankan `python numpy_lstm.py` untuk mengekspor ulang.")
+    return model
+
+
+def _load_bundle(path):
+    from model_bundle import load_bundle
+    return load_bundle(path)
+
+
+def get_backend():
+    """Menentukan backend inferensi: 'bundle', 'keras', atau 'numpy'."""
+    if INFERENCE_BACKEND in ('bundle', 'keras', 'numpy'):
+        return INFERENCE_BACKEND
+    if os.path.exists(MODEL_BUNDLE_PATH):
+        return 'bundle'
+    if importlib.util.find_spec('tensorflow') is not None:
+        return 'keras'
+    return 'numpy'
+
+
+def _get_cached(path, loader):
+    """
+    Mengembalikan objek dari cache jika file tidak berubah. Perubahan dideteksi
+    lewat mtime/ukuran; hash isi file hanya dihitung ulang jika mtime berubah,
+    sehingga file yang sekadar di-"touch" tidak memicu pemuatan ulang.
+    """
+    with _lock:
+        stat = os.stat(path)
+        entry = _cache.get(path)
+
+        if entry is not None:
+            if entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+                _stats['hits'] += 1
+                return entry['obj']
+
+            file_hash = _file_hash(path)
+            if file_hash == entry['hash']:
+                entry['mtime'], entry['size'] = stat.st_mtime, stat.st_size
+                _stats['hits'] += 1
+                return entry['obj']
+            logging.info(f"File {path} berubah. Memuat ulang...")
+            _stats['reloads'] += 1
+        else:
+            file_hash = _file_hash(path)
+
+        _stats['misses'] += 1
+        start = time.perf_counter()
+        obj = loader(path)
+        elapsed = time.perf_counter() - start
+
+        _cache[path] = {
+            'obj': obj,
+            'mtime': stat.st_mtime,
+            'size': stat.st_size,
+            'hash': file_hash,
+        }
+        _stats['load_time_total'] += elapsed
+        _stats['last_load_time'][path] = elapsed
+        logging.info(f"Memuat {path} dalam {elapsed:.3f} detik.")
+        return obj
+
+
+def _model_path():
+    return {'bundle': MODEL_BUNDLE_PATH, 'numpy': NUMPY_MODEL_PATH}.get(get_backend(), MODEL_PATH)
+
+
+def get_bundle():
+    """
+    Mengembalikan bundle model (lihat model_bundle.py), dimuat sekali per proses.
+    Memunculkan ValueError jika skema bundle tidak cocok dengan config.
+    """
+    return _get_cached(MODEL_BUNDLE_PATH, _load_bundle)
+
+
+def get_model():
+    """
+    Mengembalikan model LSTM, dimuat sekali per proses. Bundle (MODEL_BUNDLE_PATH)
+    dipakai jika tersedia; tanpa bundle dan tanpa TensorFlow (atau
+    INFERENCE_BACKEND = "numpy"), model NumPy dari NUMPY_MODEL_PATH dipakai.
+    """
+    backend = get_backend()
+    if backend == 'bundle':
+        return get_bundle().model
+    if backend == 'numpy':
+        return _get_cached(NUMPY_MODEL_PATH, _load_numpy_model)
+    return _get_cached(MODEL_PATH, _load_keras_model)
+
+
+def get_scalers():
+    """Mengembalikan pasangan (scaler_x, scaler_y), dimuat sekali per proses."""
+    scaler_x = _get_cached(SCALER_X_PATH, joblib.load)
+    scaler_y = _get_cached(SCALER_Y_PATH, joblib.load)
+    return scaler_x, scaler_y
+
+
+def _load_normalizer(path):
+    from dataset_builder import FeatureNormalizer
+    return FeatureNormalizer.load(path)
+
+
+def get_normalizer():
+    """
+    Mengembalikan normalizer fitur/target yang dipakai saat training: dari
+    bundle jika dipakai, lalu NORMALIZER_PATH. Jika keduanya belum ada (model
+    lama), scaler global lama dibungkus sebagai normalizer mode 'global'.
+    Mode yang berbeda dari NORMALIZATION_MODE diperingatkan sekali per normalizer.
+    """
+    if get_backend() == 'bundle':
+        normalizer = get_bundle().normalizer
+    elif os.path.exists(NORMALIZER_PATH):
+        normalizer = _get_cached(NORMALIZER_PATH, _load_normalizer)
+    else:
+        from dataset_builder import FeatureNormalizer
+        normalizer = FeatureNormalizer.from_scalers(*get_scalers())
+    _check_normalizer_mode(normalizer)
+    return normalizer
+
+
+def _check_normalizer_mode(normalizer):
+    key = (id(normalizer), normalizer.mode)
+    if normalizer.mode == NORMALIZATION_MODE or key in _mode_warned:
+        return
+    with _lock:
+        _mode_warned.add(key)
+    logging.warning(f"Normalizer yang dimuat bermode '{normalizer.mode}', sedangkan config NORMALIZATION_MODE = "
+                    f"'{NORMALIZATION_MODE}'. Inferensi memakai mode '{normalizer.mode}'; latih ulang model "
+                    f"atau sesuaikan config.")
+
+
+def preload():
+    """Memuat model dan scaler lebih awal (misalnya saat container serverless dibuat)."""
+    try:
+        get_model()
+        get_normalizer()
+    except Exception as e:
+        logging.error(f"Gagal memuat model atau scaler saat preload: {e}")
+
+
+def get_model_hash():
+    """
+    Mengembalikan hash isi file model aktif (atau None jika file tidak ada).
+    Jika model sudah dimuat dan file tidak berubah, hash tersimpan dipakai;
+    model tidak perlu dimuat untuk mengetahui hash-nya.
+    """
+    return _path_hash(_model_path())
+
+
+def get_normalizer_hash():
+    """
+    Hash isi file normalizer yang dipakai get_normalizer (atau None jika tidak
+    ada). Pada backend bundle normalizer ada di dalam bundle, sehingga hash
+    bundle (= get_model_hash) sudah mencakupnya.
+    """
+    if get_backend() == 'bundle':
+        return _path_hash(MODEL_BUNDLE_PATH)
+    if os.path.exists(NORMALIZER_PATH):
+        return _path_hash(NORMALIZER_PATH)
+    hashes = [_path_hash(SCALER_X_PATH), _path_hash(SCALER_Y_PATH)]
+    return None if None in hashes else hashlib.sha256(''.join(hashes).encode('ascii')).hexdigest()
+
+
+def _path_hash(path):
+    """Hash isi `path`; memakai hash tersimpan di cache jika file tidak berubah sejak dimuat."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    with _lock:
+        entry = _cache.get(path)
+        if entry is not None and entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+            return entry['hash']
+    return _file_hash(path)
+
+
+def get_registry_stats():
+    """Mengembalikan salinan statistik registry (hit/miss dan waktu muat)."""
+    with _lock:
+        stats = dict(_stats)
+        stats['last_load_time'] = dict(_stats['last_load_time'])
+        stats['cached_files'] = sorted(_cache)
+        return stats
+
+
+def clear_registry():
+    """Mengosongkan cache sehingga pemanggilan berikutnya memuat ulang dari disk."""
+    with _lock:
+        _cache.clear()
@@ -1,10 +1,12 @@
 # notifier.py
+import math
 import requests
 import logging
 from datetime import datetime
 import pytz
 
 from config import TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID
+from signal_rules import stop_levels, risk_reward
 
 def send_telegram_notification(predictions, confidence_threshold, ai_name):
     """
@@ -54,31 +56,12 @@ def send_telegram_notification(predictions, confidence_threshold, ai_name):
         current_price_str = price_format.format(p['current_price'])
         atr_str = atr_format.format(p['atr'])
         
-        # Hitung SL/TP dan Risk-Reward Ratio
-        atr = p['atr']
-        current_price = p['current_price']
-        
-        sl_val = 0
-        tp_val = 0
-        rr_ratio_str = "N/A"
-
-        if p['trend'] == "Naik":
-            sl_val = current_price - (1.5 * atr)
-            tp_val = current_price + (2.0 * atr)
-        elif p['trend'] == "Turun":
-            sl_val = current_price + (1.5 * atr)
-            tp_val = current_price - (2.0 * atr)
-        
-        if sl_val != 0 and tp_val != 0:
-             # Hitung Risk to Reward
-            risk = abs(current_price - sl_val)
-            reward = abs(tp_val - current_price)
-            if risk > 0:
-                rr_ratio = reward / risk
-                rr_ratio_str = f"1:{rr_ratio:.2f}"
-            
-            sl_str = price_format.format(sl_val)
-            tp_str = price_format.format(tp_val)
+        # Hitung SL/TP dan Risk-Reward Ratio (aturan yang sama dengan backtest)
+        sl_val, tp_val = stop_levels(p['trend'], p['current_price'], p['atr'])
+        rr_ratio = risk_reward(p['current_price'], sl_val, tp_val)
+        rr_ratio_str = f"1:{rr_ratio:.2f}" if not math.isnan(rr_ratio) else "N/A"
+        sl_str = price_format.format(sl_val) if not math.isnan(sl_val) else "N/A"
+        tp_str = price_format.format(tp_val) if not math.isnan(tp_val) else "N/A"
 
         details.append(
             f"{trend_emoji} **{p['friendly_name']}** | {p['confidence']:.0f}% {color_emoji} {strength}\n"
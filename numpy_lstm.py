@@ -0,0 +1,217 @@
+# numpy_lstm.py
+import io
+import json
+import time
+import hashlib
+import logging
+import zipfile
+import numpy as np
+
+from config import MODEL_PATH, NUMPY_MODEL_PATH, NUMPY_MODEL_DTYPE
+
+# Versi format file .npz hasil ekspor.
+FORMAT_VERSION = 1
+
+
+def _sigmoid(x):
+    # Bentuk tanh stabil secara numerik untuk input besar.
+    return 0.5 * (np.tanh(0.5 * x) + 1.0)
+
+
+_ACTIVATIONS = {
+    'linear': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0),
+    'tanh': np.tanh,
+    'sigmoid': _sigmoid,
+}
+
+
+class NumpyLSTMModel:
+    """
+    Forward pass model Sequential (LSTM/Dense/Dropout) hasil train_model.py
+    dengan NumPy saja. Antarmuka `predict` mengikuti Keras sehingga bisa
+    menggantikan model TensorFlow di predictor.
+    """
+
+    def __init__(self, layers, compute_dtype=np.float32):
+        self.layers = layers
+        self.compute_dtype = compute_dtype
+        for layer in self.layers:
+            for key in ('kernel', 'recurrent_kernel', 'bias'):
+                if key in layer:
+                    layer[key] = np.ascontiguousarray(layer[key], dtype=compute_dtype)
+
+    def _lstm(self, layer, x):
+        batch, steps, _ = x.shape
+        units = layer['units']
+        # Proyeksi input untuk semua timestep sekaligus: (batch, steps, 4*units).
+        projected = x @ layer['kernel'] + layer['bias']
+        h = np.zeros((batch, units), dtype=self.compute_dtype)
+        c = np.zeros((batch, units), dtype=self.compute_dtype)
+        outputs = np.empty((batch, steps, units), dtype=self.compute_dtype) if layer['return_sequences'] else None
+
+        for t in range(steps):
+            z = projected[:, t, :] + h @ layer['recurrent_kernel']
+            # Urutan gate Keras: input, forget, cell, output.
+            i = _sigmoid(z[:, :units])
+            f = _sigmoid(z[:, units:2 * units])
+            g = np.tanh(z[:, 2 * units:3 * units])
+            o = _sigmoid(z[:, 3 * units:])
+            c = f * c + i * g
+            h = o * np.tanh(c)
+            if outputs is not None:
+                outputs[:, t, :] = h
+        return outputs if outputs is not None else h
+
+    def predict(self, x, batch_size=None, verbose=0):
+        """Menjalankan inferensi untuk input (batch, SEQUENCE_LENGTH, FEATURES)."""
+        out = np.asarray(x, dtype=self.compute_dtype)
+        for layer in self.layers:
+            if layer['type'] == 'LSTM':
+                out = self._lstm(layer, out)
+            elif layer['type'] == 'Dense':
+                out = _ACTIVATIONS[layer['activation']](out @ layer['kernel'] + layer['bias'])
+        return out
+
+    def predict_on_batch(self, x):
+        return self.predict(x)
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _read_keras_layers(keras_path):
+    """Membaca arsitektur & bobot dari file .keras (zip berisi config.json dan model.weights.h5)."""
+    with zipfile.ZipFile(keras_path) as archive:
+        config = json.loads(archive.read('config.json'))
+        weights_bytes = archive.read('model.weights.h5')
+
+    layer_configs = [(l['class_name'], l['config']) for l in config['config']['layers']
+                     if l['class_name'] in ('LSTM', 'Dense')]
+
+    try:
+        import h5py
+        with h5py.File(io.BytesIO(weights_bytes), 'r') as weights:
+            def read_vars(name, sub):
+                group = weights[f"layers/{name}/{sub}"]
+                return [np.array(group[str(i)]) for i in range(len(group))]
+
+            layers = []
+            for class_name, cfg in layer_configs:
+                sub = 'cell/vars' if class_name == 'LSTM' else 'vars'
+                layers.append((class_name, cfg, read_vars(cfg['name'], sub)))
+            return layers
+    except ImportError:
+        # Tanpa h5py, gunakan TensorFlow (hanya dibutuhkan saat ekspor).
+        from tensorflow.keras.models import load_model
+        model = load_model(keras_path)
+        return [(class_name, cfg, model.get_layer(cfg['name']).get_weights())
+                for class_name, cfg in layer_configs]
+
+
+def collect_layers(keras_path=MODEL_PATH, dtype=NUMPY_MODEL_DTYPE):
+    """
+    Membaca model Keras menjadi (list spesifikasi layer, dict array bobot
+    bernama `layer{idx}_{kernel|recurrent_kernel|bias}`) yang bisa disimpan
+    sebagai array biasa dan dijalankan oleh NumpyLSTMModel.
+    """
+    layer_specs = []
+    arrays = {}
+    for idx, (class_name, cfg, weights) in enumerate(_read_keras_layers(keras_path)):
+        layer_spec = {'type': class_name}
+        if class_name == 'LSTM':
+            if cfg.get('activation', 'tanh') != 'tanh' or cfg.get('recurrent_activation', 'sigmoid') != 'sigmoid':
+                raise ValueError(f"Aktivasi LSTM {cfg['name']} tidak didukung oleh backend NumPy.")
+            layer_spec.update(units=cfg['units'], return_sequences=cfg.get('return_sequences', False))
+            names = ('kernel', 'recurrent_kernel', 'bias')
+        else:
+            layer_spec.update(units=cfg['units'], activation=cfg.get('activation', 'linear'))
+            names = ('kernel', 'bias')
+        for name, value in zip(names, weights):
+            arrays[f"layer{idx}_{name}"] = np.asarray(value, dtype=dtype)
+        layer_specs.append(layer_spec)
+    return layer_specs, arrays
+
+
+def build_model(layer_specs, arrays):
+    """Menyusun NumpyLSTMModel dari keluaran collect_layers (array boleh berupa memmap)."""
+    layers = []
+    for idx, layer_spec in enumerate(layer_specs):
+        layer = dict(layer_spec)
+        for name in ('kernel', 'recurrent_kernel', 'bias'):
+            key = f"layer{idx}_{name}"
+            if key in arrays:
+                layer[name] = arrays[key]
+        layers.append(layer)
+    return NumpyLSTMModel(layers)
+
+
+def export_npz(keras_path=MODEL_PATH, npz_path=NUMPY_MODEL_PATH, dtype=NUMPY_MODEL_DTYPE):
+    """
+    Mengekspor bobot model Keras ke file .npz ringkas yang dapat dijalankan
+    oleh NumpyLSTMModel tanpa TensorFlow. `dtype` dapat 'float32' atau
+    'float16' (ukuran file setengahnya; komputasi tetap float32).
+    """
+    layer_specs, arrays = collect_layers(keras_path, dtype)
+    spec = {'format_version': FORMAT_VERSION, 'source_sha256': _file_sha256(keras_path),
+            'dtype': dtype, 'layers': layer_specs}
+    np.savez(npz_path, spec=np.array(json.dumps(spec)), **arrays)
+    logging.info(f"Model NumPy diekspor ke {npz_path} ({dtype}).")
+    return npz_path
+
+
+def load_numpy_model(npz_path=NUMPY_MODEL_PATH):
+    """Memuat file .npz hasil export_npz menjadi NumpyLSTMModel."""
+    with np.load(npz_path, allow_pickle=False) as data:
+        spec = json.loads(str(data['spec']))
+        if spec.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Versi format {npz_path} tidak dikenal: {spec.get('format_version')}")
+        model = build_model(spec['layers'], {key: data[key] for key in data.files if key != 'spec'})
+    model.source_sha256 = spec.get('source_sha256')
+    return model
+
+
+def verify_parity(keras_path=MODEL_PATH, batch=64, tolerance=1e-4, dtype='float32'):
+    """
+    Membandingkan output NumpyLSTMModel dengan model Keras pada input acak
+    berskala [0, 1] (rentang MinMaxScaler). Membutuhkan TensorFlow. Mengembalikan
+    (selisih absolut maksimum, waktu Keras, waktu NumPy).
+    """
+    import os
+    import tempfile
+    from tensorflow.keras.models import load_model
+
+    keras_model = load_model(keras_path)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        npz_path = os.path.join(tmp_dir, 'model.npz')
+        export_npz(keras_path, npz_path, dtype=dtype)
+        numpy_model = load_numpy_model(npz_path)
+
+    _, steps, features = keras_model.input_shape
+    x = np.random.default_rng(0).random((batch, steps, features), dtype=np.float32)
+
+    start = time.perf_counter()
+    expected = keras_model.predict(x, batch_size=batch, verbose=0)
+    keras_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = numpy_model.predict(x)
+    numpy_seconds = time.perf_counter() - start
+
+    max_diff = float(np.max(np.abs(expected - actual)))
+    assert max_diff <= tolerance, f"Selisih output ({max_diff:.2e}) melebihi toleransi {tolerance:.0e}"
+    return max_diff, keras_seconds, numpy_seconds
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    export_npz()
+    for dtype, tolerance in (('float32', 1e-4), ('float16', 5e-2)):
+        diff, keras_seconds, numpy_seconds = verify_parity(dtype=dtype, tolerance=tolerance)
+        logging.info(f"Paritas {dtype}: selisih maks {diff:.2e} | Keras {keras_seconds * 1000:.1f} ms, "
+                     f"NumPy {numpy_seconds * 1000:.1f} ms")
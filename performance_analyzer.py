@@ -1,78 +1,135 @@
 # performance_analyzer.py
 import pandas as pd
-import os
+import numpy as np
 import logging
 from datetime import datetime # <-- [PERBAIKAN] Menambahkan import yang hilang
 
-from config import (HISTORY_FILE, ACCURACY_LOOKBACK, PERFORMANCE_THRESHOLD, 
-                    CONFIDENCE_THRESHOLD, MIN_CONFIDENCE, MAX_CONFIDENCE, PREDICTION_HORIZON)
-from data_collector import get_historical_data
+from config import (ACCURACY_LOOKBACK, PERFORMANCE_THRESHOLD, 
+                    CONFIDENCE_THRESHOLD, MIN_CONFIDENCE, MAX_CONFIDENCE, PREDICTION_HORIZON,
+                    TWELVE_DATA_MAX_OUTPUTSIZE, PREDICTION_EXPIRY_DAYS)
+from data_collector import get_historical_data_many
+from bar_store import in_weekend_closure
+import history_store
+from signal_rules import percent_change, classify_trend
+
+def _target_times(pending):
+    pred_ts = pd.to_datetime(pending['timestamp']).astype('datetime64[ns]')
+    return pred_ts, pred_ts + pd.to_timedelta(pending['horizon'].astype(float), unit='h')
+
+def _expire_stale(pending, now=None):
+    """
+    Prediksi yang targetnya sudah lewat lebih dari PREDICTION_EXPIRY_DAYS hari
+    tetapi belum juga cocok dengan bar (libur pasar, data hilang) tidak akan
+    pernah bisa dievaluasi; prediksi ini ditandai kedaluwarsa di histori agar
+    tidak terus memperpanjang data harga yang diambil setiap siklus.
+    Mengembalikan prediksi yang masih menunggu.
+    """
+    if pending.empty:
+        return pending
+    now = pd.Timestamp.now() if now is None else now
+    _, target_ts = _target_times(pending)
+    stale = (target_ts < now - pd.Timedelta(days=PREDICTION_EXPIRY_DAYS)).to_numpy()
+    if stale.any():
+        history_store.expire_predictions(pending.index[stale])
+        logging.warning(f"{int(stale.sum())} prediksi tanpa harga aktual setelah {PREDICTION_EXPIRY_DAYS} hari "
+                        f"ditandai kedaluwarsa.")
+    return pending[~stale]
+
+def _evaluate_pending(pending):
+    """
+    Mengevaluasi prediksi yang belum diuji. Data harga diambil sekali per simbol
+    dengan panjang yang cukup untuk menjangkau prediksi tertua, lalu setiap
+    prediksi dicocokkan dengan bar pertama pada/sesudah waktu targetnya lewat
+    satu `merge_asof`: maks. 1 jam sesudahnya, atau bar pertama setelah pasar
+    buka jika target jatuh saat pasar tutup akhir pekan. Prediksi yang
+    horizonnya belum tiba, atau yang targetnya jatuh di celah data lain,
+    dilewati (lihat _expire_stale). Mengembalikan DataFrame (indeks sama
+    dengan `pending`) berisi actual_price, actual_trend, dan is_correct.
+    """
+    if pending.empty:
+        return pd.DataFrame()
+    pending = pending.copy()
+    pending['pred_ts'], pending['target_ts'] = _target_times(pending)
+
+    # Cukup satu request per simbol yang menjangkau prediksi tertua + horizon.
+    hours_back = (pd.Timestamp.now() - pending['pred_ts'].min()) / pd.Timedelta(hours=1)
+    outputsize = int(min(max(100, np.ceil(hours_back) + 24), TWELVE_DATA_MAX_OUTPUTSIZE))
+    real_data_by_symbol = get_historical_data_many(
+        pending['symbol'].unique(), interval="1h", outputsize=outputsize)
+
+    frames = [data[['close']].assign(symbol=symbol) for symbol, data in real_data_by_symbol.items()
+              if isinstance(data, pd.DataFrame) and not data.empty]
+    if not frames:
+        return pd.DataFrame()
+    bars = pd.concat(frames).rename_axis('bar_ts').reset_index()
+    bars['bar_ts'] = pd.to_datetime(bars['bar_ts']).astype('datetime64[ns]')
+
+    # Lewati prediksi yang horizonnya belum tiba (atau simbolnya gagal diambil).
+    last_bar_ts = bars.groupby('symbol')['bar_ts'].max()
+    pending = pending[pending['target_ts'] <= pending['symbol'].map(last_bar_ts)]
+    if pending.empty:
+        return pd.DataFrame()
+
+    merged = pd.merge_asof(
+        pending.rename_axis('index').reset_index().sort_values('target_ts'),
+        bars.sort_values('bar_ts'),
+        left_on='target_ts', right_on='bar_ts', by='symbol', direction='forward',
+        tolerance=pd.Timedelta(days=3),
+    ).set_index('index')
+    # Bar yang jauh sesudah target hanya sah jika celahnya adalah pasar tutup
+    # akhir pekan; celah lain (data hilang) tidak dicocokkan dengan bar yang salah.
+    delay = merged['bar_ts'] - merged['target_ts']
+    valid = (delay <= pd.Timedelta(hours=1)) | in_weekend_closure(merged['target_ts'])
+    merged = merged[merged['close'].notna() & valid]
+    if merged.empty:
+        return pd.DataFrame()
+
+    actual_trend = classify_trend(percent_change(merged['close'].to_numpy(), merged['current_price'].to_numpy()))
+
+    outcomes = pd.DataFrame({
+        'actual_price': merged['close'],
+        'actual_trend': actual_trend,
+    }, index=merged.index)
+    outcomes['is_correct'] = merged['predicted_trend'] == outcomes['actual_trend']
+    return outcomes.rename_axis(None)
 
 def analyze_performance():
     """
     Menganalisis histori prediksi, menghitung akurasi, dan menyesuaikan
     confidence threshold secara dinamis.
     """
-    if not os.path.exists(HISTORY_FILE):
-        logging.info("File histori tidak ditemukan. Menggunakan confidence threshold default.")
-        return CONFIDENCE_THRESHOLD
-
     try:
-        history_df = pd.read_csv(HISTORY_FILE)
-        if len(history_df) < 10: # Butuh minimal 10 data untuk analisis
+        total_predictions = history_store.count_predictions()
+        if total_predictions == 0:
+            logging.info("Histori prediksi belum ada. Menggunakan confidence threshold default.")
+            return CONFIDENCE_THRESHOLD
+        if total_predictions < 10: # Butuh minimal 10 data untuk analisis
             logging.info("Data histori tidak cukup untuk analisis. Menggunakan threshold default.")
             return CONFIDENCE_THRESHOLD
 
-        # Ambil N prediksi terakhir yang belum dievaluasi
-        untested_preds = history_df[history_df['actual_trend'].isna()].tail(ACCURACY_LOOKBACK)
+        # Ambil N prediksi terakhir yang belum dievaluasi (lewat indeks, tanpa membaca seluruh histori)
+        untested_preds = _expire_stale(history_store.get_pending(ACCURACY_LOOKBACK))
         if untested_preds.empty:
             logging.info("Tidak ada prediksi baru untuk dievaluasi.")
             # Ambil threshold terakhir yang digunakan jika ada
-            if 'adjusted_threshold' in history_df.columns:
-                 last_threshold = history_df.dropna(subset=['adjusted_threshold'])['adjusted_threshold'].iloc[-1]
-                 if last_threshold:
-                     return last_threshold
+            last_threshold = history_store.get_last_threshold()
+            if last_threshold:
+                return last_threshold
             return CONFIDENCE_THRESHOLD
 
-        # Evaluasi prediksi
-        for index, row in untested_preds.iterrows():
-            try:
-                # Ambil data harga riil setelah prediksi dibuat
-                real_data = get_historical_data(row['symbol'], interval="1h", outputsize=100) # Cukup ambil 100 bar terakhir
-                
-                if real_data.empty:
-                    continue
-
-                pred_timestamp = pd.to_datetime(row['timestamp'])
-                target_timestamp = pred_timestamp + pd.Timedelta(hours=row['horizon'])
-                
-                # Cari baris data yang paling dekat dengan target waktu kita
-                time_diffs = (real_data.index - target_timestamp).total_seconds().abs()
-                closest_index = time_diffs.idxmin()
-                real_price_at_horizon = real_data.loc[closest_index]['close']
-
-                price_change = real_price_at_horizon - row['current_price']
-                percent_change = (price_change / row['current_price']) * 100
-                
-                actual_trend = "Netral"
-                if percent_change > 0.1: actual_trend = "Naik"
-                elif percent_change < -0.1: actual_trend = "Turun"
-
-                # Update histori
-                history_df.loc[index, 'actual_price'] = real_price_at_horizon
-                history_df.loc[index, 'actual_trend'] = actual_trend
-                history_df.loc[index, 'is_correct'] = (row['predicted_trend'] == actual_trend)
-            
-            except Exception as e:
-                logging.warning(f"Gagal mengevaluasi prediksi lama untuk {row['symbol']}: {e}")
-                continue
+        # Evaluasi prediksi secara vektorisasi, lalu simpan hasilnya in-place
+        outcomes = _evaluate_pending(untested_preds)
+        if not outcomes.empty:
+            history_store.update_outcomes(outcomes)
+            logging.info(f"{len(outcomes)} prediksi lama berhasil dievaluasi.")
         
         # Hitung akurasi dari N prediksi terakhir yang sudah dievaluasi
-        evaluated_preds = history_df.dropna(subset=['is_correct']).tail(ACCURACY_LOOKBACK)
+        evaluated_preds = history_store.get_evaluated(limit=ACCURACY_LOOKBACK)
         new_threshold = CONFIDENCE_THRESHOLD # Default
+        accuracy = None
 
         if len(evaluated_preds) > 10:
-            accuracy = evaluated_preds['is_correct'].mean()
+            accuracy = float(evaluated_preds['is_correct'].mean())
             logging.info(f"Akurasi historis ({len(evaluated_preds)} data terakhir): {accuracy:.2%}")
             
             if accuracy < PERFORMANCE_THRESHOLD:
@@ -82,8 +139,7 @@ def analyze_performance():
                 new_threshold = max(MIN_CONFIDENCE, CONFIDENCE_THRESHOLD - 2)
                 logging.info(f"Akurasi baik. Menyesuaikan confidence threshold ke {new_threshold}%")
         
-        history_df['adjusted_threshold'] = new_threshold
-        history_df.to_csv(HISTORY_FILE, index=False)
+        history_store.record_threshold(new_threshold, accuracy, len(evaluated_preds))
         return new_threshold
 
     except Exception as e:
@@ -91,8 +147,8 @@ def analyze_performance():
     
     return CONFIDENCE_THRESHOLD
 
-def update_history(predictions):
-    """Menyimpan prediksi baru ke file CSV."""
+def update_history(predictions, threshold=None):
+    """Menyimpan prediksi baru ke histori (append-only, hanya baris baru yang ditulis)."""
     if not predictions:
         return
 
@@ -109,15 +165,9 @@ def update_history(predictions):
             'actual_price': None,
             'actual_trend': None,
             'is_correct': None,
-            'adjusted_threshold': None, # Kolom baru untuk menyimpan threshold saat itu
+            'adjusted_threshold': threshold, # Threshold yang berlaku saat prediksi dibuat
         })
     
-    new_df = pd.DataFrame(new_records)
-    
-    if os.path.exists(HISTORY_FILE):
-        new_df.to_csv(HISTORY_FILE, mode='a', header=False, index=False)
-    else:
-        new_df.to_csv(HISTORY_FILE, index=False)
+    history_store.insert_predictions(new_records)
     
     logging.info(f"Histori prediksi berhasil diperbarui dengan {len(new_records)} data baru.")
-
@@ -2,12 +2,15 @@
 import logging
 import pandas as pd
 import numpy as np
-from tensorflow.keras.models import load_model
-import joblib
-from config import (MODEL_PATH, SCALER_X_PATH, SCALER_Y_PATH, 
-                    SEQUENCE_LENGTH, PREDICTION_HORIZON, FEATURES, FRIENDLY_NAMES)
-from data_collector import get_historical_data, get_sentiment_data
+from config import (SYMBOLS, SEQUENCE_LENGTH, FRIENDLY_NAMES,
+                    PREDICTION_CACHE_ENABLED, PREDICTION_CACHE_TTL)
+from data_collector import get_historical_data_many, get_sentiment_data
 from feature_engine import create_lstm_features
+from cross_asset import compute_cross_asset, is_requested as cross_asset_requested
+from model_registry import get_model, get_normalizer, get_model_hash, get_normalizer_hash
+from data_cache import get_cached, set_cached
+from instrumentation import stage
+from signal_rules import percent_change, classify_trend, compute_confidence
 
 def generate_reasoning(latest_data, trend):
     """
@@ -49,72 +52,38 @@ def generate_reasoning(latest_data, trend):
         
     return "Didukung oleh " + ", ".join(reasons) + "."
 
-def get_prediction(symbol):
+def _prepare_input(symbol, historical_data, sentiment_data, normalizer, cross_asset=None):
     """
-    Menghasilkan prediksi tren untuk satu simbol, kini dilengkapi dengan alasan.
+    Membuat fitur LSTM untuk satu simbol dan mengembalikan pasangan
+    (featured_data, X_scaled) berukuran SEQUENCE_LENGTH x jumlah fitur normalizer, atau None.
     """
-    logging.info(f"Memproses prediksi untuk {symbol}...")
-
-    try:
-        model = load_model(MODEL_PATH)
-        scaler_x = joblib.load(SCALER_X_PATH)
-        scaler_y = joblib.load(SCALER_Y_PATH)
-    except Exception as e:
-        logging.error(f"Gagal memuat model atau scaler: {e}")
-        return None
-
-    try:
-        historical_data = get_historical_data(symbol, interval="1h", outputsize=500)
-        if not isinstance(historical_data, pd.DataFrame) or historical_data.empty:
-            logging.warning(f"Data historis untuk {symbol} tidak valid. Skip prediksi.")
-            return None
-
-        sentiment_data = get_sentiment_data()
-        if not isinstance(sentiment_data, pd.DataFrame):
-            sentiment_data = pd.DataFrame()
-
-    except Exception as e:
-        logging.error(f"Gagal mengambil data untuk {symbol}: {e}")
-        return None
-
     # Buat fitur LSTM
-    featured_data = create_lstm_features(historical_data, sentiment_data)
-    
-    # Ambil baris data terakhir untuk dianalisis alasannya
-    latest_data_for_reasoning = featured_data.iloc[-1]
-    
+    with stage('features', symbol=symbol, rows=len(historical_data)):
+        featured_data = create_lstm_features(historical_data, sentiment_data, symbol=symbol, cross_asset=cross_asset)
+
     last_sequence_data = featured_data.tail(SEQUENCE_LENGTH).copy()
 
     if len(last_sequence_data) < SEQUENCE_LENGTH:
         logging.warning(f"Tidak cukup data setelah pembuatan fitur untuk {symbol}.")
         return None
 
-    # Scaling input
-    available_features = [f for f in FEATURES if f in last_sequence_data.columns]
-    X_input = last_sequence_data[available_features]
-    X_scaled = scaler_x.transform(X_input)
-    X_seq = np.array([X_scaled])
+    # Scaling input dengan normalisasi yang sama seperti saat training
+    with stage('scaling', symbol=symbol, rows=len(last_sequence_data)):
+        X_scaled = normalizer.transform_features(symbol, last_sequence_data)
+    return featured_data, X_scaled
 
-    # Prediksi
-    predicted_scaled_price = model.predict(X_seq, verbose=0)[0][0]
-    predicted_price = scaler_y.inverse_transform([[predicted_scaled_price]])[0][0]
+def _build_result(symbol, featured_data, predicted_price):
+    """Menerjemahkan harga prediksi menjadi tren, confidence, dan alasan."""
+    # Ambil baris data terakhir untuk dianalisis alasannya
+    latest_data_for_reasoning = featured_data.iloc[-1]
 
     # Interpretasi hasil
     current_price = featured_data['close'].iloc[-1]
-    price_change = predicted_price - current_price
-    percent_change = (price_change / current_price) * 100
-
-    trend = "Netral"
-    if percent_change > 0.1:
-        trend = "Naik"
-    elif percent_change < -0.1:
-        trend = "Turun"
+    change = percent_change(predicted_price, current_price)
+    trend = classify_trend(change)
 
     atr = featured_data['atr_14'].iloc[-1]
-    if atr > 0:
-        confidence = min(99.0, 50 + (abs(percent_change) / (atr / current_price * 100)) * 25)
-    else:
-        confidence = 50.0
+    confidence = compute_confidence(change, atr, current_price)
 
     # Panggil fungsi untuk menghasilkan alasan
     reason = generate_reasoning(latest_data_for_reasoning, trend)
@@ -133,3 +102,149 @@ def get_prediction(symbol):
     logging.info(f"Prediksi untuk {symbol}: Tren {trend} dengan confidence {result['confidence']}%")
     return result
 
+def _sentiment_id(sentiment_data):
+    """Sidik jari isi data sentimen untuk key cache prediksi."""
+    if sentiment_data is None or sentiment_data.empty or 'value' not in sentiment_data.columns:
+        return None
+    return int(pd.util.hash_pandas_object(sentiment_data['value']).sum())
+
+def _cross_asset_id(features):
+    """Sidik jari baris terakhir fitur lintas aset simbol; berubah mengikuti bar simbol lain."""
+    if features is None or features.empty:
+        return None
+    return int(pd.util.hash_pandas_object(features.iloc[-1:]).sum())
+
+def _cache_key(symbol, historical_data, model_hash, normalizer_hash, sentiment_id, cross_asset_id=None):
+    """
+    Key cache prediksi, atau None jika cache nonaktif. Bar terakhir dari API
+    bisa masih berjalan (belum tutup), sehingga close-nya ikut dalam key:
+    hasil hanya dipakai ulang selama input bar tidak berubah sama sekali.
+    Hash model, hash normalizer, isi sentimen, dan fitur lintas aset terakhir
+    ikut agar perubahan salah satunya tidak mengembalikan hasil lama.
+    """
+    if not PREDICTION_CACHE_ENABLED or model_hash is None or normalizer_hash is None:
+        return None
+    last_bar = historical_data.iloc[-1]
+    return ('prediction', symbol, pd.Timestamp(historical_data.index[-1]).isoformat(), float(last_bar['close']),
+            model_hash, normalizer_hash, sentiment_id, cross_asset_id)
+
+def _fetch_sentiment():
+    """Data sentimen sama untuk semua simbol, cukup diambil sekali per siklus."""
+    try:
+        with stage('sentiment_fetch'):
+            sentiment_data = get_sentiment_data()
+    except Exception as e:
+        logging.error(f"Gagal mengambil data sentimen: {e}")
+        sentiment_data = None
+    if not isinstance(sentiment_data, pd.DataFrame):
+        sentiment_data = pd.DataFrame()
+    return sentiment_data
+
+def get_predictions(symbols):
+    """
+    Menghasilkan prediksi untuk banyak simbol sekaligus. Sekuens input setiap
+    simbol ditumpuk menjadi satu tensor sehingga model hanya dipanggil sekali
+    per siklus. Simbol yang gagal diproses dilewati tanpa menggagalkan simbol lain.
+    Simbol yang bar terakhirnya (termasuk close) sama dengan run sebelumnya,
+    dengan model, normalizer, sentimen, dan fitur lintas aset yang sama,
+    langsung memakai hasil dari cache tanpa feature engineering maupun inferensi.
+    Mengembalikan list dict dengan urutan yang sama seperti `symbols`.
+    """
+    model_hash = get_model_hash()
+    normalizer_hash = get_normalizer_hash()
+
+    # Fitur lintas aset dihitung dari seluruh SYMBOLS seperti saat training,
+    # juga ketika hanya sebagian simbol yang diprediksi.
+    use_cross_asset = cross_asset_requested()
+    universe = list(dict.fromkeys(list(symbols) + (list(SYMBOLS) if use_cross_asset else [])))
+
+    # Data harga semua simbol diambil paralel.
+    with stage('ohlcv_fetch') as record:
+        all_historical_data = get_historical_data_many(universe, interval="1h", outputsize=500)
+        record['rows'] = sum(len(df) for df in all_historical_data.values() if isinstance(df, pd.DataFrame))
+
+    sentiment_data = _fetch_sentiment()
+    sentiment_id = _sentiment_id(sentiment_data)
+
+    # Sekali per siklus, sebelum cache dicek: nilainya ikut menentukan key cache.
+    cross_asset = {}
+    if use_cross_asset:
+        with stage('cross_asset', rows=record['rows']):
+            cross_asset = compute_cross_asset(all_historical_data)
+
+    results_by_symbol = {}
+    pending = []
+    for symbol in symbols:
+        historical_data = all_historical_data.get(symbol)
+        if not isinstance(historical_data, pd.DataFrame) or historical_data.empty:
+            logging.warning(f"Data historis untuk {symbol} tidak valid. Skip prediksi.")
+            continue
+        if use_cross_asset and symbol not in cross_asset:
+            # Tanpa kolom ini lebar input tidak lagi sesuai dengan model.
+            logging.error(f"Fitur lintas aset untuk {symbol} tidak tersedia (butuh data minimal dua simbol). "
+                          f"Skip prediksi.")
+            continue
+        cache_key = _cache_key(symbol, historical_data, model_hash, normalizer_hash, sentiment_id,
+                               _cross_asset_id(cross_asset.get(symbol)))
+        cached = get_cached(cache_key, PREDICTION_CACHE_TTL, count=True) if cache_key else None
+        if cached is not None:
+            logging.info(f"Prediksi untuk {symbol} diambil dari cache (data input tidak berubah).")
+            results_by_symbol[symbol] = cached
+        else:
+            pending.append((symbol, historical_data, cache_key))
+
+    if pending:
+        for symbol, result in _predict_symbols(pending, sentiment_data, cross_asset):
+            results_by_symbol[symbol] = result
+
+    return [results_by_symbol[symbol] for symbol in symbols if symbol in results_by_symbol]
+
+def _predict_symbols(pending, sentiment_data, cross_asset=None):
+    """Menjalankan feature engineering dan satu batch inferensi untuk (simbol, data, cache_key)."""
+    cross_asset = cross_asset or {}
+    try:
+        with stage('model_load'):
+            model = get_model()
+            normalizer = get_normalizer()
+    except Exception as e:
+        logging.error(f"Gagal memuat model atau scaler: {e}")
+        return []
+
+    prepared = []
+    for symbol, historical_data, cache_key in pending:
+        logging.info(f"Memproses prediksi untuk {symbol}...")
+        try:
+            prepared_input = _prepare_input(symbol, historical_data, sentiment_data, normalizer,
+                                            cross_asset.get(symbol))
+            if prepared_input is not None:
+                prepared.append((symbol, cache_key) + prepared_input)
+        except Exception as e:
+            logging.error(f"Gagal menyiapkan data untuk {symbol}: {e}", exc_info=True)
+
+    if not prepared:
+        return []
+
+    # Prediksi: satu forward pass untuk seluruh simbol
+    X_batch = np.stack([X_scaled for _, _, _, X_scaled in prepared])
+    with stage('predict', rows=len(X_batch)):
+        predicted_scaled = np.asarray(model.predict(X_batch, batch_size=len(X_batch), verbose=0)).reshape(-1)
+
+    results = []
+    for (symbol, cache_key, featured_data, _), y_scaled in zip(prepared, predicted_scaled):
+        try:
+            predicted_price = normalizer.inverse_target(symbol, y_scaled, featured_data['close'].iloc[-1])[0]
+            result = _build_result(symbol, featured_data, predicted_price)
+        except Exception as e:
+            logging.error(f"Gagal menginterpretasi prediksi untuk {symbol}: {e}", exc_info=True)
+            continue
+        if cache_key is not None:
+            set_cached(cache_key, result)
+        results.append((symbol, result))
+    return results
+
+def get_prediction(symbol):
+    """
+    Menghasilkan prediksi tren untuk satu simbol, kini dilengkapi dengan alasan.
+    """
+    results = get_predictions([symbol])
+    return results[0] if results else None
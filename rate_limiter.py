@@ -0,0 +1,202 @@
+# rate_limiter.py
+import time
+import random
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+
+from config import TWELVE_DATA_CREDITS_PER_MINUTE, FETCH_BACKOFF_BASE, FETCH_BACKOFF_MAX
+from instrumentation import record_rate_limit
+
+
+class RateLimitedError(Exception):
+    """API menolak request karena kredit habis (HTTP 429 atau JSON code 429)."""
+
+    def __init__(self, retry_after, message=None):
+        super().__init__(message or f"Rate limit API; coba lagi dalam {retry_after:.1f} detik.")
+        self.retry_after = retry_after
+
+
+class CreditRateLimiter:
+    """
+    Token bucket kredit API yang dipakai bersama oleh semua thread. Kapasitas
+    bucket sama dengan kredit per menit dan terisi ulang merata sepanjang menit.
+    Request yang menunggu dilayani berurutan (FIFO), sehingga satu request
+    besar tidak terus-menerus disalip request kecil. Respons 429 mengosongkan
+    bucket dan menahan semua request sampai waktu Retry-After lewat.
+    """
+
+    def __init__(self, credits_per_minute=TWELVE_DATA_CREDITS_PER_MINUTE, clock=time.monotonic):
+        self.capacity = float(credits_per_minute)
+        self.rate = self.capacity / 60.0
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._blocked_until = 0.0
+        self._next_ticket = 0
+        self._serving = 0
+        self._abandoned = set()
+        self._waiting = 0
+        self._stats = {
+            'acquired': 0, 'credits': 0.0, 'throttled': 0, 'throttle_seconds_total': 0.0,
+            'queue_depth_max': 0, 'rate_limited': 0, 'blocked_seconds_total': 0.0,
+        }
+
+    @property
+    def enabled(self):
+        return self.capacity > 0
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _advance(self):
+        self._serving += 1
+        while self._serving in self._abandoned:
+            self._abandoned.discard(self._serving)
+            self._serving += 1
+
+    def acquire(self, credits=1):
+        """Menunggu sampai `credits` kredit tersedia; mengembalikan lama menunggu (detik)."""
+        if not self.enabled:
+            return 0.0
+        credits = min(float(credits), self.capacity)
+        start = self._clock()
+        with self._cond:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            self._waiting += 1
+            self._stats['queue_depth_max'] = max(self._stats['queue_depth_max'], self._waiting)
+            acquired = False
+            try:
+                while True:
+                    now = self._clock()
+                    self._refill(now)
+                    if ticket != self._serving:
+                        self._cond.wait()
+                        continue
+                    wait = max(self._blocked_until - now, (credits - self._tokens) / self.rate)
+                    if wait <= 0:
+                        break
+                    self._cond.wait(wait)
+                self._tokens -= credits
+                self._advance()
+                acquired = True
+            finally:
+                self._waiting -= 1
+                if not acquired:
+                    if ticket == self._serving:
+                        self._advance()
+                    else:
+                        self._abandoned.add(ticket)
+                queue_depth = self._waiting
+                self._cond.notify_all()
+
+            waited = self._clock() - start
+            self._stats['acquired'] += 1
+            self._stats['credits'] += credits
+            if waited > 0.001:
+                self._stats['throttled'] += 1
+                self._stats['throttle_seconds_total'] += waited
+        record_rate_limit(wait_seconds=waited, queue_depth=queue_depth)
+        return waited
+
+    def block_for(self, seconds):
+        """Umpan balik respons 429: kosongkan bucket dan tahan semua request selama `seconds`."""
+        with self._cond:
+            now = self._clock()
+            self._refill(now)
+            self._tokens = 0.0
+            until = now + max(0.0, seconds)
+            self._stats['blocked_seconds_total'] += max(0.0, until - max(self._blocked_until, now))
+            self._blocked_until = max(self._blocked_until, until)
+            self._stats['rate_limited'] += 1
+            self._cond.notify_all()
+        record_rate_limit(rate_limited=True)
+
+    def stats(self):
+        with self._cond:
+            self._refill(self._clock())
+            return dict(self._stats, credits_per_minute=self.capacity, tokens=round(self._tokens, 3),
+                        queue_depth=self._waiting,
+                        blocked_for=round(max(0.0, self._blocked_until - self._clock()), 3))
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter():
+    """Rate limiter kredit Twelve Data bersama untuk seluruh proses."""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = CreditRateLimiter()
+        return _limiter
+
+
+def get_limiter_stats():
+    return get_limiter().stats()
+
+
+def _parse_retry_after(value):
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _seconds_to_next_minute():
+    # Kredit Twelve Data direset pada awal setiap menit.
+    return 60.0 - time.time() % 60.0
+
+
+def retry_after(response, payload=None):
+    """
+    Mengembalikan lama menunggu (detik) jika `response` adalah penolakan rate
+    limit, atau None. Twelve Data bisa mengirim HTTP 429 maupun HTTP 200 dengan
+    body {"code": 429, ...}; `response` boleh None untuk payload per simbol di
+    dalam respons batch. Tanpa header Retry-After, ditunggu sampai menit
+    berikutnya ditambah jitter kecil.
+    """
+    limited = ((response is not None and response.status_code == 429)
+               or (isinstance(payload, dict) and payload.get('code') == 429))
+    if not limited:
+        return None
+    delay = _parse_retry_after(response.headers.get('Retry-After')) if response is not None else None
+    if delay is None:
+        delay = _seconds_to_next_minute()
+    return delay + random.uniform(0.0, 1.0)
+
+
+def backoff_delay(attempt, base=FETCH_BACKOFF_BASE, cap=FETCH_BACKOFF_MAX):
+    """Jeda exponential backoff dengan jitter untuk percobaan ke-`attempt` (mulai dari 1)."""
+    delay = min(cap, base * 2 ** (attempt - 1))
+    return delay / 2 + random.uniform(0.0, delay / 2)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    # Simulasi: 4 thread meminta total 160 kredit dari bucket 120 kredit/menit
+    # (2 kredit/detik); 120 kredit pertama langsung tersedia, sisanya ~20 detik.
+    limiter = CreditRateLimiter(120)
+    start = time.monotonic()
+
+    def worker():
+        for _ in range(40):
+            limiter.acquire()
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    logging.info(f"160 kredit dalam {time.monotonic() - start:.1f} detik (ideal 20.0 detik); "
+                 f"statistik: {limiter.stats()}")
@@ -0,0 +1,148 @@
+# resample.py
+import logging
+import numpy as np
+import pandas as pd
+
+from config import MTF_TIMEFRAMES, MTF_SESSION_OFFSET_HOURS
+from indicators import INDICATOR_COLUMNS, compute_indicator_array
+from bar_store import BAR_COLUMNS, interval_to_timedelta
+import bar_store
+
+# Timeframe lebih tinggi (4h, 1day, ...) diturunkan dari bar 1h yang sudah ada,
+# bukan diunduh terpisah per interval. Bucket dijangkarkan ke jam UTC tetap
+# (00:00 + MTF_SESSION_OFFSET_HOURS), sehingga hasilnya tidak bergantung pada
+# bar pertama yang kebetulan tersedia.
+
+BASE_INTERVAL = '1h'
+# Kolom bar timeframe tinggi yang bisa dijadikan fitur MTF selain indikator.
+MTF_BAR_COLUMNS = ['open', 'high', 'low', 'close']
+_EPOCH = pd.Timestamp("1970-01-01")
+# 1970-01-01 jatuh pada hari Kamis; bar mingguan dimulai hari Senin.
+_WEEK_EPOCH = pd.Timestamp("1970-01-05")
+
+
+def can_resample(interval, base_interval=BASE_INTERVAL):
+    """True jika `interval` berdurasi tetap dan kelipatan `base_interval` (bukan '1month')."""
+    if interval == '1month':
+        return False
+    try:
+        span, base = interval_to_timedelta(interval), interval_to_timedelta(base_interval)
+    except ValueError:
+        return False
+    return span > base and span % base == pd.Timedelta(0)
+
+
+def _origin(interval, offset_hours):
+    epoch = _WEEK_EPOCH if interval == '1week' else _EPOCH
+    return epoch + pd.Timedelta(hours=offset_hours)
+
+
+def resample_bars(df, interval, offset_hours=MTF_SESSION_OFFSET_HOURS):
+    """
+    Agregasi OHLCV ke `interval`: open pertama, high maksimum, low minimum,
+    close terakhir, volume dijumlah. Indeks hasil adalah awal bucket (sama
+    seperti timestamp bar Twelve Data); bucket tanpa bar tidak dibuat. Bucket
+    terakhir bisa belum lengkap jika data berakhir di tengah bucket.
+    """
+    if df.empty:
+        return df.iloc[:0]
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index()
+    span = interval_to_timedelta(interval).value
+    origin = _origin(interval, offset_hours).value
+    timestamps = pd.DatetimeIndex(df.index).as_unit('ns').asi8
+
+    buckets = (timestamps - origin) // span
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(buckets)] - 1
+
+    out = {
+        'open': df['open'].to_numpy(dtype=np.float64)[starts],
+        'high': np.maximum.reduceat(df['high'].to_numpy(dtype=np.float64), starts),
+        'low': np.minimum.reduceat(df['low'].to_numpy(dtype=np.float64), starts),
+        'close': df['close'].to_numpy(dtype=np.float64)[ends],
+    }
+    volume = df['volume'].to_numpy(dtype=np.float64) if 'volume' in df.columns else np.zeros(len(df))
+    out['volume'] = np.add.reduceat(volume, starts)
+    index = pd.DatetimeIndex((origin + buckets[starts] * span).astype('datetime64[ns]'), name=df.index.name)
+    return pd.DataFrame(out, index=index)[BAR_COLUMNS]
+
+
+def load_resampled(symbol, interval, outputsize, offset_hours=MTF_SESSION_OFFSET_HOURS):
+    """`outputsize` bar `interval` terakhir yang diturunkan dari bar 1h di bar store."""
+    per_bucket = interval_to_timedelta(interval) // interval_to_timedelta(BASE_INTERVAL)
+    hourly = bar_store.load_bars(symbol, BASE_INTERVAL, tail=(outputsize + 1) * per_bucket)
+    return resample_bars(hourly, interval, offset_hours).iloc[-outputsize:]
+
+
+def split_mtf_feature(name):
+    """
+    ('rsi_14', '1day') untuk nama fitur MTF seperti 'rsi_14_1d' (sufiks dari
+    MTF_TIMEFRAMES), atau None jika `name` bukan fitur MTF.
+    """
+    for suffix, interval in MTF_TIMEFRAMES.items():
+        if name.endswith(f"_{suffix}"):
+            base = name[:-len(suffix) - 1]
+            if base in INDICATOR_COLUMNS or base in MTF_BAR_COLUMNS:
+                return base, interval
+    return None
+
+
+def mtf_features(df, features, offset_hours=MTF_SESSION_OFFSET_HOURS, base_interval=BASE_INTERVAL):
+    """
+    Menghitung fitur MTF yang diminta di `features` untuk setiap baris `df`
+    (bar 1h). Nilai pada satu baris berasal dari bar timeframe tinggi terakhir
+    yang sudah tutup saat bar 1h tersebut tutup, sehingga tidak ada lookahead:
+    'rsi_14_1d' pada bar 13:00 memakai RSI harian hingga penutupan kemarin.
+    Mengembalikan DataFrame berindeks sama dengan `df` (NaN jika belum ada
+    bar tinggi yang tutup atau indikatornya belum cukup data).
+    """
+    requested = {}
+    for name in features:
+        parsed = split_mtf_feature(name)
+        if parsed is not None:
+            requested.setdefault(parsed[1], []).append((name, parsed[0]))
+    out = pd.DataFrame(index=df.index)
+    if not requested or df.empty:
+        return out
+
+    # Waktu tutup setiap baris 1h (timestamp bar adalah waktu buka).
+    closes_at = pd.DatetimeIndex(df.index).as_unit('ns').asi8 + interval_to_timedelta(base_interval).value
+    for interval, columns in requested.items():
+        if not can_resample(interval, base_interval):
+            logging.warning(f"Interval {interval} tidak bisa diturunkan dari bar {base_interval}; fitur MTF dilewati.")
+            continue
+        higher = resample_bars(df, interval, offset_hours)
+        values = pd.DataFrame(compute_indicator_array(higher['high'].to_numpy(), higher['low'].to_numpy(),
+                                                      higher['close'].to_numpy()),
+                              columns=INDICATOR_COLUMNS)
+        for col in MTF_BAR_COLUMNS:
+            values[col] = higher[col].to_numpy()
+
+        higher_closes_at = higher.index.as_unit('ns').asi8 + interval_to_timedelta(interval).value
+        pos = np.searchsorted(higher_closes_at, closes_at, side='right') - 1
+        valid = pos >= 0
+        for name, base in columns:
+            column = np.full(len(df), np.nan)
+            column[valid] = values[base].to_numpy()[pos[valid]]
+            out[name] = column
+    return out
+
+
+if __name__ == "__main__":
+    # Pemeriksaan: agregasi cocok dengan pandas.resample dan fitur MTF tanpa lookahead.
+    rng = np.random.default_rng(0)
+    index = pd.date_range("2026-01-01", periods=24 * 60, freq="h")
+    close = 1.1 * np.exp(np.cumsum(rng.normal(0, 0.001, len(index))))
+    bars = pd.DataFrame({'open': np.r_[1.1, close[:-1]], 'high': close * 1.001, 'low': close * 0.999,
+                         'close': close, 'volume': 0.0}, index=index)
+    bars = bars.drop(bars.index[100:130])
+
+    ours = resample_bars(bars, '4h')
+    reference = bars.resample('4h', origin='epoch').agg(
+        {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}).dropna()
+    print("Resample 4h cocok dengan pandas:", np.allclose(ours.to_numpy(), reference.to_numpy()))
+
+    full = mtf_features(bars, ['rsi_14_1d', 'close_1d'])
+    truncated = mtf_features(bars.iloc[:700], ['rsi_14_1d', 'close_1d'])
+    print("Tanpa lookahead:", np.allclose(full.iloc[:700].to_numpy(), truncated.to_numpy(), equal_nan=True))
@@ -0,0 +1,231 @@
+# scheduler.py
+import os
+import json
+import time
+import random
+import signal
+import logging
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import (SCHEDULER_INTERVAL, SCHEDULER_BAR_CLOSE_DELAY, SCHEDULER_JITTER, SCHEDULER_RUN_ON_START,
+                    SCHEDULER_HEALTH_PORT, SCHEDULER_HEALTH_FILE, SCHEDULER_MAX_FAILURES)
+from bar_store import interval_to_timedelta
+
+
+def _iso(epoch):
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).isoformat() if epoch else None
+
+
+class PredictionScheduler:
+    """
+    Menjalankan `cycle_fn` terus-menerus, sesaat setelah setiap bar `interval`
+    tutup (dihitung dari epoch UTC), ditambah jeda SCHEDULER_BAR_CLOSE_DELAY
+    dan jitter acak agar tidak semua klien memukul API pada detik yang sama.
+
+    Jika satu siklus melewati penutupan bar berikutnya, siklus susulan langsung
+    dijalankan sekali (bar yang terlewat digabung, tidak diantrikan satu per
+    satu). SIGTERM/SIGINT menghentikan scheduler setelah siklus yang sedang
+    berjalan selesai. Status kesehatan tersedia lewat `health()`, endpoint
+    HTTP /health (jika port diatur), dan file JSON SCHEDULER_HEALTH_FILE.
+    """
+
+    def __init__(self, cycle_fn, interval=SCHEDULER_INTERVAL, delay=SCHEDULER_BAR_CLOSE_DELAY,
+                 jitter=SCHEDULER_JITTER, run_on_start=SCHEDULER_RUN_ON_START,
+                 health_port=SCHEDULER_HEALTH_PORT, health_file=SCHEDULER_HEALTH_FILE):
+        self.cycle_fn = cycle_fn
+        self.interval_seconds = interval_to_timedelta(interval).total_seconds()
+        self.delay = delay
+        self.jitter = jitter
+        self.run_on_start = run_on_start
+        self.health_port = health_port
+        self.health_file = health_file
+
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._server = None
+        self._state = {
+            'started_at': None,
+            'cycles': 0,
+            'failures': 0,
+            'consecutive_failures': 0,
+            'catch_up_cycles': 0,
+            'missed_bars': 0,
+            'running': False,
+            'next_run_at': None,
+            'last_cycle': None,
+        }
+
+    # --- Penjadwalan ---
+
+    def _bar_close(self, now):
+        """Waktu penutupan bar terakhir yang sudah lewat (epoch detik)."""
+        return (now // self.interval_seconds) * self.interval_seconds
+
+    def _sleep_until(self, target):
+        """Menunggu sampai `target`; mengembalikan False jika scheduler dihentikan."""
+        with self._lock:
+            self._state['next_run_at'] = target
+        self._write_health()
+        return not self._stop.wait(max(0.0, target - time.time()))
+
+    def run_forever(self):
+        """Loop utama daemon. Kembali setelah stop() atau sinyal SIGTERM/SIGINT."""
+        self._install_signal_handlers()
+        self._start_health_server()
+        with self._lock:
+            self._state['started_at'] = time.time()
+        logging.info(f"Scheduler aktif: interval {self.interval_seconds:.0f} detik, "
+                     f"jeda {self.delay} detik + jitter hingga {self.jitter} detik.")
+
+        last_bar = self._bar_close(time.time())
+        if self.run_on_start:
+            self.run_cycle()
+
+        try:
+            while not self._stop.is_set():
+                current_bar = self._bar_close(time.time())
+                if current_bar > last_bar:
+                    # Siklus sebelumnya melewati penutupan bar: jalankan susulan sekarang.
+                    missed = int(round((current_bar - last_bar) / self.interval_seconds)) - 1
+                    with self._lock:
+                        self._state['catch_up_cycles'] += 1
+                        self._state['missed_bars'] += missed
+                    logging.warning(f"Siklus melewati penutupan bar; menjalankan siklus susulan"
+                                    f"{f' ({missed} bar digabung)' if missed else ''}.")
+                    last_bar = current_bar
+                    self.run_cycle()
+                    continue
+
+                next_bar = last_bar + self.interval_seconds
+                target = next_bar + self.delay + random.uniform(0, self.jitter)
+                logging.info(f"Siklus berikutnya pada {_iso(target)}.")
+                if not self._sleep_until(target):
+                    break
+                last_bar = next_bar
+                self.run_cycle()
+        finally:
+            self._shutdown()
+
+    def run_cycle(self):
+        """Menjalankan satu siklus dan mencatat durasi serta hasilnya."""
+        with self._lock:
+            self._state['running'] = True
+            self._state['next_run_at'] = None
+        started = time.time()
+        ok, error, summary = True, None, None
+        try:
+            summary = self.cycle_fn()
+        except Exception as e:
+            ok, error = False, str(e)
+            logging.error(f"Siklus prediksi gagal: {e}", exc_info=True)
+        finished = time.time()
+
+        with self._lock:
+            state = self._state
+            state['running'] = False
+            state['cycles'] += 1
+            if ok:
+                state['consecutive_failures'] = 0
+            else:
+                state['failures'] += 1
+                state['consecutive_failures'] += 1
+            state['last_cycle'] = {
+                'started_at': started,
+                'finished_at': finished,
+                'duration_seconds': round(finished - started, 3),
+                'ok': ok,
+                'error': error,
+                'summary': summary if isinstance(summary, dict) else None,
+            }
+        logging.info(f"Siklus selesai dalam {finished - started:.2f} detik ({'OK' if ok else 'GAGAL'}).")
+        self._write_health()
+
+    def stop(self):
+        self._stop.set()
+
+    # --- Kesehatan ---
+
+    def health(self):
+        """Mengembalikan status kesehatan dan timing siklus terakhir sebagai dict siap-JSON."""
+        with self._lock:
+            state = json.loads(json.dumps(self._state))
+        now = time.time()
+        last = state['last_cycle']
+        stale = last is not None and now - last['finished_at'] > 2 * self.interval_seconds + self.delay + self.jitter
+        healthy = state['consecutive_failures'] < SCHEDULER_MAX_FAILURES and not stale
+        if last:
+            last['started_at'] = _iso(last['started_at'])
+            last['finished_at'] = _iso(last['finished_at'])
+        state.update(
+            status='ok' if healthy else 'unhealthy',
+            stale=stale,
+            uptime_seconds=round(now - state['started_at'], 1) if state['started_at'] else 0.0,
+            started_at=_iso(state['started_at']),
+            next_run_at=_iso(state['next_run_at']),
+            pid=os.getpid(),
+        )
+        return state
+
+    def _write_health(self):
+        if not self.health_file:
+            return
+        tmp_path = f"{self.health_file}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(self.health(), f, indent=2)
+            os.replace(tmp_path, self.health_file)
+        except Exception as e:
+            logging.warning(f"Gagal menulis file health {self.health_file}: {e}")
+
+    def _start_health_server(self):
+        if not self.health_port:
+            return
+        scheduler = self
+
+        class HealthHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip('/') not in ('', '/health'):
+                    self.send_error(404)
+                    return
+                health = scheduler.health()
+                body = json.dumps(health).encode('utf-8')
+                self.send_response(200 if health['status'] == 'ok' else 503)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer(('0.0.0.0', self.health_port), HealthHandler)
+        except OSError as e:
+            logging.warning(f"Endpoint health tidak dapat dibuka di port {self.health_port}: {e}")
+            return
+        threading.Thread(target=self._server.serve_forever, name='health-server', daemon=True).start()
+        logging.info(f"Endpoint health tersedia di http://0.0.0.0:{self.health_port}/health")
+
+    # --- Siklus hidup ---
+
+    def _install_signal_handlers(self):
+        if threading.current_thread() is not threading.main_thread():
+            return
+
+        def handle(signum, frame):
+            logging.info(f"Sinyal {signal.Signals(signum).name} diterima; berhenti setelah siklus berjalan selesai.")
+            self.stop()
+
+        signal.signal(signal.SIGTERM, handle)
+        signal.signal(signal.SIGINT, handle)
+
+    def _shutdown(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        with self._lock:
+            self._state['next_run_at'] = None
+        self._write_health()
+        logging.info("Scheduler berhenti.")
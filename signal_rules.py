@@ -0,0 +1,62 @@
+# signal_rules.py
+import numpy as np
+
+from config import TREND_THRESHOLD_PERCENT, SL_ATR_MULTIPLIER, TP_ATR_MULTIPLIER
+
+# Aturan interpretasi prediksi yang dipakai bersama oleh predictor, notifier,
+# performance_analyzer, dan backtest. Semua fungsi menerima skalar maupun
+# array NumPy; input skalar menghasilkan skalar Python.
+
+
+def _unwrap(value):
+    value = np.asarray(value)
+    return value.item() if value.ndim == 0 else value
+
+
+def percent_change(predicted_price, current_price):
+    predicted_price = np.asarray(predicted_price, dtype=np.float64)
+    current_price = np.asarray(current_price, dtype=np.float64)
+    return _unwrap((predicted_price - current_price) / current_price * 100)
+
+
+def classify_trend(change_percent):
+    """'Naik' / 'Turun' jika perubahan melewati TREND_THRESHOLD_PERCENT, selain itu 'Netral'."""
+    change_percent = np.asarray(change_percent, dtype=np.float64)
+    trend = np.select([change_percent > TREND_THRESHOLD_PERCENT, change_percent < -TREND_THRESHOLD_PERCENT],
+                      ["Naik", "Turun"], default="Netral")
+    return _unwrap(trend)
+
+
+def compute_confidence(change_percent, atr, current_price):
+    """
+    Confidence 50-99: besar perubahan yang diprediksi relatif terhadap ATR
+    (dalam persen harga). Tanpa ATR positif, confidence bernilai 50.
+    """
+    change_percent = np.asarray(change_percent, dtype=np.float64)
+    atr = np.asarray(atr, dtype=np.float64)
+    current_price = np.asarray(current_price, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scaled = 50 + (np.abs(change_percent) / (atr / current_price * 100)) * 25
+    return _unwrap(np.where(atr > 0, np.minimum(99.0, scaled), 50.0))
+
+
+def stop_levels(trend, current_price, atr):
+    """
+    (stop loss, take profit) berbasis ATR: SL_ATR_MULTIPLIER x ATR melawan arah
+    tren dan TP_ATR_MULTIPLIER x ATR searah tren. Tren 'Netral' menghasilkan NaN.
+    """
+    trend = np.asarray(trend)
+    current_price = np.asarray(current_price, dtype=np.float64)
+    atr = np.asarray(atr, dtype=np.float64)
+    direction = np.select([trend == "Naik", trend == "Turun"], [1.0, -1.0], default=np.nan)
+    stop_loss = current_price - direction * SL_ATR_MULTIPLIER * atr
+    take_profit = current_price + direction * TP_ATR_MULTIPLIER * atr
+    return _unwrap(stop_loss), _unwrap(take_profit)
+
+
+def risk_reward(current_price, stop_loss, take_profit):
+    """Rasio reward/risk (NaN jika risiko nol atau level tidak ada)."""
+    risk = np.abs(np.asarray(current_price, dtype=np.float64) - stop_loss)
+    reward = np.abs(np.asarray(take_profit, dtype=np.float64) - current_price)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return _unwrap(np.where(risk > 0, reward / risk, np.nan))
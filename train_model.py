@@ -1,8 +1,9 @@
 # train_model.py
 import os
+import time
 import logging
-import pandas as pd
-from sklearn.preprocessing import MinMaxScaler
+import numpy as np
+import tensorflow as tf
 # --- [PERBAIKAN SARAN ANDA] ---
 # Impor 'Input' untuk menghilangkan UserWarning
 from tensorflow.keras.models import Sequential
@@ -12,9 +13,15 @@ import joblib
 # --- AKHIR PERBAIKAN ---
 
 from config import (SYMBOLS, MODEL_PATH, SCALER_X_PATH, SCALER_Y_PATH, LOGS_DIR, 
-                    SEQUENCE_LENGTH, PREDICTION_HORIZON, FEATURES)
-from data_collector import get_historical_data, get_sentiment_data
-from feature_engine import create_lstm_features, prepare_sequences
+                    SEQUENCE_LENGTH, PREDICTION_HORIZON, NORMALIZATION_MODE, NORMALIZER_PATH,
+                    MODEL_BUNDLE_PATH, TRAIN_USE_BACKFILL)
+from data_collector import get_historical_data_many, get_sentiment_data
+from backfill import with_archive
+from cross_asset import compute_cross_asset, is_requested as cross_asset_requested
+from feature_engine import create_lstm_features
+from dataset_builder import FeatureNormalizer, SequenceDataset, SHARED_KEY
+from numpy_lstm import export_npz
+from model_bundle import write_bundle, load_bundle
 
 # Konfigurasi logging... (tetap sama)
 os.makedirs(LOGS_DIR, exist_ok=True)
@@ -27,6 +34,24 @@ logging.basicConfig(
     ]
 )
 
+def make_sequence_dataset(dataset, split, batch_size=32, shuffle=True, seed=None):
+    """
+    Membungkus SequenceDataset.iter_batches menjadi tf.data.Dataset yang membaca
+    batch langsung dari view sekuens per simbol (tanpa menyalin seluruh X_seq),
+    dengan urutan diacak ulang setiap epoch dan prefetch di latar belakang.
+    """
+    rng = np.random.default_rng(seed)
+    signature = (
+        tf.TensorSpec(shape=(None,) + dataset.feature_shape, dtype=tf.float32),
+        tf.TensorSpec(shape=(None, 1), dtype=tf.float32),
+    )
+    tf_dataset = tf.data.Dataset.from_generator(
+        lambda: dataset.iter_batches(split, batch_size, shuffle=shuffle, rng=rng),
+        output_signature=signature,
+    )
+    tf_dataset = tf_dataset.apply(tf.data.experimental.assert_cardinality(dataset.n_batches(split, batch_size)))
+    return tf_dataset.prefetch(tf.data.AUTOTUNE)
+
 def train_lstm_model():
     logging.info("Memulai proses training model LSTM...")
     os.makedirs(os.path.dirname(MODEL_PATH), exist_ok=True)
@@ -37,51 +62,44 @@ def train_lstm_model():
     except Exception:
         sentiment_data = None
 
-    all_features = []
+    all_data = get_historical_data_many(SYMBOLS)
+    if TRAIN_USE_BACKFILL:
+        # Arsip backfill.py (jika ada) memperpanjang data training jauh melewati 500 bar terakhir.
+        all_data = {symbol: with_archive(symbol, all_data[symbol]) for symbol in SYMBOLS}
+    cross_asset = compute_cross_asset(all_data) if cross_asset_requested() else {}
+
+    frames = {}
     for symbol in SYMBOLS:
         logging.info(f"Memproses {symbol}...")
-        data = get_historical_data(symbol)
+        data = all_data[symbol]
         if data.empty or len(data) < PREDICTION_HORIZON + SEQUENCE_LENGTH:
             logging.warning(f"Data untuk {symbol} tidak cukup. Dilewati.")
             continue
         
-        featured = create_lstm_features(data, sentiment_data)
+        featured = create_lstm_features(data, sentiment_data, cross_asset=cross_asset.get(symbol))
         featured.dropna(subset=['future_price'], inplace=True)
         if not featured.empty:
-            all_features.append(featured)
+            frames[symbol] = featured
 
-    if not all_features:
+    if not frames:
         logging.error("Tidak ada data valid untuk dilatih. Proses dihentikan.")
         return
 
-    df_all = pd.concat(all_features, ignore_index=True)
-    
-    # --- [PERBAIKAN SARAN ANDA] ---
-    # Menggunakan bfill().ffill() untuk membersihkan sisa NaN
-    df_all.bfill(inplace=True)
-    df_all.ffill(inplace=True)
-    # --- AKHIR PERBAIKAN ---
-
-    available_features = [f for f in FEATURES if f in df_all.columns]
-    X_data = df_all[available_features]
-    y_data = df_all[['future_price']]
-
-    scaler_x = MinMaxScaler()
-    X_scaled = scaler_x.fit_transform(X_data)
-    
-    scaler_y = MinMaxScaler()
-    y_scaled = scaler_y.fit_transform(y_data)
-
-    X_seq, y_seq = prepare_sequences(X_scaled, y_scaled, SEQUENCE_LENGTH)
+    # Normalisasi dan windowing dilakukan per simbol: tidak ada sekuens yang
+    # melintasi dua instrumen, dan harga beda skala tidak berbagi satu scaler.
+    normalizer = FeatureNormalizer(NORMALIZATION_MODE).fit(frames)
+    dataset = SequenceDataset(frames, normalizer, SEQUENCE_LENGTH, val_fraction=0.1)
 
-    if len(X_seq) == 0:
+    if dataset.n_windows('train') == 0:
         logging.error("Data tidak cukup untuk membuat sekuens LSTM.")
         return
+    logging.info(f"Dataset: {dataset.n_windows('train')} jendela training, {dataset.n_windows('val')} validasi "
+                 f"dari {len(dataset.symbols)} simbol (normalisasi {NORMALIZATION_MODE}).")
 
     # --- [PERBAIKAN SARAN ANDA] ---
     # Menggunakan Input layer untuk menghilangkan UserWarning
     model = Sequential([
-        Input(shape=(X_seq.shape[1], X_seq.shape[2])),
+        Input(shape=dataset.feature_shape),
         LSTM(100, return_sequences=True),
         Dropout(0.2),
         LSTM(50, return_sequences=False),
@@ -97,12 +115,42 @@ def train_lstm_model():
     early_stopping = EarlyStopping(monitor='val_loss', patience=10, restore_best_weights=True)
     model_checkpoint = ModelCheckpoint(MODEL_PATH, save_best_only=True, monitor='val_loss')
     
-    model.fit(X_seq, y_seq, epochs=50, batch_size=32, validation_split=0.1, callbacks=[early_stopping, model_checkpoint], verbose=1)
+    train_ds = make_sequence_dataset(dataset, 'train', batch_size=32, shuffle=True)
+    val_ds = make_sequence_dataset(dataset, 'val', batch_size=32, shuffle=False)
 
-    joblib.dump(scaler_x, SCALER_X_PATH)
-    joblib.dump(scaler_y, SCALER_Y_PATH)
+    model.fit(train_ds, epochs=50, validation_data=val_ds, shuffle=False, callbacks=[early_stopping, model_checkpoint], verbose=1)
+
+    normalizer.save(NORMALIZER_PATH)
+    if NORMALIZATION_MODE == 'global':
+        # Tetap tulis scaler format lama untuk deployment yang belum membaca normalizer.
+        scaler_x, scaler_y = normalizer.scalers[SHARED_KEY]
+        joblib.dump(scaler_x, SCALER_X_PATH)
+        joblib.dump(scaler_y, SCALER_Y_PATH)
     logging.info(f"Training selesai. Model disimpan di {MODEL_PATH} dan scaler telah disimpan.")
 
+    # Ekspor bobot untuk backend inferensi NumPy (tanpa TensorFlow).
+    try:
+        export_npz()
+    except Exception as e:
+        logging.error(f"Gagal mengekspor model NumPy: {e}")
+
+    # Bundle tunggal (bobot + scaler + skema) yang dimuat predictor.
+    try:
+        header = write_bundle(normalizer)
+        start = time.perf_counter()
+        load_bundle(MODEL_BUNDLE_PATH, verify=True)
+        load_ms = (time.perf_counter() - start) * 1000
+        logging.info(f"Bundle {MODEL_BUNDLE_PATH}: {os.path.getsize(MODEL_BUNDLE_PATH) / 1024:.1f} KiB, "
+                     f"waktu muat {load_ms:.1f} ms, hash {header['content_sha256'][:12]}.")
+    except Exception as e:
+        # Bundle lama berisi bobot dan normalizer model sebelumnya; backend "auto"
+        # akan terus memakainya selama file ada, jadi hapus agar predictor beralih
+        # ke model Keras/NumPy yang baru saja dilatih.
+        logging.error(f"Gagal menulis bundle model: {e}")
+        if os.path.exists(MODEL_BUNDLE_PATH):
+            os.remove(MODEL_BUNDLE_PATH)
+            logging.warning(f"Bundle lama {MODEL_BUNDLE_PATH} dihapus karena tidak lagi sesuai dengan model baru.")
+
 if __name__ == "__main__":
     train_lstm_model()
 
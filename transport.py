@@ -0,0 +1,171 @@
+# transport.py
+import os
+import glob
+import gzip
+import json
+import time
+import hashlib
+import logging
+from urllib.parse import urlsplit, parse_qsl
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from config import TRANSPORT_MODE, TRANSPORT_RECORD_DIR
+
+TRANSPORT_MODES = ('live', 'record', 'replay')
+# Env ini menimpa config.TRANSPORT_MODE, mis. `D1T_TRANSPORT_MODE=replay python train_model.py`.
+MODE_ENV = 'D1T_TRANSPORT_MODE'
+
+# Parameter rahasia tidak pernah ikut disimpan maupun menjadi bagian key.
+_SECRET_PARAMS = {'apikey', 'api_key', 'token'}
+# Parameter yang bergantung pada waktu/isi bar store saat run; diabaikan saat
+# mencari rekaman cadangan di mode replay (hanya untuk request tanpa end_date).
+_VOLATILE_PARAMS = {'start_date', 'end_date'}
+_STORED_HEADERS = {'content-type', 'retry-after', 'api-credits-used', 'api-credits-left'}
+
+
+class ReplayMissError(requests.ConnectionError):
+    """Tidak ada rekaman untuk request ini di mode replay."""
+
+
+class RecordedResponse:
+    """Respons HTTP yang dibaca dari rekaman; antarmukanya cukup untuk data_collector."""
+
+    def __init__(self, url, status_code, headers, text):
+        self.url = url
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.text = text
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    def json(self):
+        return json.loads(self.text)
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise requests.HTTPError(f"{self.status_code} Error (rekaman) untuk url: {self.url}", response=self)
+
+
+def get_mode():
+    mode = (os.environ.get(MODE_ENV) or TRANSPORT_MODE).strip().lower()
+    if mode not in TRANSPORT_MODES:
+        raise ValueError(f"Mode transport tidak dikenal: {mode}. Pilih salah satu dari {TRANSPORT_MODES}.")
+    return mode
+
+
+def is_replay():
+    return get_mode() == 'replay'
+
+
+def _request_params(url, params):
+    """
+    (path endpoint, gabungan query string di URL dan `params`) tanpa parameter
+    rahasia. Host tidak ikut, sehingga rekaman juga bisa diputar ulang untuk
+    base URL lain (mis. server pengganti API di benchmark).
+    """
+    parts = urlsplit(url)
+    merged = dict(parse_qsl(parts.query))
+    merged.update({k: str(v) for k, v in (params or {}).items() if v is not None})
+    return parts.path, {k: merged[k] for k in sorted(merged) if k.lower() not in _SECRET_PARAMS}
+
+
+def _digest(endpoint, params):
+    return hashlib.sha1(json.dumps([endpoint, params], sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def request_keys(url, params=None):
+    """(key dasar tanpa parameter waktu, key lengkap) untuk satu request."""
+    endpoint, clean = _request_params(url, params)
+    base = {k: v for k, v in clean.items() if k not in _VOLATILE_PARAMS}
+    return _digest(endpoint, base), _digest(endpoint, clean)
+
+
+def _record_path(base_key, full_key, record_dir):
+    return os.path.join(record_dir, f"{base_key}_{full_key}.json.gz")
+
+
+def save_response(url, params, response, record_dir=None):
+    """Menyimpan respons (status, header penting, body) terkompresi; rekaman lama dengan key sama ditimpa."""
+    record_dir = record_dir or TRANSPORT_RECORD_DIR
+    endpoint, clean = _request_params(url, params)
+    path = _record_path(*request_keys(url, params), record_dir)
+    record = {
+        'url': url.split('?')[0],
+        'endpoint': endpoint,
+        'params': clean,
+        'recorded_at': time.strftime("%Y-%m-%d %H:%M:%S"),
+        'status_code': response.status_code,
+        'headers': {k: v for k, v in response.headers.items() if k.lower() in _STORED_HEADERS},
+        'text': response.text,
+    }
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(record_dir, exist_ok=True)
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump(record, f)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logging.warning(f"Gagal menyimpan rekaman respons {endpoint}: {e}")
+
+
+def _read_record(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_response(url, params=None, record_dir=None):
+    """
+    Membaca rekaman untuk request ini. Request tanpa end_date (pembaruan
+    inkremental bar store, yang start_date-nya bergantung pada isi store saat
+    run) boleh memakai rekaman request yang sama tanpa end_date: unduhan penuh
+    lebih dulu, lalu yang terbaru. Request dengan end_date (potongan backfill)
+    hanya dilayani rekaman yang persis sama, karena rentang lain akan disimpan
+    sebagai isi potongan yang diminta.
+    """
+    record_dir = record_dir or TRANSPORT_RECORD_DIR
+    base_key, full_key = request_keys(url, params)
+    path = _record_path(base_key, full_key, record_dir)
+    if os.path.exists(path):
+        record = _read_record(path)
+    else:
+        _, clean = _request_params(url, params)
+        record = None
+        if 'end_date' not in clean:
+            path = _record_path(base_key, base_key, record_dir)
+            candidates = [path] if os.path.exists(path) else sorted(
+                glob.glob(os.path.join(record_dir, f"{base_key}_*.json.gz")), key=os.path.getmtime, reverse=True)
+            for path in candidates:
+                candidate = _read_record(path)
+                if 'end_date' not in candidate.get('params', {}):
+                    record = candidate
+                    break
+        if record is None:
+            raise ReplayMissError(f"Tidak ada rekaman untuk {clean} di {record_dir}.")
+        logging.info(f"Replay: rekaman persis tidak ada, memakai {os.path.basename(path)}.")
+    return RecordedResponse(record['url'], record['status_code'], record['headers'], record['text'])
+
+
+def fetch(url, session_factory, params=None, **kwargs):
+    """
+    GET sesuai mode transport: 'live' langsung ke API, 'record' ke API lalu
+    respons disimpan, 'replay' dibaca dari rekaman tanpa jaringan.
+    `session_factory` hanya dipanggil jika request benar-benar dikirim.
+    """
+    mode = get_mode()
+    if mode == 'replay':
+        return load_response(url, params)
+    response = session_factory().get(url, params=params, **kwargs)
+    if mode == 'record':
+        save_response(url, params, response)
+    return response
+
+
+if __name__ == "__main__":
+    files = glob.glob(os.path.join(TRANSPORT_RECORD_DIR, "*.json.gz"))
+    size = sum(os.path.getsize(path) for path in files)
+    print(f"Mode transport: {get_mode()}")
+    print(f"{len(files)} rekaman ({size / 1024:.1f} KiB) di {TRANSPORT_RECORD_DIR}")